@@ -1,54 +1,141 @@
 
 from __future__ import annotations
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Query, Depends
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Query, Depends, Header
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
 import json
-from typing import List, Optional
+from typing import Any, List, Optional
+
+import orjson
 from datetime import date
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from app.schemas.transformations import (
     TransformationInput,
+    ExportFormatEnum,
     StatusDetails,
+    StageEnum,
     StatusEnum,
+    PublishResult,
+    RateCardInspection,
+    StatusBatchRequest,
+    StatusBatchResult,
+    StatusUpdate,
+    TransformationBatchResult,
+    TransformationFacets,
     TransformationList,
 )
 from app.services.transformations import TransformationsService
-from app.db.session import get_db
+from app.services.gcs_db import GCSService, get_gcs_service
+from app.services.exports import csv_chunks, ndjson_chunks
+from app.services.job_outputs import JobOutputService
+from app.services import rate_cards
+from app.services.pipeline import PipelineTrigger, get_pipeline_trigger
+from app.services.status_notifier import status_notifier
+from app.core.config import settings
+from app.db.session import get_db, get_session_factory
 
 router = APIRouter()
 
 
-def get_transformations_service(db: Session = Depends(get_db)) -> TransformationsService:
-    return TransformationsService(db=db)
+def get_storage_service() -> Optional[GCSService]:
+    # no bucket configured (local development): files are not uploaded
+    if not settings.GCS_BUCKET:
+        return None
+    return get_gcs_service()
 
 
-@router.post("/transformations", response_model=TransformationList, status_code=201)
-async def create_transformation(
-    excel_file: UploadFile = File(..., description="Excel file"),
-    word_file: UploadFile = File(..., description="Word file"),
-    data: str = Form(..., description="JSON string containing TransformationInput"),
-    service: TransformationsService = Depends(get_transformations_service),
-):
+def get_transformations_service(
+    db: AsyncSession = Depends(get_db),
+    storage: Optional[GCSService] = Depends(get_storage_service),
+    trigger: PipelineTrigger = Depends(get_pipeline_trigger),
+) -> TransformationsService:
+    return TransformationsService(db=db, storage=storage, trigger=trigger)
+
+
+def parse_transformation_input(data: str) -> TransformationInput:
     try:
         data_dict = json.loads(data)
-        transformation_data = TransformationInput(**data_dict)
+        return TransformationInput(**data_dict)
     except json.JSONDecodeError:
         raise HTTPException(status_code=400, detail="Invalid JSON in data field")
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid data format: {str(e)}")
 
+
+def check_file_names(excel_file: UploadFile, word_file: UploadFile) -> None:
     if not excel_file.filename or not excel_file.filename.endswith(('.xlsx', '.xls')):
         raise HTTPException(status_code=400, detail="Excel file must be .xlsx or .xls")
     if not word_file.filename or not word_file.filename.endswith(('.docx', '.doc')):
         raise HTTPException(status_code=400, detail="Word file must be .docx or .doc")
 
-    return service.create_transformation(
+
+def get_job_output_service(
+    storage: Optional[GCSService] = Depends(get_storage_service),
+) -> JobOutputService:
+    return JobOutputService(storage=storage)
+
+
+@router.post("/transformations", response_model=TransformationList, status_code=201)
+async def create_transformation(
+    excel_file: UploadFile = File(..., description="Excel file"),
+    word_file: UploadFile = File(..., description="Word file"),
+    data: str = Form(..., description="JSON string containing TransformationInput"),
+    service: TransformationsService = Depends(get_transformations_service),
+):
+    transformation_data = parse_transformation_input(data)
+    check_file_names(excel_file, word_file)
+
+    return await service.create_transformation(
         excel_file=excel_file,
         word_file=word_file,
         data=transformation_data,
     )
 
 
+@router.post("/transformations:batch", response_model=TransformationBatchResult, status_code=201)
+async def create_transformations_batch(
+    excel_files: List[UploadFile] = File(..., description="Excel files, one per item"),
+    word_files: List[UploadFile] = File(..., description="Word files, one per item"),
+    data: List[str] = Form(..., description="JSON strings containing TransformationInput, one per item"),
+    service: TransformationsService = Depends(get_transformations_service),
+):
+    """Create several transformations; the i-th excel_file, word_file and data form item i"""
+    if not (len(excel_files) == len(word_files) == len(data)):
+        raise HTTPException(
+            status_code=400,
+            detail="excel_files, word_files and data must have the same number of items",
+        )
+    if len(data) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.BATCH_MAX_ITEMS} items per batch",
+        )
+
+    # everything is validated before the first upload
+    items, errors = [], []
+    for index, (excel_file, word_file, item_data) in enumerate(zip(excel_files, word_files, data)):
+        try:
+            transformation_data = parse_transformation_input(item_data)
+            check_file_names(excel_file, word_file)
+        except HTTPException as e:
+            errors.append({"index": index, "error": e.detail})
+            continue
+        items.append((excel_file, word_file, transformation_data))
+    if errors:
+        raise HTTPException(status_code=400, detail=errors)
+
+    return await service.create_transformations_batch(
+        items, concurrency=settings.BATCH_UPLOAD_CONCURRENCY
+    )
+
+
+def json_response(content: Any) -> Response:
+    # for service results that already have the response model's shape:
+    # encoded with orjson, without a second validation pass
+    return Response(content=orjson.dumps(content), media_type="application/json")
+
+
 @router.get("/transformations", response_model=TransformationList)
 async def list_transformations(
     cursor: Optional[str] = Query(None, description="Cursor for pagination"),
@@ -58,9 +145,10 @@ async def list_transformations(
     carrier: Optional[List[str]] = Query(None),
     trade_lane: Optional[List[str]] = Query(None),
     status: Optional[List[StatusEnum]] = Query(None),
+    stage: Optional[List[StageEnum]] = Query(None, description="Furthest StatusDetails flag reached"),
     service: TransformationsService = Depends(get_transformations_service),
 ):
-    return service.list_transformations(
+    return json_response(await service.list_transformations(
         cursor=cursor,
         limit=limit,
         date_start=date_start,
@@ -68,6 +156,100 @@ async def list_transformations(
         carrier=carrier,
         trade_lane=trade_lane,
         status=status,
+        stage=stage,
+    ))
+
+
+@router.get("/transformations/search", response_model=TransformationList)
+async def search_transformations(
+    cursor: Optional[str] = Query(None, description="Cursor for pagination"),
+    limit: int = Query(20, ge=1, le=200, description="Number of items per page"),
+    surcharge_added: Optional[List[str]] = Query(None, description="Code in surcharges_to_be_added"),
+    surcharge_excluded: Optional[List[str]] = Query(None, description="Code in surcharges_to_exclude"),
+    surcharge_included: Optional[List[str]] = Query(None, description="Code in surcharges_included"),
+    sheet_excluded: Optional[List[str]] = Query(None, description="Sheet in sheets_and_filters.sheets_to_exclude"),
+    valid_on: Optional[date] = Query(None, description="Date inside one of the dates ranges"),
+    carrier: Optional[List[str]] = Query(None),
+    trade_lane: Optional[List[str]] = Query(None),
+    status: Optional[List[StatusEnum]] = Query(None),
+    stage: Optional[List[StageEnum]] = Query(None, description="Furthest StatusDetails flag reached"),
+    service: TransformationsService = Depends(get_transformations_service),
+):
+    return json_response(await service.search_transformations(
+        cursor=cursor,
+        limit=limit,
+        surcharge_added=surcharge_added,
+        surcharge_excluded=surcharge_excluded,
+        surcharge_included=surcharge_included,
+        sheet_excluded=sheet_excluded,
+        valid_on=valid_on,
+        carrier=carrier,
+        trade_lane=trade_lane,
+        status=status,
+        stage=stage,
+    ))
+
+
+@router.get(
+    "/transformations/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}, "text/csv": {}}}},
+)
+async def export_transformations(
+    format: ExportFormatEnum = Query(ExportFormatEnum.NDJSON, description="ndjson or csv"),
+    include_data: bool = Query(False, description="Add the decoded transformation_data of each row"),
+    date_start: Optional[date] = Query(None, alias="date.start"),
+    date_end: Optional[date] = Query(None, alias="date.end"),
+    carrier: Optional[List[str]] = Query(None),
+    trade_lane: Optional[List[str]] = Query(None),
+    status: Optional[List[StatusEnum]] = Query(None),
+    stage: Optional[List[StageEnum]] = Query(None, description="Furthest StatusDetails flag reached"),
+    session_factory: async_sessionmaker = Depends(get_session_factory),
+):
+    """Every transformation matching the list filters, streamed newest first"""
+    async def batches():
+        # the request session is closed before the body is sent: the stream has its own
+        async with session_factory() as db:
+            async for items in TransformationsService(db=db).export_transformations(
+                date_start=date_start,
+                date_end=date_end,
+                carrier=carrier,
+                trade_lane=trade_lane,
+                status=status,
+                stage=stage,
+                include_data=include_data,
+                batch_size=settings.EXPORT_BATCH_SIZE,
+            ):
+                yield items
+
+    if format == ExportFormatEnum.CSV:
+        body, media_type, extension = csv_chunks(batches(), include_data=include_data), "text/csv", "csv"
+    else:
+        body, media_type, extension = ndjson_chunks(batches()), "application/x-ndjson", "ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="transformations.{extension}"'},
+    )
+
+
+@router.get("/transformations/facets", response_model=TransformationFacets)
+async def get_transformation_facets(
+    date_start: Optional[date] = Query(None, alias="date.start"),
+    date_end: Optional[date] = Query(None, alias="date.end"),
+    carrier: Optional[List[str]] = Query(None),
+    trade_lane: Optional[List[str]] = Query(None),
+    status: Optional[List[StatusEnum]] = Query(None),
+    stage: Optional[List[StageEnum]] = Query(None, description="Furthest StatusDetails flag reached"),
+    service: TransformationsService = Depends(get_transformations_service),
+):
+    return await service.get_facets(
+        date_start=date_start,
+        date_end=date_end,
+        carrier=carrier,
+        trade_lane=trade_lane,
+        status=status,
+        stage=stage,
     )
 
 
@@ -76,11 +258,121 @@ async def get_status_details(
     id: str,
     service: TransformationsService = Depends(get_transformations_service),
 ):
-    return service.get_status_details(id)
+    return await service.get_status_details(id)
+
+
+@router.post("/transformations/status:batch", response_model=StatusBatchResult)
+async def get_status_details_batch(
+    request: StatusBatchRequest,
+    service: TransformationsService = Depends(get_transformations_service),
+):
+    """Status details, progress and message of many transformations in one call"""
+    if len(request.ids) > settings.STATUS_BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.STATUS_BATCH_MAX_IDS} ids per request",
+        )
+    return {"items": await service.get_status_snapshots(request.ids)}
+
+
+@router.get(
+    "/transformations/{id}/status-details-in-progress/stream",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}, "model": StatusUpdate}},
+)
+async def stream_status_details(
+    id: str,
+    session_factory: async_sessionmaker = Depends(get_session_factory),
+):
+    """Server-sent events: the current status, then one event per change"""
+    async def load():
+        async with session_factory() as db:
+            return await TransformationsService(db=db).get_status_snapshot(id)
+
+    updates = status_notifier.subscribe(
+        id, load, heartbeat=settings.STATUS_STREAM_HEARTBEAT_SECONDS
+    )
+    # read the first snapshot before answering so unknown ids get a 404
+    first = await updates.__anext__()
+
+    async def events():
+        try:
+            snapshot = first
+            while True:
+                if snapshot is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    yield f"event: status\ndata: {StatusUpdate(**snapshot).model_dump_json()}\n\n"
+                snapshot = await updates.__anext__()
+        finally:
+            await updates.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/transformations/{id}/publish", response_model=PublishResult)
+async def publish_transformation(
+    id: str,
+    modified: bool = Form(..., description="True if excel_file holds a modified rate card"),
+    excel_file: Optional[UploadFile] = File(None, description="Modified Excel file, required when modified is true"),
+    service: TransformationsService = Depends(get_transformations_service),
+):
+    if modified:
+        if excel_file is None:
+            raise HTTPException(status_code=400, detail="excel_file is required when modified is true")
+        if not excel_file.filename or not excel_file.filename.endswith(('.xlsx', '.xls')):
+            raise HTTPException(status_code=400, detail="Excel file must be .xlsx or .xls")
+
+    return await service.publish_transformation(id, modified=modified, excel_file=excel_file)
+
+
+@router.get(
+    "/transformations/{id}/jobs/{job}/output",
+    response_class=Response,
+    responses={200: {"content": {"application/json": {}}}, 304: {"description": "Not modified"}},
+)
+async def get_job_output(
+    id: str,
+    job: str,
+    variant: str = Query("automated", description="automated or modified output.json"),
+    if_none_match: Optional[str] = Header(None),
+    service: JobOutputService = Depends(get_job_output_service),
+):
+    """output.json of a sub-job; the ETag is the GCS generation of the object"""
+    output = await service.get_output(id, job, variant=variant, if_none_match=if_none_match)
+    # revalidate every time: the object may be rewritten while the reviewer works
+    headers = {"ETag": output.etag, "Cache-Control": "private, no-cache"}
+    if output.not_modified:
+        return Response(status_code=304, headers=headers)
+    if output.content is not None:
+        return Response(content=output.content, media_type="application/json", headers=headers)
+    headers["Content-Length"] = str(output.size)
+    return StreamingResponse(
+        iterate_in_threadpool(output.chunks), media_type="application/json", headers=headers
+    )
+
+
+@router.post("/rate-cards/inspect", response_model=RateCardInspection)
+async def inspect_rate_card(
+    excel_file: UploadFile = File(..., description="Excel file (.xlsx)"),
+):
+    """Sheet names, headers and row counts, to write sheets_and_filters and DatesItem.sheets"""
+    return await rate_cards.inspect_rate_card(excel_file)
 
 
 @router.get("/trade-lanes", response_model=List[str])
 async def get_trade_lanes(
     service: TransformationsService = Depends(get_transformations_service),
 ):
-    return service.get_trade_lanes()
+    return await service.get_trade_lanes()
+
+
+@router.get("/carriers", response_model=List[str])
+async def get_carriers(
+    service: TransformationsService = Depends(get_transformations_service),
+):
+    return await service.get_carriers()
@@ -7,8 +7,66 @@ class Settings(BaseSettings):
     PROJECT_VERSION: str = os.getenv("PROJECT_VERSION", "1.0.0")
     CORS_ORIGINS: str = os.getenv("CORS_ORIGINS", "*")
     DATABASE_URL: str = os.getenv('DATABASE_URL','sqlite:///./test.db')
-    GCS_BUCKET: str = os.getenv("GCS_BUCKET", "")
+    GCS_BUCKET: str = os.getenv("GCS_BUCKET", os.getenv("BUCKET", ""))
+    GCS_DB_PATH: str = os.getenv("GCS_DB_PATH", "api-db/ratecard.sqlite")
+    LOCAL_DB_PATH: str = os.getenv("LOCAL_DB_PATH", "/tmp/ratecard.sqlite")
+    # fetch/create the database in the background as soon as the app starts
+    DB_BOOTSTRAP_ON_STARTUP: bool = os.getenv("DB_BOOTSTRAP_ON_STARTUP", "true").lower() == "true"
+    # SQLite performance profile, applied to every pooled connection
+    SQLITE_JOURNAL_MODE: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    # negative: size in KiB
+    SQLITE_CACHE_SIZE: int = int(os.getenv("SQLITE_CACHE_SIZE", str(-64 * 1024)))
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    # write-back of the cloud-mode database to GCS_DB_PATH
+    DB_SNAPSHOT_ENABLED: bool = os.getenv("DB_SNAPSHOT_ENABLED", "true").lower() == "true"
+    DB_SNAPSHOT_DEBOUNCE_SECONDS: float = float(os.getenv("DB_SNAPSHOT_DEBOUNCE_SECONDS", "5"))
+    DB_SNAPSHOT_MAX_DELAY_SECONDS: float = float(os.getenv("DB_SNAPSHOT_MAX_DELAY_SECONDS", "60"))
     GCS_UPLOAD_PREFIX: str = os.getenv("GCS_UPLOAD_PREFIX", "rate-cards")
+    # resumable upload chunk size, must be a multiple of 256 KiB
+    GCS_UPLOAD_CHUNK_SIZE: int = int(os.getenv("GCS_UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+    # POST /transformations:batch: items per request, items uploading at the same time
+    BATCH_MAX_ITEMS: int = int(os.getenv("BATCH_MAX_ITEMS", "50"))
+    BATCH_UPLOAD_CONCURRENCY: int = int(os.getenv("BATCH_UPLOAD_CONCURRENCY", "4"))
+    # POST /transformations/status:batch: ids per request
+    STATUS_BATCH_MAX_IDS: int = int(os.getenv("STATUS_BATCH_MAX_IDS", "500"))
+    # what starts the jobs.yml pipeline after a creation: none, local (in-process runner) or airflow
+    PIPELINE_TRIGGER: str = os.getenv("PIPELINE_TRIGGER", "none")
+    # local runner stage, 'module:function' called with (job_name, transformation_id) in a worker process;
+    # without it, local needs PIPELINE_SIMULATE=true: stages do nothing and succeed (development only)
+    PIPELINE_LOCAL_STAGE: str = os.getenv("PIPELINE_LOCAL_STAGE", "")
+    PIPELINE_SIMULATE: bool = os.getenv("PIPELINE_SIMULATE", "false").lower() == "true"
+    # local runner process pool size, 0: one per CPU
+    PIPELINE_MAX_WORKERS: int = int(os.getenv("PIPELINE_MAX_WORKERS", "0"))
+    AIRFLOW_API_URL: str = os.getenv("AIRFLOW_API_URL", "")
+    AIRFLOW_DAG_ID: str = os.getenv("AIRFLOW_DAG_ID", "rate_card_transformation")
+    AIRFLOW_AUTH_TOKEN: str = os.getenv("AIRFLOW_AUTH_TOKEN", "")
+    # GET /transformations/{id}/jobs/{job}/output: in-memory LRU of output.json files;
+    # larger outputs are streamed in chunks and not cached
+    OUTPUT_CACHE_MAX_BYTES: int = int(os.getenv("OUTPUT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    OUTPUT_CACHE_MAX_ITEM_BYTES: int = int(os.getenv("OUTPUT_CACHE_MAX_ITEM_BYTES", str(4 * 1024 * 1024)))
+    OUTPUT_STREAM_CHUNK_SIZE: int = int(os.getenv("OUTPUT_STREAM_CHUNK_SIZE", str(1024 * 1024)))
+    # workbook inspections kept in memory, keyed by content hash
+    RATE_CARD_INSPECT_CACHE_SIZE: int = int(os.getenv("RATE_CARD_INSPECT_CACHE_SIZE", "256"))
+    # GET /transformations/export: rows fetched from the cursor and written per chunk
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+    # GET /metrics and the request/SQL instrumentation behind it
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    # request profiling, off unless enabled: a request is profiled when it has the
+    # PROFILING_HEADER header or is drawn with PROFILING_SAMPLE_RATE (0 to 1)
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILING_HEADER: str = os.getenv("PROFILING_HEADER", "X-Profile")
+    PROFILING_SAMPLE_RATE: float = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+    PROFILING_INTERVAL_MS: float = float(os.getenv("PROFILING_INTERVAL_MS", "1"))
+    # collapsed stacks of each profiled request are written here when set
+    PROFILING_OUTPUT_DIR: str = os.getenv("PROFILING_OUTPUT_DIR", "")
+    # status stream: re-read interval for changes made outside this process (0 disables)
+    STATUS_STREAM_REFRESH_SECONDS: float = float(os.getenv("STATUS_STREAM_REFRESH_SECONDS", "5"))
+    STATUS_STREAM_HEARTBEAT_SECONDS: float = float(os.getenv("STATUS_STREAM_HEARTBEAT_SECONDS", "15"))
 
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
@@ -0,0 +1,281 @@
+"""In-process metrics in the Prometheus text exposition format.
+
+Counters, gauges and histograms are plain dictionaries keyed by label values
+behind a lock: recording a value is a dict lookup and an addition, so the
+request path pays next to nothing. GET /metrics renders the registry.
+
+SQL statements are timed through engine events and labeled with the service
+method running them (see ``operation``).
+"""
+import contextvars
+import functools
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(v)}" for labels, v in values]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Tuple[float, ...] = REQUEST_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label values: [count per bucket (non-cumulative, +Inf last), sum]
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def count(self, *labels: str) -> int:
+        entry = self._values.get(labels)
+        return sum(entry[0]) if entry else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((labels, (list(counts), total[0])) for labels, (counts, total) in self._values.items())
+        lines = []
+        for labels, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Any:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        for metric in self._metrics.values():
+            metric.clear()
+
+
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds",
+    "Time to serve a request, by route template",
+    ("method", "route", "status"),
+))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight",
+    "Requests being served",
+    ("method",),
+))
+http_upload_bytes = registry.register(Counter(
+    "http_upload_bytes_total",
+    "Bytes received in multipart request bodies",
+    ("route",),
+))
+operation_duration = registry.register(Histogram(
+    "service_operation_duration_seconds",
+    "Time spent in a service method",
+    ("operation",),
+))
+sql_statement_duration = registry.register(Histogram(
+    "sql_statement_duration_seconds",
+    "Time to execute a SQL statement, by the service method running it",
+    ("operation",),
+    buckets=SQL_BUCKETS,
+))
+
+# service method running in the current task, the label of its SQL statements
+current_operation: contextvars.ContextVar[str] = contextvars.ContextVar("current_operation", default="other")
+
+
+def operation(func: Callable) -> Callable:
+    """Time a coroutine method and label the SQL statements it runs with its name"""
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        token = current_operation.set(name)
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            operation_duration.observe(time.perf_counter() - started, name)
+            current_operation.reset(token)
+
+    return wrapper
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Time every statement run on a (sync) engine"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _observe(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        sql_statement_duration.observe(time.perf_counter() - started, current_operation.get())
+
+    @event.listens_for(engine, "handle_error")
+    def _discard_timer(exception_context):
+        # a failed statement gets no after_cursor_execute
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_started"):
+            connection.info["query_started"].pop()
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency, in-flight requests and upload bytes.
+
+    The route label is the matched path template (``/transformations/{id}``),
+    read from the scope once the router has run, so ids do not create series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        uploaded = 0
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        if _is_multipart(scope):
+            async def counting_receive():
+                nonlocal uploaded
+                message = await receive()
+                if message["type"] == "http.request":
+                    uploaded += len(message.get("body", b""))
+                return message
+            downstream_receive = counting_receive
+        else:
+            downstream_receive = receive
+
+        http_requests_in_flight.inc(method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, downstream_receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.dec(method)
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            http_request_duration.observe(elapsed, method, route_path, str(status))
+            if uploaded:
+                http_upload_bytes.inc(route_path, amount=uploaded)
+
+
+def _is_multipart(scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == b"content-type":
+            return value.startswith(b"multipart/")
+    return False
@@ -0,0 +1,226 @@
+"""Opt-in profiling of single requests.
+
+Installed only when PROFILING_ENABLED is set. A request is profiled when it
+carries the PROFILING_HEADER header or is drawn by PROFILING_SAMPLE_RATE.
+While it runs, a thread samples the stack of the event loop thread; the
+samples are classified into phases (query, hydrate, serialize, validate,
+encode, wait) and sent back as a ``Server-Timing`` header, next to the exact
+time spent in SQL statements. With PROFILING_OUTPUT_DIR the samples are also
+written there in the collapsed-stack format read by flamegraph.pl and
+speedscope.
+
+Samples cover the whole event loop thread, so requests served at the same
+time show up in each other's profiles: profile on a quiet instance.
+"""
+import collections
+import contextvars
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# (filename, function, first line), outermost frame first
+Frame = Tuple[str, str, int]
+Stack = Tuple[Frame, ...]
+
+# first match from the innermost frame outwards names the phase of a sample
+PHASES = (
+    ("encode", lambda filename, func: func in ("json_response", "jsonable_encoder", "render", "model_dump_json")),
+    ("validate", lambda filename, func: "/pydantic/" in filename or "/pydantic_core/" in filename),
+    ("serialize", lambda filename, func: func in ("to_dict", "list_item")),
+    ("hydrate", lambda filename, func: "/sqlalchemy/orm/" in filename or "/sqlalchemy/engine/result" in filename),
+    ("query", lambda filename, func: "/sqlalchemy/" in filename or "/aiosqlite/" in filename),
+    ("wait", lambda filename, func: func == "select" and filename.endswith("selectors.py")),
+)
+
+
+def phase_of(stack: Stack) -> str:
+    for filename, func, _ in reversed(stack):
+        for phase, matches in PHASES:
+            if matches(filename, func):
+                return phase
+    return "app"
+
+
+_switch_lock = threading.Lock()
+_active_samplers = 0
+_default_switch_interval = sys.getswitchinterval()
+
+
+def _sampler_started(interval: float) -> None:
+    # the sampler only runs when the profiled thread lets go of the GIL, every
+    # 5 ms by default: shorten the switch interval while a profile is running
+    global _active_samplers
+    with _switch_lock:
+        _active_samplers += 1
+        sys.setswitchinterval(min(interval, _default_switch_interval))
+
+
+def _sampler_stopped() -> None:
+    global _active_samplers
+    with _switch_lock:
+        _active_samplers -= 1
+        if _active_samplers == 0:
+            sys.setswitchinterval(_default_switch_interval)
+
+
+class StackSampler:
+    """Samples the stack of one thread every `interval` seconds from a background thread"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self._samples: "collections.Counter[Stack]" = collections.Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        _sampler_started(self.interval)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        _sampler_stopped()
+
+    def samples(self) -> Dict[Stack, int]:
+        with self._lock:
+            return dict(self._samples)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack: List[Frame] = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_name, code.co_firstlineno))
+                frame = frame.f_back
+            if stack:
+                stack.reverse()
+                with self._lock:
+                    self._samples[tuple(stack)] += 1
+
+
+class RequestProfile:
+    def __init__(self, sampler: StackSampler):
+        self.sampler = sampler
+        self.started = time.perf_counter()
+        self.sql_seconds = 0.0
+        self.sql_statements = 0
+
+
+# profile of the request being served, None when it is not profiled
+current_profile: contextvars.ContextVar[Optional[RequestProfile]] = contextvars.ContextVar(
+    "current_profile", default=None
+)
+
+
+def profile_engine(engine: Engine) -> None:
+    """Add the SQL time of a (sync) engine to the profile of the current request"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        if current_profile.get() is not None:
+            conn.info["profile_query_started"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _add_query_time(conn, cursor, statement, parameters, context, executemany):
+        profile = current_profile.get()
+        started = conn.info.pop("profile_query_started", None)
+        if profile is not None and started is not None:
+            profile.sql_seconds += time.perf_counter() - started
+            profile.sql_statements += 1
+
+
+def server_timing(profile: RequestProfile) -> str:
+    """Server-Timing value: total, exact SQL time and the sampled phases"""
+    total = time.perf_counter() - profile.started
+    samples = profile.sampler.samples()
+    count = sum(samples.values())
+    phases: Dict[str, int] = collections.Counter()
+    for stack, n in samples.items():
+        phases[phase_of(stack)] += n
+
+    entries = [
+        f"total;dur={total * 1000:.1f}",
+        f'sql;dur={profile.sql_seconds * 1000:.1f};desc="{profile.sql_statements} statements"',
+    ]
+    # sampled phases share the total in proportion to their samples
+    for phase, n in sorted(phases.items(), key=lambda item: -item[1]) if count else ():
+        entries.append(f'{phase};dur={total * 1000 * n / count:.1f};desc="sampled"')
+    entries.append(f'profile;desc="{count} samples"')
+    return ", ".join(entries)
+
+
+def write_collapsed(samples: Dict[Stack, int], path: str) -> None:
+    with open(path, "w") as f:
+        for stack, count in samples.items():
+            frames = ";".join(f"{func} ({os.path.basename(filename)}:{line})" for filename, func, line in stack)
+            f.write(f"{frames} {count}\n")
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware profiling the requests selected by header or sampling rate"""
+
+    def __init__(
+        self,
+        app,
+        header: str = "X-Profile",
+        sample_rate: float = 0.0,
+        output_dir: str = "",
+        interval: float = 0.001,
+    ):
+        self.app = app
+        self.header = header.lower().encode()
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir
+        self.interval = interval
+
+    def _selected(self, scope) -> bool:
+        if any(name == self.header for name, _ in scope["headers"]):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._selected(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(StackSampler(threading.get_ident(), self.interval))
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(profile).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = current_profile.set(profile)
+        profile.sampler.start()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            profile.sampler.stop()
+            current_profile.reset(token)
+            if self.output_dir:
+                self._write(scope, profile)
+
+    def _write(self, scope, profile: RequestProfile) -> None:
+        name = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "root"
+        path = os.path.join(self.output_dir, f"{time.time_ns()}_{scope['method']}_{name}.folded")
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            write_collapsed(profile.sampler.samples(), path)
+            logger.info("Profile of %s %s written to %s", scope["method"], scope["path"], path)
+        except OSError:
+            logger.exception("Could not write the profile of %s %s", scope["method"], scope["path"])
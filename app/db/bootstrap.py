@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import os
+from typing import Any, Callable, Optional
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.db.base import Base
+from app.db.migrations import run_data_migrations, upgrade_schema
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseBootstrap:
+    """Makes the SQLite file ready before the first query, without blocking startup.
+
+    In cloud mode the database lives in the bucket: the local copy is downloaded
+    only when its recorded GCS generation differs from the object's, so warm
+    restarts on the same instance skip the transfer. The tables are then created
+    if missing, the existing ones upgraded and the pending data migrations run
+    (see app.db.migrations). The work runs once, in the background from startup
+    or on the first request that needs the database, whichever comes first.
+    """
+
+    PENDING = "pending"
+    LOADING = "loading"
+    READY = "ready"
+    FAILED = "failed"
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        db_file_path: str,
+        gcs_db_path: Optional[str] = None,
+        bucket_factory: Optional[Callable[[], Any]] = None,
+    ):
+        self.engine = engine
+        self.db_file_path = db_file_path
+        self.gcs_db_path = gcs_db_path
+        self.bucket_factory = bucket_factory
+        self.state = self.PENDING
+        self.error: Optional[BaseException] = None
+        self.generation: Optional[int] = None
+        self.downloaded = False
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def generation_file_path(self) -> str:
+        return f"{self.db_file_path}.generation"
+
+    @property
+    def is_ready(self) -> bool:
+        return self.state == self.READY
+
+    def start(self) -> asyncio.Task:
+        """Start the bootstrap in the background (no-op if running or done)"""
+        if self._task is None or (self._task.done() and self.state == self.FAILED):
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def wait_ready(self) -> None:
+        if self.state == self.READY:
+            return
+        await asyncio.shield(self.start())
+        if self.state != self.READY:
+            raise RuntimeError(f"Database is not available: {self.error}")
+
+    async def _run(self) -> None:
+        self.state = self.LOADING
+        self.error = None
+        try:
+            if self.bucket_factory is not None and self.gcs_db_path:
+                await asyncio.to_thread(self._sync_from_gcs)
+            async with self.engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+                # a database written by an older version: same transaction, all or nothing
+                await conn.run_sync(upgrade_schema)
+                await conn.run_sync(run_data_migrations)
+            self.state = self.READY
+        except Exception as e:
+            logger.exception("Database bootstrap failed")
+            self.error = e
+            self.state = self.FAILED
+
+    def _sync_from_gcs(self) -> None:
+        bucket = self.bucket_factory()
+        blob = bucket.get_blob(self.gcs_db_path)
+        if blob is None:
+            # first deployment: start from an empty database
+            logger.info("gs://%s not found, starting with an empty database", self.gcs_db_path)
+            self.generation = None
+            return
+
+        self.generation = blob.generation
+        if os.path.exists(self.db_file_path) and self._read_local_generation() == blob.generation:
+            logger.info("Local database already at generation %s, skipping download", blob.generation)
+            return
+
+        os.makedirs(os.path.dirname(self.db_file_path) or ".", exist_ok=True)
+        tmp_path = f"{self.db_file_path}.download"
+        blob.download_to_filename(tmp_path, if_generation_match=blob.generation)
+        for suffix in ("-wal", "-shm"):
+            # journal files of the previous copy must not be replayed on the new one
+            if os.path.exists(self.db_file_path + suffix):
+                os.remove(self.db_file_path + suffix)
+        os.replace(tmp_path, self.db_file_path)
+        self.record_generation(blob.generation)
+        self.downloaded = True
+
+    def _read_local_generation(self) -> Optional[int]:
+        try:
+            with open(self.generation_file_path) as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def record_generation(self, generation: int) -> None:
+        """Remember that the local copy matches this GCS generation"""
+        self.generation = generation
+        with open(self.generation_file_path, "w") as f:
+            f.write(str(generation))
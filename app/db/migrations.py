@@ -0,0 +1,183 @@
+"""Schema upgrades of a database written by an older version of the API.
+
+create_all only creates the tables that are missing. upgrade_schema brings
+the existing ones up to the models: it adds the missing columns and indexes,
+converts the data whose representation changed and drops the indexes and
+columns the models no longer have. Each step looks at the current schema
+first, so on an up-to-date database it changes nothing.
+
+run_data_migrations then fills what newer tables derive from the history
+(DATA_MIGRATIONS). Each one runs once per database and is recorded in
+applied_migrations.
+"""
+import json
+import logging
+from typing import Any, Callable, Dict, List, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import Column, delete, inspect, select, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.db.base import Base
+from app.models.transformations import (
+    AppliedMigration,
+    Carrier,
+    TradeLane,
+    Transformation,
+    TransformationDateRange,
+    TransformationExcludedSheet,
+    TransformationSurcharge,
+)
+from app.schemas.transformations import TransformationInput
+
+logger = logging.getLogger(__name__)
+
+
+def _column_ddl(conn: Connection, column: Column) -> str:
+    ddl = f"{column.name} {column.type.compile(dialect=conn.dialect)}"
+    if column.nullable:
+        return ddl
+    # SQLite only adds a NOT NULL column with a default for the existing rows
+    if column.default is None or not column.default.is_scalar:
+        raise RuntimeError(f"Cannot add NOT NULL column {column.table.name}.{column.name} without a default")
+    return f"{ddl} NOT NULL DEFAULT {column.default.arg!r}"
+
+
+def _backfill_status_flags(conn: Connection) -> None:
+    """status_details JSON of the first schema -> status_flags bits and stage"""
+    rows = conn.execute(
+        text("SELECT id, status_details FROM transformations WHERE status_details IS NOT NULL")
+    ).all()
+    updates: List[Dict[str, Any]] = []
+    for transformation_id, status_details in rows:
+        try:
+            details = json.loads(status_details)
+        except json.JSONDecodeError:
+            continue
+        if not isinstance(details, dict):
+            continue
+        flags = Transformation.encode_status_flags(details)
+        updates.append({"id": transformation_id, "flags": flags, "stage": Transformation.stage_from_flags(flags)})
+    if updates:
+        conn.execute(
+            text("UPDATE transformations SET status_flags = :flags, stage = :stage WHERE id = :id"),
+            updates,
+        )
+    logger.info("Converted the status details of %s transformations", len(updates))
+
+
+def upgrade_schema(conn: Connection) -> List[str]:
+    """Bring the existing tables to the models. Returns the changes made.
+
+    Missing columns and indexes are added; indexes and columns the models no
+    longer have are dropped, once the data they held has been converted.
+    """
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+    changes: List[str] = []
+    old_columns: Dict[str, set] = {}
+
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        old_columns[table.name] = columns
+        for column in table.columns:
+            if column.name in columns:
+                continue
+            if column.primary_key:
+                raise RuntimeError(f"Cannot add primary key column {table.name}.{column.name}")
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {_column_ddl(conn, column)}"))
+            changes.append(f"added column {table.name}.{column.name}")
+
+        model_indexes = {index.name for index in table.indexes}
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for name in sorted(indexes - model_indexes):
+            # replaced indexes still cost a write on every insert
+            conn.execute(text(f"DROP INDEX {name}"))
+            changes.append(f"dropped index {name}")
+        for index in table.indexes:
+            if index.name not in indexes:
+                index.create(conn)
+                changes.append(f"created index {index.name}")
+
+    transformations_columns = old_columns.get("transformations", set())
+    if "status_flags" not in transformations_columns and "status_details" in transformations_columns:
+        _backfill_status_flags(conn)
+
+    for table in Base.metadata.sorted_tables:
+        for name in sorted(old_columns.get(table.name, set()) - {column.name for column in table.columns}):
+            conn.execute(text(f"ALTER TABLE {table.name} DROP COLUMN {name}"))
+            changes.append(f"dropped column {table.name}.{name}")
+
+    if changes:
+        logger.info("Schema upgraded: %s", ", ".join(changes))
+    return changes
+
+
+def _backfill_lookups(conn: Connection) -> None:
+    """carriers and trade_lanes dictionaries from the transformations already recorded"""
+    for model, source_column in ((Carrier, Transformation.carrier), (TradeLane, Transformation.trade_lane)):
+        conn.execute(
+            sqlite_insert(model)
+            .from_select(["name"], select(source_column).where(source_column.is_not(None)).distinct())
+            .on_conflict_do_nothing()
+        )
+
+
+def _index_transformation_data(conn: Connection, batch_size: int = 500) -> None:
+    """Search side tables for the transformations written before they existed
+
+    Same work as TransformationsService.rebuild_data_index, on the bootstrap
+    connection so it commits with the other steps.
+    """
+    from app.services.transformations import TransformationsService
+
+    # rows created since the side tables exist are already indexed: start over
+    for model in (TransformationSurcharge, TransformationExcludedSheet, TransformationDateRange):
+        conn.execute(delete(model))
+
+    indexed = 0
+    last_id = ""
+    with Session(bind=conn) as session:
+        while True:
+            rows = conn.execute(
+                select(Transformation.id, Transformation.transformation_data)
+                .where(Transformation.id > last_id)
+                .order_by(Transformation.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            for row in rows:
+                try:
+                    data = TransformationInput.model_validate_json(row.transformation_data or "")
+                except ValidationError:
+                    continue
+                session.add_all(TransformationsService._build_data_index(row.id, data))
+                indexed += 1
+            session.flush()
+            last_id = rows[-1].id
+    logger.info("Indexed the data of %s transformations", indexed)
+
+
+DATA_MIGRATIONS: Tuple[Tuple[str, Callable[[Connection], None]], ...] = (
+    ("backfill_lookups", _backfill_lookups),
+    ("index_transformation_data", _index_transformation_data),
+)
+
+
+def run_data_migrations(conn: Connection) -> List[str]:
+    """Run the DATA_MIGRATIONS not yet applied to this database. Returns their names."""
+    applied = set(conn.execute(select(AppliedMigration.name)).scalars())
+    ran: List[str] = []
+    for name, migrate in DATA_MIGRATIONS:
+        if name in applied:
+            continue
+        migrate(conn)
+        conn.execute(sqlite_insert(AppliedMigration).values(name=name).on_conflict_do_nothing())
+        ran.append(name)
+        logger.info("Applied data migration %s", name)
+    return ran
@@ -1,8 +1,16 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from pathlib import Path
 import os
 
+from app.core.config import settings
+from app.core.metrics import instrument_engine
+from app.core.profiling import profile_engine
+from app.db.bootstrap import DatabaseBootstrap
+from app.db.snapshot import DatabaseSnapshotter
+from app.db.sqlite_profile import apply_sqlite_profile, pool_options, sqlite_pragmas
+
 MODE = os.getenv("MODE", "local")
 
 if MODE == "local":
@@ -15,21 +23,68 @@ if MODE == "local":
     DB_FILE = DUMP_DIR / "ratecard.sqlite"
     DB_FILE_PATH = str(DB_FILE)
 else:
-    from app.services.gcs_db import download_sqlite_from_gcs
-    DB_FILE_PATH = download_sqlite_from_gcs()
+    # the database is fetched from GCS_DB_PATH by the bootstrap, not at import time
+    DB_FILE_PATH = settings.LOCAL_DB_PATH
+
+SQLALCHEMY_DATABASE_URL = f"sqlite+aiosqlite:///{DB_FILE_PATH}"
 
-SQLALCHEMY_DATABASE_URL = f"sqlite:///{DB_FILE_PATH}"
+# aiosqlite runs each connection in its own thread, so queries are awaited
+# instead of blocking the event loop
+engine = create_async_engine(SQLALCHEMY_DATABASE_URL, **pool_options())
+apply_sqlite_profile(engine.sync_engine, sqlite_pragmas())
+if settings.METRICS_ENABLED:
+    instrument_engine(engine.sync_engine)
+if settings.PROFILING_ENABLED:
+    profile_engine(engine.sync_engine)
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},
+AsyncSessionLocal = async_sessionmaker(
+    bind=engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _gcs_bucket():
+    from app.services.gcs_db import get_gcs_service
+    return get_gcs_service().bucket
+
+database_bootstrap = DatabaseBootstrap(
+    engine=engine,
+    db_file_path=DB_FILE_PATH,
+    gcs_db_path=settings.GCS_DB_PATH,
+    bucket_factory=None if MODE == "local" else _gcs_bucket,
+)
 
-def get_db():
-    db = SessionLocal()
+# cloud mode: local writes are shipped back to the bucket in the background
+database_snapshotter = None
+if MODE != "local" and settings.DB_SNAPSHOT_ENABLED:
+    database_snapshotter = DatabaseSnapshotter(
+        bootstrap=database_bootstrap,
+        bucket_factory=_gcs_bucket,
+        gcs_db_path=settings.GCS_DB_PATH,
+        debounce_seconds=settings.DB_SNAPSHOT_DEBOUNCE_SECONDS,
+        max_delay_seconds=settings.DB_SNAPSHOT_MAX_DELAY_SECONDS,
+    )
+    event.listen(engine.sync_engine, "commit", database_snapshotter.mark_dirty)
+
+async def wait_for_database() -> None:
     try:
+        await database_bootstrap.wait_ready()
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if database_snapshotter is not None and database_snapshotter.conflict:
+        # writes accepted now would never reach the bucket
+        raise HTTPException(
+            status_code=503,
+            detail=f"gs://{settings.GCS_DB_PATH} was changed by another instance, restart to resync"
+        )
+
+async def get_session_factory() -> async_sessionmaker:
+    """Session factory for work that outlives a single request (streams, background tasks)"""
+    await wait_for_database()
+    return AsyncSessionLocal
+
+async def get_db():
+    await wait_for_database()
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Callable, Optional
+
+from app.db.bootstrap import DatabaseBootstrap
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseSnapshotter:
+    """Writes the local SQLite database back to GCS in the background.
+
+    Commits only mark the database dirty. A background task takes a consistent
+    copy with SQLite's online backup API once writes have been quiet for
+    `debounce_seconds` (or after `max_delay_seconds` of continuous writes) and
+    uploads it with a generation-match precondition: if another instance wrote
+    the object since our last download or upload, the upload is refused rather
+    than overwriting its data. From then on `conflict` is set: the writes of
+    this instance can no longer be shipped, so the database is reported
+    unavailable (GET /health, get_db) until the instance is restarted and
+    downloads the current object.
+    """
+
+    def __init__(
+        self,
+        bootstrap: DatabaseBootstrap,
+        bucket_factory: Callable[[], Any],
+        gcs_db_path: str,
+        debounce_seconds: float = 5.0,
+        max_delay_seconds: float = 60.0,
+        backup_pages: int = 1024,
+    ):
+        self.bootstrap = bootstrap
+        self.bucket_factory = bucket_factory
+        self.gcs_db_path = gcs_db_path
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.backup_pages = backup_pages
+        self.conflict = False
+        self.uploads = 0
+        self._dirty_since: Optional[float] = None
+        self._last_write: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty_since is not None
+
+    def mark_dirty(self, *args: Any) -> None:
+        """Record a committed write; cheap enough to run on every commit"""
+        if not self.bootstrap.is_ready:
+            # the bootstrap's own create/upgrade transaction: re-run identically by
+            # every instance, uploading it would only race the other instances
+            return
+        now = time.monotonic()
+        if self._dirty_since is None:
+            self._dirty_since = now
+        self._last_write = now
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task and ship what is left"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            except Exception:
+                # the pending writes are still worth shipping
+                logger.exception("Database snapshot task failed")
+            self._task = None
+        await self.flush()
+
+    def _due(self) -> bool:
+        if self._dirty_since is None:
+            return False
+        now = time.monotonic()
+        return (
+            now - self._last_write >= self.debounce_seconds
+            or now - self._dirty_since >= self.max_delay_seconds
+        )
+
+    async def _run(self) -> None:
+        interval = min(self.debounce_seconds, self.max_delay_seconds)
+        while True:
+            try:
+                # wait_ready restarts a failed bootstrap, so the next round retries it
+                await self.bootstrap.wait_ready()
+            except Exception as e:
+                logger.warning("Database not ready, snapshots postponed: %s", e)
+                await asyncio.sleep(interval)
+                continue
+            await asyncio.sleep(interval)
+            if self._due():
+                try:
+                    await self.flush()
+                except Exception:
+                    logger.exception("Database snapshot failed")
+
+    async def flush(self) -> bool:
+        """Upload a snapshot now if there are unsaved writes. Returns True if uploaded."""
+        # already loaded with the storage client by the time there is something to upload
+        from google.api_core.exceptions import PreconditionFailed
+
+        async with self._lock:
+            if self._dirty_since is None or self.conflict:
+                return False
+            dirty_since, last_write = self._dirty_since, self._last_write
+            self._dirty_since = None
+            try:
+                await asyncio.to_thread(self._snapshot_and_upload)
+            except PreconditionFailed:
+                self.conflict = True
+                logger.error(
+                    "gs://%s changed since generation %s, snapshot not uploaded",
+                    self.gcs_db_path, self.bootstrap.generation,
+                )
+                return False
+            except BaseException:
+                # keep the writes pending so the next round retries them
+                if self._dirty_since is None:
+                    self._dirty_since, self._last_write = dirty_since, last_write
+                raise
+            self.uploads += 1
+            return True
+
+    def _snapshot_and_upload(self) -> None:
+        snapshot_path = f"{self.bootstrap.db_file_path}.snapshot"
+        source = sqlite3.connect(self.bootstrap.db_file_path)
+        target = sqlite3.connect(snapshot_path)
+        try:
+            # copies a consistent image page by page; writers are not blocked between steps
+            source.backup(target, pages=self.backup_pages)
+        finally:
+            target.close()
+            source.close()
+
+        try:
+            blob = self.bucket_factory().blob(self.gcs_db_path)
+            blob.upload_from_filename(
+                snapshot_path,
+                content_type="application/vnd.sqlite3",
+                # 0: the object must not exist yet
+                if_generation_match=self.bootstrap.generation or 0,
+            )
+            self.bootstrap.record_generation(blob.generation)
+        finally:
+            os.remove(snapshot_path)
@@ -0,0 +1,51 @@
+from typing import Any, Dict, List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+
+def sqlite_pragmas(
+    journal_mode: str = settings.SQLITE_JOURNAL_MODE,
+    synchronous: str = settings.SQLITE_SYNCHRONOUS,
+    mmap_size: int = settings.SQLITE_MMAP_SIZE,
+    cache_size: int = settings.SQLITE_CACHE_SIZE,
+    busy_timeout_ms: int = settings.SQLITE_BUSY_TIMEOUT_MS,
+) -> List[str]:
+    """PRAGMA statements of the SQLite performance profile.
+
+    WAL lets readers and the single writer proceed at the same time, and with
+    WAL, synchronous=NORMAL only syncs at checkpoints. busy_timeout makes a
+    connection wait for a lock instead of failing with "database is locked".
+    """
+    return [
+        f"PRAGMA journal_mode={journal_mode}",
+        f"PRAGMA synchronous={synchronous}",
+        f"PRAGMA mmap_size={int(mmap_size)}",
+        f"PRAGMA cache_size={int(cache_size)}",
+        f"PRAGMA busy_timeout={int(busy_timeout_ms)}",
+    ]
+
+
+def pool_options() -> Dict[str, Any]:
+    """create_engine/create_async_engine pool arguments from the settings"""
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_pre_ping": False,
+    }
+
+
+def apply_sqlite_profile(engine: Engine, pragmas: List[str]) -> None:
+    """Run the pragmas on every new DBAPI connection of a (sync) engine"""
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
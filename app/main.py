@@ -1,12 +1,27 @@
 from __future__ import annotations
-from pathlib import Path
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.openapi.docs import get_swagger_ui_html, get_redoc_html
-import yaml
 
 from .core.config import settings
+from .core import metrics, profiling
 from .api.routes.transformations import router as transformations_router
+from .db.session import database_bootstrap, database_snapshotter
+from .services.pipeline import close_pipeline_trigger
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # do not wait for the database here: cold starts must not scale with its size
+    if settings.DB_BOOTSTRAP_ON_STARTUP:
+        database_bootstrap.start()
+    if database_snapshotter is not None:
+        database_snapshotter.start()
+    yield
+    await close_pipeline_trigger()
+    if database_snapshotter is not None:
+        await database_snapshotter.stop()
 
 
 app = FastAPI(
@@ -14,7 +29,8 @@ app = FastAPI(
     version=settings.PROJECT_VERSION,
     docs_url="/docs",
     redoc_url="/redoc",
-    openapi_url="/openapi.json"
+    openapi_url="/openapi.json",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -25,8 +41,38 @@ app.add_middleware(
     allow_headers=['*'],
 )
 
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+if settings.PROFILING_ENABLED:
+    app.add_middleware(
+        profiling.ProfilingMiddleware,
+        header=settings.PROFILING_HEADER,
+        sample_rate=settings.PROFILING_SAMPLE_RATE,
+        output_dir=settings.PROFILING_OUTPUT_DIR,
+        interval=settings.PROFILING_INTERVAL_MS / 1000,
+    )
+
 app.include_router(transformations_router)
 
 @app.get('/', include_in_schema=False)
 async def root():
     return {'status':'ok','service':app.title,'version':app.version}
+
+@app.get('/health', include_in_schema=False)
+async def health():
+    """Readiness: 503 until the database is downloaded and initialised, or once its snapshots conflict"""
+    if not database_bootstrap.is_ready:
+        database_bootstrap.start()
+    body = {'status': 'ok' if database_bootstrap.is_ready else 'starting', 'database': database_bootstrap.state}
+    if database_bootstrap.error is not None:
+        body['error'] = str(database_bootstrap.error)
+    if database_snapshotter is not None and database_snapshotter.conflict:
+        body['status'] = 'conflict'
+        body['error'] = 'database changed in the bucket by another instance, local writes are not saved'
+    return JSONResponse(body, status_code=200 if body['status'] == 'ok' else 503)
+
+if settings.METRICS_ENABLED:
+    @app.get('/metrics', include_in_schema=False)
+    async def get_metrics():
+        return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
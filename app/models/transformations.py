@@ -1,16 +1,27 @@
 from __future__ import annotations
 import json
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 from typing import Any, Dict, Optional
 
-from sqlalchemy import String, DateTime, Text, Integer
+from sqlalchemy import String, Date, DateTime, Text, Integer, Index, ForeignKey
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.db.base import Base
 
+# StatusDetails flags, in pipeline order; flag i is bit i of Transformation.status_flags
+STATUS_FLAGS = ("UPLOAD_COMPLETE", "PROCESSING", "REVIEW", "READY_TO_PUBLISH")
+
 
 class Transformation(Base):
     __tablename__ = "transformations"
+    # keyset pagination walks (created_at, id) newest first, optionally under one filter
+    __table_args__ = (
+        Index("ix_transformations_created_at_id", "created_at", "id"),
+        Index("ix_transformations_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_transformations_carrier_created_at_id", "carrier", "created_at", "id"),
+        Index("ix_transformations_trade_lane_created_at_id", "trade_lane", "created_at", "id"),
+        Index("ix_transformations_stage_created_at_id", "stage", "created_at", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String, primary_key=True, index=True)
     created_at: Mapped[datetime] = mapped_column(
@@ -18,15 +29,22 @@ class Transformation(Base):
         default=lambda: datetime.now(timezone.utc),
         nullable=False
     )
-    status: Mapped[str] = mapped_column(String, nullable=False, index=True)
-    carrier: Mapped[str] = mapped_column(String, nullable=False, index=True)
-    trade_lane: Mapped[str] = mapped_column(String, nullable=False, index=True)
+    status: Mapped[str] = mapped_column(String, nullable=False)
+    carrier: Mapped[str] = mapped_column(String, nullable=False)
+    trade_lane: Mapped[str] = mapped_column(String, nullable=False)
     xlsx_name: Mapped[str] = mapped_column(String, nullable=False)
     docx_name: Mapped[str] = mapped_column(String, nullable=False)
+    # content-addressed objects holding the uploaded files (NULL: per-transformation paths)
+    xlsx_sha256: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    docx_sha256: Mapped[Optional[str]] = mapped_column(String, nullable=True)
     transformation_data: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     progress: Mapped[Optional[int]] = mapped_column(Integer, nullable=True, default=0)
     message: Mapped[Optional[str]] = mapped_column(String, nullable=True)
-    status_details: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    status_flags: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # furthest StatusDetails flag reached, derived from status_flags so it can be filtered on
+    stage: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    # object stored by the publish call that set READY_TO_PUBLISH (NULL: no bucket or published before it was recorded)
+    published_path: Mapped[Optional[str]] = mapped_column(String, nullable=True)
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -42,32 +60,133 @@ class Transformation(Base):
         }
 
     def get_transformation_data(self) -> Optional[Dict[str, Any]]:
-        if not self.transformation_data:
-            return None
-        try:
-            return json.loads(self.transformation_data)
-        except json.JSONDecodeError:
-            return None
+        return self.decode_transformation_data(self.transformation_data)
 
     def set_transformation_data(self, data: Dict[str, Any]) -> None:
         if data:
             self.transformation_data = json.dumps(data, default=str)
 
     def get_status_details(self) -> Dict[str, bool]:
-        default_status = {
-            "UPLOAD_COMPLETE": False,
-            "PROCESSING": False,
-            "REVIEW": False,
-            "READY_TO_PUBLISH": False
-        }
+        return self.decode_status_flags(self.status_flags)
 
-        if not self.status_details:
-            return default_status
+    def set_status_details(self, details: Dict[str, bool]) -> None:
+        self.status_flags = self.encode_status_flags(details)
+        self.stage = self.stage_from_flags(self.status_flags)
 
+    @staticmethod
+    def decode_transformation_data(transformation_data: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not transformation_data:
+            return None
         try:
-            return json.loads(self.status_details)
+            return json.loads(transformation_data)
         except json.JSONDecodeError:
-            return default_status
+            return None
 
-    def set_status_details(self, details: Dict[str, bool]) -> None:
-        self.status_details = json.dumps(details)
+    @staticmethod
+    def decode_status_flags(status_flags: Optional[int]) -> Dict[str, bool]:
+        flags = status_flags or 0
+        return {name: bool(flags & (1 << bit)) for bit, name in enumerate(STATUS_FLAGS)}
+
+    @staticmethod
+    def encode_status_flags(details: Dict[str, bool]) -> int:
+        return sum(1 << bit for bit, name in enumerate(STATUS_FLAGS) if details.get(name))
+
+    @staticmethod
+    def stage_from_flags(status_flags: Optional[int]) -> Optional[str]:
+        flags = status_flags or 0
+        for bit in reversed(range(len(STATUS_FLAGS))):
+            if flags & (1 << bit):
+                return STATUS_FLAGS[bit]
+        return None
+
+
+class TransformationJob(Base):
+    """State of one jobs.yml sub-job for a transformation."""
+    __tablename__ = "transformation_jobs"
+    __table_args__ = (
+        Index("ix_transformation_jobs_job_id_state", "job_id", "state"),
+    )
+
+    transformation_id: Mapped[str] = mapped_column(
+        String, ForeignKey("transformations.id", ondelete="CASCADE"), primary_key=True
+    )
+    job_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    state: Mapped[str] = mapped_column(String, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+        nullable=False
+    )
+
+
+class Carrier(Base):
+    """Distinct carriers of the transformations table, maintained on insert."""
+    __tablename__ = "carriers"
+
+    name: Mapped[str] = mapped_column(String, primary_key=True)
+
+
+class TradeLane(Base):
+    """Distinct trade lanes of the transformations table, maintained on insert."""
+    __tablename__ = "trade_lanes"
+
+    name: Mapped[str] = mapped_column(String, primary_key=True)
+
+
+class AppliedMigration(Base):
+    """One-time data migration already run on this database (see app.db.migrations)."""
+    __tablename__ = "applied_migrations"
+
+    name: Mapped[str] = mapped_column(String, primary_key=True)
+    applied_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False
+    )
+
+
+class TransformationSurcharge(Base):
+    """Surcharge code referenced by a transformation's TransformationInput.
+
+    kind is ADDED (surcharges_to_be_added), EXCLUDED (surcharges_to_exclude)
+    or INCLUDED (surcharges_included).
+    """
+    __tablename__ = "transformation_surcharges"
+    __table_args__ = (
+        Index("ix_transformation_surcharges_kind_code", "kind", "surcharge_code", "transformation_id"),
+    )
+
+    transformation_id: Mapped[str] = mapped_column(
+        String, ForeignKey("transformations.id", ondelete="CASCADE"), primary_key=True
+    )
+    kind: Mapped[str] = mapped_column(String, primary_key=True)
+    surcharge_code: Mapped[str] = mapped_column(String, primary_key=True)
+
+
+class TransformationExcludedSheet(Base):
+    """Sheet listed in a transformation's sheets_and_filters.sheets_to_exclude."""
+    __tablename__ = "transformation_excluded_sheets"
+    __table_args__ = (
+        Index("ix_transformation_excluded_sheets_sheet_name", "sheet_name", "transformation_id"),
+    )
+
+    transformation_id: Mapped[str] = mapped_column(
+        String, ForeignKey("transformations.id", ondelete="CASCADE"), primary_key=True
+    )
+    sheet_name: Mapped[str] = mapped_column(String, primary_key=True)
+
+
+class TransformationDateRange(Base):
+    """One entry of a transformation's dates list."""
+    __tablename__ = "transformation_date_ranges"
+    __table_args__ = (
+        Index("ix_transformation_date_ranges_dates", "application_date", "validity_date", "transformation_id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    transformation_id: Mapped[str] = mapped_column(
+        String, ForeignKey("transformations.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    application_date: Mapped[date] = mapped_column(Date, nullable=False)
+    validity_date: Mapped[date] = mapped_column(Date, nullable=False)
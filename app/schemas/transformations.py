@@ -1,7 +1,7 @@
 from __future__ import annotations
 from datetime import date, datetime
 from enum import Enum
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel, Field, ConfigDict
 
 class StatusEnum(str, Enum):
@@ -10,6 +10,22 @@ class StatusEnum(str, Enum):
     PENDING_FINAL_REVIEW = 'PENDING_FINAL_REVIEW'
     NEEDING_INPUT = 'NEEDING_INPUT'
 
+class StageEnum(str, Enum):
+    UPLOAD_COMPLETE = 'UPLOAD_COMPLETE'
+    PROCESSING = 'PROCESSING'
+    REVIEW = 'REVIEW'
+    READY_TO_PUBLISH = 'READY_TO_PUBLISH'
+
+class ExportFormatEnum(str, Enum):
+    NDJSON = 'ndjson'
+    CSV = 'csv'
+
+class JobStateEnum(str, Enum):
+    PENDING = 'PENDING'
+    RUNNING = 'RUNNING'
+    SUCCEEDED = 'SUCCEEDED'
+    FAILED = 'FAILED'
+
 class FileNames(BaseModel):
     xlsx_name: str
     docx_name: str
@@ -26,12 +42,63 @@ class TransformationList(BaseModel):
     items: List[Transformation]
     next_cursor: Optional[str] = Field(None, description='Cursor for next page (nullable)')
 
+class BatchItemResult(BaseModel):
+    index: int = Field(..., description='Position of the item in the request')
+    id: Optional[str] = None
+    status: str = Field(..., description='created or failed')
+    error: Optional[str] = None
+    transformation: Optional[Transformation] = None
+
+class TransformationBatchResult(BaseModel):
+    items: List[BatchItemResult]
+
+class TransformationFacets(BaseModel):
+    carrier: Dict[str, int]
+    trade_lane: Dict[str, int]
+    status: Dict[str, int]
+    stage: Dict[str, int]
+
 class StatusDetails(BaseModel):
     UPLOAD_COMPLETE: bool
     PROCESSING: bool
     REVIEW: bool
     READY_TO_PUBLISH: bool
 
+class StatusUpdate(BaseModel):
+    id: str
+    status_details: StatusDetails
+    progress: Optional[int] = None
+    message: Optional[str] = None
+
+class PublishResult(BaseModel):
+    id: str
+    modified: bool
+    already_published: bool = Field(..., description='READY_TO_PUBLISH was already set, nothing was stored')
+    published_path: Optional[str] = Field(None, description='Object holding the published rate card (null without bucket or if not recorded)')
+    status_details: StatusDetails
+
+class SheetInfo(BaseModel):
+    name: str
+    header: List[str] = Field(..., description='First non-empty row')
+    row_count: int = Field(..., description='Non-empty rows after the header')
+
+class RateCardInspection(BaseModel):
+    sha256: str
+    sheets: List[SheetInfo]
+
+class StatusBatchRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, description='Transformation ids, duplicates are answered once')
+
+class StatusBatchItem(BaseModel):
+    id: str
+    found: bool
+    status_details: Optional[StatusDetails] = None
+    progress: Optional[int] = None
+    message: Optional[str] = None
+
+class StatusBatchResult(BaseModel):
+    items: List[StatusBatchItem]
+
 class SheetFilter(BaseModel):
     name: str
     column: str
@@ -75,5 +142,15 @@ class TransformationInput(BaseModel):
 ### To do for the remaning classes ####
 Transformation.model_rebuild()
 TransformationList.model_rebuild()
+BatchItemResult.model_rebuild()
+TransformationBatchResult.model_rebuild()
+TransformationFacets.model_rebuild()
 StatusDetails.model_rebuild()
+StatusUpdate.model_rebuild()
+PublishResult.model_rebuild()
+SheetInfo.model_rebuild()
+RateCardInspection.model_rebuild()
+StatusBatchRequest.model_rebuild()
+StatusBatchItem.model_rebuild()
+StatusBatchResult.model_rebuild()
 TransformationInput.model_rebuild()
@@ -0,0 +1,48 @@
+import csv
+import io
+from typing import Any, AsyncIterator, Dict, List
+
+import orjson
+
+CSV_COLUMNS = ["id", "created_at", "status", "carrier", "trade_lane", "xlsx_name", "docx_name"]
+
+
+async def ndjson_chunks(batches: AsyncIterator[List[Dict[str, Any]]]) -> AsyncIterator[bytes]:
+    """One JSON object per line, one chunk per batch"""
+    async for items in batches:
+        yield b"".join(orjson.dumps(item) + b"\n" for item in items)
+
+
+async def csv_chunks(
+    batches: AsyncIterator[List[Dict[str, Any]]],
+    include_data: bool = False,
+) -> AsyncIterator[bytes]:
+    """Header row, then one chunk of rows per batch.
+
+    file_names is flattened into its two columns; transformation_data, when
+    included, is written as a JSON string in the last column.
+    """
+    columns = CSV_COLUMNS + ["transformation_data"] if include_data else CSV_COLUMNS
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue().encode()
+
+    async for items in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        for item in items:
+            row = [
+                item["id"],
+                item["created_at"],
+                item["status"],
+                item["carrier"],
+                item["trade_lane"],
+                item["file_names"]["xlsx_name"],
+                item["file_names"]["docx_name"],
+            ]
+            if include_data:
+                data = item["transformation_data"]
+                row.append("" if data is None else orjson.dumps(data).decode())
+            writer.writerow(row)
+        yield buffer.getvalue().encode()
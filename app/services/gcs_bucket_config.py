@@ -1,8 +1,14 @@
-import yaml
 import os
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Mapping, Optional, Tuple
 
-BUCKET_NAME = os.environ["BUCKET"]
-ALL_JOBS_ROOT_PATH = os.environ["ALL_JOBS_ROOT_PATH"]
+# read without failing: only the code that actually talks to the bucket needs them
+BUCKET_NAME = os.getenv("BUCKET", "")
+# bucket prefix shared with the Airflow jobs, resolved by all_jobs_root_path() when a key is built
+ALL_JOBS_ROOT_PATH = "{all_jobs_root_path}"
 MAIN_JOB_ROOT_PATH = (ALL_JOBS_ROOT_PATH+"/transformation-{transformation_id}")
 MAIN_JOB_RATE_CARD_PATH = MAIN_JOB_ROOT_PATH + "/rate-card"
 MAIN_JOB_SOP_PATH = MAIN_JOB_ROOT_PATH + "/sop"
@@ -16,6 +22,12 @@ SUB_JOB_PATH = (MAIN_JOB_ROOT_PATH + "/job-{job_name}")
 SUB_JOB_OUTPUT_PATH = SUB_JOB_PATH + "/output"
 SUB_JOB_OUTPUT_AUTOMATED_PATH = SUB_JOB_OUTPUT_PATH + "/automated/output.json"
 SUB_JOB_OUTPUT_MODIFIED_PATH = SUB_JOB_OUTPUT_PATH + "/modified/output.json"
+SUB_JOB_OUTPUT_AUTOMATED_RATE_CARD_PATH = SUB_JOB_OUTPUT_PATH + "/automated/rate_card.xlsx"
+SUB_JOB_OUTPUT_MODIFIED_RATE_CARD_PATH = SUB_JOB_OUTPUT_PATH + "/modified/rate_card.xlsx"
+# sub-job holding the published rate card, written by POST /transformations/{id}/publish
+PUBLISH_JOB_NAME = "publish"
+# uploaded rate cards and SOPs, stored once per distinct content
+CONTENT_ADDRESSED_PATH = ALL_JOBS_ROOT_PATH + "/content/sha256/{sha256}"
 JOBS_CONFIG_PATH = os.path.join(os.path.dirname(__file__), "jobs.yml")
 
 
@@ -24,21 +36,177 @@ JOBS_CONFIG_PATH = os.path.join(os.path.dirname(__file__), "jobs.yml")
 # RC_PARSED_BY_SHEET_PATH = SUB_JOB_OUTPUT_PATH + "/rc_parsed_by_sheets.json"
 # RC_PARSED_DOCLING_PATH = SUB_JOB_OUTPUT_PATH + "/rc_parsed_docling.json"
 
-def get_jobs_config() -> dict[int, str]:    
 
-    # Load YAML file
-    with open(JOBS_CONFIG_PATH, 'r') as file:
-        jobs_config = yaml.safe_load(file)
-    
-    # get the list of the jobs
-    jobs_config_list = jobs_config['jobs']
+@dataclass(frozen=True)
+class JobsConfig:
+    """Parsed content of jobs.yml"""
+    id_to_name: Mapping[int, str]
+    name_to_id: Mapping[str, int]
+    # job name -> names of the jobs it waits for
+    depends_on: Mapping[str, Tuple[str, ...]]
 
-    # transform the list into a dict
-    jobs_config_dict = {job["id"] : job["name"] for job in jobs_config_list}
 
-    return jobs_config_dict
+class JobRegistry:
+    """jobs.yml, parsed once and re-parsed only when the file's mtime changes.
+
+    The mtime is checked at most every `check_interval` seconds, so lookups
+    on hot paths neither parse YAML nor stat the file.
+    """
+
+    def __init__(self, path: str = JOBS_CONFIG_PATH, check_interval: float = 5.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._config: Optional[JobsConfig] = None
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def config(self) -> JobsConfig:
+        if self._config is None or time.monotonic() - self._checked_at >= self.check_interval:
+            self._refresh()
+        return self._config
+
+    @property
+    def id_to_name(self) -> Mapping[int, str]:
+        return self.config.id_to_name
+
+    @property
+    def name_to_id(self) -> Mapping[str, int]:
+        return self.config.name_to_id
+
+    @property
+    def depends_on(self) -> Mapping[str, Tuple[str, ...]]:
+        return self.config.depends_on
+
+    def _refresh(self) -> None:
+        with self._lock:
+            mtime = os.stat(self.path).st_mtime
+            self._checked_at = time.monotonic()
+            if self._config is not None and mtime == self._mtime:
+                return
+
+            # Load YAML file (imported on the first load, not with the app)
+            import yaml
+            with open(self.path, 'r') as file:
+                jobs_config = yaml.safe_load(file)
+
+            # get the list of the jobs
+            jobs_config_list = jobs_config['jobs']
+
+            self._config = JobsConfig(
+                id_to_name={job["id"]: job["name"] for job in jobs_config_list},
+                name_to_id={job["name"]: job["id"] for job in jobs_config_list},
+                depends_on={job["name"]: tuple(job.get("depends_on") or ()) for job in jobs_config_list},
+            )
+            self._mtime = mtime
+
+
+job_registry = JobRegistry()
+
+
+def get_jobs_config() -> dict[int, str]:
+    return dict(job_registry.id_to_name)
 
 
 def get_sub_job_name_from_id(id : int) -> str:
-    jobs_config_dict = get_jobs_config()
-    return jobs_config_dict[id]
\ No newline at end of file
+    return job_registry.id_to_name[id]
+
+
+@dataclass(frozen=True)
+class SubJobPaths:
+    root: str
+    output: str
+    output_automated: str
+    output_modified: str
+    output_automated_rate_card: str
+    output_modified_rate_card: str
+
+
+@dataclass(frozen=True)
+class TransformationPaths:
+    """Every GCS key of one transformation"""
+    root: str
+    rate_card: str
+    sop: str
+    approver_comment: str
+    status: str
+    jobs: Mapping[str, SubJobPaths]
+
+
+def all_jobs_root_path() -> str:
+    """ALL_JOBS_ROOT_PATH, read on use: there is no default the Airflow jobs would agree with"""
+    root = os.getenv("ALL_JOBS_ROOT_PATH", "")
+    if not root:
+        raise ValueError("Bucket prefix of the jobs is not configured (ALL_JOBS_ROOT_PATH)")
+    return root
+
+
+def _suffix(template: str, prefix: str) -> str:
+    assert template.startswith(prefix)
+    return template[len(prefix):]
+
+
+# templates split once into literal suffixes of the transformation root and of
+# a sub-job root, so building a path is plain string concatenation
+# both relative to all_jobs_root_path()
+_ROOT_PREFIX, _ROOT_SUFFIX = _suffix(MAIN_JOB_ROOT_PATH, ALL_JOBS_ROOT_PATH).split("{transformation_id}")
+_CONTENT_PREFIX = _suffix(CONTENT_ADDRESSED_PATH, ALL_JOBS_ROOT_PATH).split("{sha256}")[0]
+_MAIN_SUFFIXES: Tuple[Tuple[str, str], ...] = tuple(
+    (name, _suffix(template, MAIN_JOB_ROOT_PATH))
+    for name, template in (
+        ("rate_card", RATE_CARD_PATH),
+        ("sop", SOP_PATH),
+        ("approver_comment", APPROVER_COMMENT_PATH),
+        ("status", MAIN_JOB_STATUS_PATH),
+    )
+)
+_SUB_JOB_PREFIX, _SUB_JOB_ROOT_SUFFIX = _suffix(SUB_JOB_PATH, MAIN_JOB_ROOT_PATH).split("{job_name}")
+_SUB_JOB_SUFFIXES: Tuple[Tuple[str, str], ...] = tuple(
+    (name, _suffix(template, SUB_JOB_PATH))
+    for name, template in (
+        ("output", SUB_JOB_OUTPUT_PATH),
+        ("output_automated", SUB_JOB_OUTPUT_AUTOMATED_PATH),
+        ("output_modified", SUB_JOB_OUTPUT_MODIFIED_PATH),
+        ("output_automated_rate_card", SUB_JOB_OUTPUT_AUTOMATED_RATE_CARD_PATH),
+        ("output_modified_rate_card", SUB_JOB_OUTPUT_MODIFIED_RATE_CARD_PATH),
+    )
+)
+
+
+def _build_sub_job_paths(root: str, job_names: Tuple[str, ...]) -> Dict[str, SubJobPaths]:
+    jobs = {}
+    for job_name in job_names:
+        job_root = root + _SUB_JOB_PREFIX + job_name + _SUB_JOB_ROOT_SUFFIX
+        jobs[job_name] = SubJobPaths(
+            root=job_root,
+            **{name: job_root + suffix for name, suffix in _SUB_JOB_SUFFIXES},
+        )
+    return jobs
+
+
+@lru_cache(maxsize=1024)
+def _build_transformation_paths(
+    jobs_root: str, transformation_id: str, job_names: Tuple[str, ...]
+) -> TransformationPaths:
+    root = jobs_root + _ROOT_PREFIX + transformation_id + _ROOT_SUFFIX
+    return TransformationPaths(
+        root=root,
+        jobs=_build_sub_job_paths(root, job_names),
+        **{name: root + suffix for name, suffix in _MAIN_SUFFIXES},
+    )
+
+
+def build_transformation_paths(transformation_id: str) -> TransformationPaths:
+    """All MAIN_JOB_* and SUB_JOB_* keys of a transformation, for every job of jobs.yml"""
+    return _build_transformation_paths(all_jobs_root_path(), transformation_id, tuple(job_registry.name_to_id))
+
+
+def build_content_path(sha256: str) -> str:
+    return all_jobs_root_path() + _CONTENT_PREFIX + sha256
+
+
+def build_sub_job_paths(transformation_id: str, job_name: str) -> SubJobPaths:
+    """SUB_JOB_* keys of one job, whether or not it is listed in jobs.yml"""
+    root = all_jobs_root_path() + _ROOT_PREFIX + transformation_id + _ROOT_SUFFIX
+    return _build_sub_job_paths(root, (job_name,))[job_name]
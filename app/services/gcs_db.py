@@ -1,13 +1,28 @@
-from google.cloud import storage
-from typing import BinaryIO
+import base64
+import hashlib
+from functools import lru_cache
+from typing import BinaryIO, Optional
 from app.core.config import settings
 
+
+def md5_hash(file_data: BinaryIO, chunk_size: int = 1024 * 1024) -> str:
+	"""Base64 MD5 of a file, as GCS reports it in Blob.md5_hash"""
+	file_data.seek(0)
+	digest = hashlib.md5()
+	for chunk in iter(lambda: file_data.read(chunk_size), b""):
+		digest.update(chunk)
+	file_data.seek(0)
+	return base64.b64encode(digest.digest()).decode()
+
+
 class GCSService:
-	def __init__(self):
+	def __init__(self, bucket_name: Optional[str] = None):
+		# the heaviest import of the app: paid by the first request that needs the bucket
+		from google.cloud import storage
 		self.client = storage.Client()
-		self.bucket_name = getattr(settings, "GCS_BUCKET_NAME", None)
+		self.bucket_name = bucket_name or settings.GCS_BUCKET
 		if not self.bucket_name:
-			raise ValueError("GCS bucket name is not configured in settings (GCS_BUCKET_NAME)")
+			raise ValueError("GCS bucket name is not configured in settings (GCS_BUCKET)")
 		self.bucket = self.client.bucket(self.bucket_name)
 
 	def upload_file(self, file_data: BinaryIO, destination_blob_name: str, content_type: str) -> str:
@@ -17,6 +32,87 @@ class GCSService:
 		blob.upload_from_file(file_data, content_type=content_type)
 		return f"gs://{self.bucket_name}/{destination_blob_name}"
 
+	def upload_stream(
+		self,
+		file_data: BinaryIO,
+		destination_blob_name: str,
+		content_type: str,
+		chunk_size: Optional[int] = None,
+		if_generation_match: Optional[int] = None,
+	) -> str:
+		"""Upload a file to GCS as a resumable upload sent in chunks.
+
+		With if_generation_match, the upload only replaces that generation of the
+		object (0: the object must not exist) and raises PreconditionFailed otherwise.
+		Blocking: call it from a worker thread when running inside the event loop.
+		"""
+		blob = self.bucket.blob(
+			destination_blob_name,
+			chunk_size=chunk_size or settings.GCS_UPLOAD_CHUNK_SIZE,
+		)
+		file_data.seek(0)
+		blob.upload_from_file(file_data, content_type=content_type, if_generation_match=if_generation_match)
+		return f"gs://{self.bucket_name}/{destination_blob_name}"
+
+	def upload_stream_if_absent(
+		self,
+		file_data: BinaryIO,
+		destination_blob_name: str,
+		content_type: str,
+		chunk_size: Optional[int] = None,
+	) -> bool:
+		"""Chunked upload that never overwrites. Returns False if the object already exists."""
+		from google.api_core.exceptions import PreconditionFailed
+		try:
+			self.upload_stream(file_data, destination_blob_name, content_type, chunk_size, if_generation_match=0)
+		except PreconditionFailed:
+			return False
+		return True
+
+	def copy(
+		self,
+		source_blob_name: str,
+		destination_blob_name: str,
+		if_generation_match: Optional[int] = None,
+	) -> None:
+		"""Server-side copy, the data does not go through this process.
+
+		if_generation_match works as in upload_stream.
+		"""
+		self.bucket.copy_blob(
+			self.bucket.blob(source_blob_name),
+			self.bucket,
+			destination_blob_name,
+			if_generation_match=if_generation_match,
+		)
+
+	def copy_if_absent(self, source_blob_name: str, destination_blob_name: str) -> bool:
+		"""Server-side copy that never overwrites. Returns False if the destination already exists."""
+		from google.api_core.exceptions import PreconditionFailed
+		try:
+			self.copy(source_blob_name, destination_blob_name, if_generation_match=0)
+		except PreconditionFailed:
+			return False
+		return True
+
+	def exists(self, blob_name: str) -> bool:
+		return self.bucket.blob(blob_name).exists()
+
+	def get_blob(self, blob_name: str):
+		"""Metadata (generation, size, ...) of an object, None if it does not exist"""
+		return self.bucket.get_blob(blob_name)
+
+	def download_bytes(
+		self,
+		blob_name: str,
+		generation: int,
+		start: Optional[int] = None,
+		end: Optional[int] = None,
+	) -> bytes:
+		"""Content of one generation of an object, or of the byte range [start, end]"""
+		blob = self.bucket.blob(blob_name)
+		return blob.download_as_bytes(start=start, end=end, if_generation_match=generation)
+
 	def delete_file(self, blob_name: str) -> bool:
 		"""Delete a file from GCS"""
 		try:
@@ -27,4 +123,8 @@ class GCSService:
 			print(f"Error deleting file {blob_name}: {str(e)}")
 			return False
 
-gcs_service = GCSService()
+
+@lru_cache(maxsize=1)
+def get_gcs_service() -> GCSService:
+	"""Return the process-wide GCSService, created on first use"""
+	return GCSService()
@@ -0,0 +1,144 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterator, Optional, Tuple
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.services.gcs_bucket_config import build_sub_job_paths, job_registry
+from app.services.gcs_db import GCSService
+
+OUTPUT_VARIANTS = ("automated", "modified")
+
+
+class OutputCache:
+    """LRU cache of job outputs, bounded by the total size of the cached bytes.
+
+    Entries are keyed by object path and GCS generation: a rewritten object has a
+    new generation, so a stale entry is never served, it only ages out.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[Tuple[str, int], bytes]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, path: str, generation: int) -> Optional[bytes]:
+        key = (path, generation)
+        content = self._entries.get(key)
+        if content is not None:
+            self._entries.move_to_end(key)
+        return content
+
+    def put(self, path: str, generation: int, content: bytes) -> None:
+        if len(content) > self.max_bytes:
+            return
+        key = (path, generation)
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+        self._entries[key] = content
+        self.size += len(content)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+
+output_cache = OutputCache(max_bytes=settings.OUTPUT_CACHE_MAX_BYTES)
+
+
+@dataclass
+class JobOutput:
+    path: str
+    etag: str
+    size: int
+    not_modified: bool = False
+    # small outputs are served from memory, large ones are streamed
+    content: Optional[bytes] = None
+    chunks: Optional[Iterator[bytes]] = None
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+class JobOutputService:
+    def __init__(
+        self,
+        storage: Optional[GCSService],
+        cache: OutputCache = output_cache,
+        max_item_bytes: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+    ):
+        self.storage = storage
+        self.cache = cache
+        self.max_item_bytes = max_item_bytes if max_item_bytes is not None else settings.OUTPUT_CACHE_MAX_ITEM_BYTES
+        self.chunk_size = chunk_size or settings.OUTPUT_STREAM_CHUNK_SIZE
+
+    async def get_output(
+        self,
+        transformation_id: str,
+        job_name: str,
+        variant: str = "automated",
+        if_none_match: Optional[str] = None,
+    ) -> JobOutput:
+        """output.json of a sub-job, from the cache when this generation was read before.
+
+        Only the object metadata is fetched from GCS for a cached or unchanged
+        output; the content is downloaded once per generation.
+        """
+        if self.storage is None:
+            raise HTTPException(status_code=503, detail="Job outputs are not available: no bucket configured")
+        if job_name not in job_registry.name_to_id:
+            raise HTTPException(status_code=404, detail=f"Unknown job {job_name}")
+        if variant not in OUTPUT_VARIANTS:
+            raise HTTPException(status_code=400, detail=f"variant must be one of {', '.join(OUTPUT_VARIANTS)}")
+
+        paths = build_sub_job_paths(transformation_id, job_name)
+        path = paths.output_modified if variant == "modified" else paths.output_automated
+        try:
+            blob = await run_in_threadpool(self.storage.get_blob, path)
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"Error while reading job output from GCS: {str(e)}")
+        if blob is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"No {variant} output for job {job_name} of transformation {transformation_id}"
+            )
+
+        output = JobOutput(path=path, etag=f'"{blob.generation}"', size=blob.size)
+        if etag_matches(if_none_match, output.etag):
+            output.not_modified = True
+            return output
+
+        output.content = self.cache.get(path, blob.generation)
+        if output.content is not None:
+            return output
+
+        if blob.size > self.max_item_bytes:
+            output.chunks = self._iter_chunks(path, blob.generation, blob.size)
+            return output
+
+        try:
+            output.content = await run_in_threadpool(self.storage.download_bytes, path, blob.generation)
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"Error while reading job output from GCS: {str(e)}")
+        self.cache.put(path, blob.generation, output.content)
+        return output
+
+    def _iter_chunks(self, path: str, generation: int, size: int) -> Iterator[bytes]:
+        # blocking ranged reads: the response iterates it in a worker thread
+        for start in range(0, size, self.chunk_size):
+            end = min(start + self.chunk_size, size) - 1
+            yield self.storage.download_bytes(path, generation, start=start, end=end)
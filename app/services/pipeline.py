@@ -0,0 +1,309 @@
+import asyncio
+import importlib
+import json
+import logging
+from concurrent.futures import Executor
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Mapping, Optional, Set, Tuple
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import settings
+from app.schemas.transformations import JobStateEnum
+from app.services.gcs_bucket_config import JobRegistry, job_registry
+from app.services.pipeline_stages import run_stage
+from app.services.transformations import TransformationsService
+
+logger = logging.getLogger(__name__)
+
+Stage = Callable[[str, str], Any]
+
+
+def topological_order(depends_on: Mapping[str, Tuple[str, ...]]) -> List[str]:
+    """Jobs ordered so that each one comes after its dependencies.
+
+    Raises ValueError on unknown dependencies and cycles.
+    """
+    for name, deps in depends_on.items():
+        unknown = [dep for dep in deps if dep not in depends_on]
+        if unknown:
+            raise ValueError(f"Job {name} depends on unknown jobs {unknown}")
+
+    order: List[str] = []
+    placed: Set[str] = set()
+    remaining = list(depends_on)
+    while remaining:
+        ready = [name for name in remaining if all(dep in placed for dep in depends_on[name])]
+        if not ready:
+            raise ValueError(f"Dependency cycle between jobs {remaining}")
+        order.extend(ready)
+        placed.update(ready)
+        remaining = [name for name in remaining if name not in placed]
+    return order
+
+
+class PipelineRunner:
+    """Runs the jobs.yml DAG in this process, without Airflow.
+
+    A job starts as soon as all the jobs it depends on succeeded, so the
+    independent extract-* stages run at the same time on the executor (a
+    process pool by default). Job states, progress and status details are
+    written as stages finish. After a failure no new job is started.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        executor_factory: Callable[[], Executor],
+        stage: Stage = run_stage,
+        registry: JobRegistry = job_registry,
+    ):
+        self.session_factory = session_factory
+        self.executor_factory = executor_factory
+        self.stage = stage
+        self.registry = registry
+        self._executor: Optional[Executor] = None
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = self.executor_factory()
+        return self._executor
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def run(self, transformation_id: str) -> Dict[str, str]:
+        """Run every job for a transformation. Returns the final state of each job.
+
+        An error outside the stages (recording a state, a deleted
+        transformation) ends the run with the unfinished jobs FAILED instead
+        of leaving the transformation PROCESSING.
+        """
+        states: Dict[str, JobStateEnum] = {}
+        try:
+            await self._run_jobs(transformation_id, states)
+        except Exception as e:
+            logger.exception("Pipeline of %s aborted", transformation_id)
+            await self._record_abort(transformation_id, states, e)
+        return {name: state.value for name, state in states.items()}
+
+    async def _record_abort(self, transformation_id: str, states: Dict[str, JobStateEnum], error: Exception) -> None:
+        job_ids = dict(self.registry.name_to_id)
+        message = f"Échec du pipeline: {error}"
+        try:
+            for name, state in states.items():
+                if state in (JobStateEnum.PENDING, JobStateEnum.RUNNING):
+                    states[name] = JobStateEnum.FAILED
+                    await self._record(transformation_id, job_id=job_ids[name], state=JobStateEnum.FAILED)
+            await self._record(transformation_id, status_details={"PROCESSING": False}, message=message)
+        except Exception:
+            # typically the transformation is gone: nothing left to report on
+            logger.exception("Could not record the failure of the pipeline of %s", transformation_id)
+
+    async def _run_jobs(self, transformation_id: str, states: Dict[str, JobStateEnum]) -> None:
+        depends_on = dict(self.registry.depends_on)
+        job_ids = dict(self.registry.name_to_id)
+        order = topological_order(depends_on)
+        states.update((name, JobStateEnum.PENDING) for name in order)
+
+        for name in order:
+            await self._record(transformation_id, job_id=job_ids[name], state=JobStateEnum.PENDING)
+        await self._record(
+            transformation_id,
+            status_details={"PROCESSING": True},
+            progress=0,
+            message="Pipeline démarré",
+        )
+
+        loop = asyncio.get_running_loop()
+        running: Dict[asyncio.Future, str] = {}
+        succeeded: Set[str] = set()
+        failed: Optional[str] = None
+        failure_message: Optional[str] = None
+        while True:
+            if failed is None:
+                for name in order:
+                    if states[name] == JobStateEnum.PENDING and all(dep in succeeded for dep in depends_on[name]):
+                        states[name] = JobStateEnum.RUNNING
+                        await self._record(transformation_id, job_id=job_ids[name], state=JobStateEnum.RUNNING)
+                        future = loop.run_in_executor(self.executor, self.stage, name, transformation_id)
+                        running[future] = name
+            if not running:
+                break
+
+            finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.exception("Pipeline job %s failed for %s", name, transformation_id)
+                    states[name] = JobStateEnum.FAILED
+                    if failed is None:
+                        failed, failure_message = name, f"Échec de l'étape {name}: {e}"
+                    await self._record(
+                        transformation_id,
+                        job_id=job_ids[name],
+                        state=JobStateEnum.FAILED,
+                        message=failure_message,
+                    )
+                    continue
+                states[name] = JobStateEnum.SUCCEEDED
+                succeeded.add(name)
+                await self._record(
+                    transformation_id,
+                    job_id=job_ids[name],
+                    state=JobStateEnum.SUCCEEDED,
+                    progress=100 * len(succeeded) // len(order),
+                    # stages still running after a failure must not hide it
+                    message=f"Étape {name} terminée" if failed is None else failure_message,
+                )
+
+        if failed is None:
+            await self._record(
+                transformation_id,
+                status_details={"REVIEW": True},
+                progress=100,
+                message="Transformation terminée, en attente de revue",
+            )
+
+    async def _record(
+        self,
+        transformation_id: str,
+        job_id: Optional[int] = None,
+        state: Optional[JobStateEnum] = None,
+        status_details: Optional[Dict[str, bool]] = None,
+        progress: Optional[int] = None,
+        message: Optional[str] = None,
+    ) -> None:
+        async with self.session_factory() as db:
+            service = TransformationsService(db=db)
+            if job_id is not None:
+                await service.set_job_state(transformation_id, job_id, state)
+            if status_details is not None or progress is not None or message is not None:
+                await service.update_status(
+                    transformation_id,
+                    status_details=status_details,
+                    progress=progress,
+                    message=message,
+                )
+
+
+class PipelineTrigger:
+    """Starts the pipeline of a newly created transformation
+
+    `inputs` names the objects holding the source files (rate_card_path,
+    sop_path): uploads are stored once per distinct content, not under the
+    transformation prefix.
+    """
+
+    async def trigger(self, transformation_id: str, inputs: Optional[Dict[str, str]] = None) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class LocalPipelineTrigger(PipelineTrigger):
+    """Runs the pipeline in the background of this process"""
+
+    def __init__(self, runner: PipelineRunner):
+        self.runner = runner
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def trigger(self, transformation_id: str, inputs: Optional[Dict[str, str]] = None) -> None:
+        # the stages find the inputs from the transformation row (TransformationsService.source_paths)
+        task = asyncio.create_task(self.runner.run(transformation_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def wait(self) -> None:
+        """Wait for the pipelines started so far"""
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.runner.shutdown()
+
+
+class AirflowPipelineTrigger(PipelineTrigger):
+    """Creates a DAG run through the Airflow REST API"""
+
+    def __init__(self, api_url: str, dag_id: str, auth_token: Optional[str] = None, timeout: float = 10.0):
+        self.api_url = api_url.rstrip("/")
+        self.dag_id = dag_id
+        self.auth_token = auth_token
+        self.timeout = timeout
+
+    async def trigger(self, transformation_id: str, inputs: Optional[Dict[str, str]] = None) -> None:
+        await asyncio.to_thread(self._create_dag_run, transformation_id, inputs or {})
+
+    def _create_dag_run(self, transformation_id: str, inputs: Dict[str, str]) -> None:
+        import urllib.request
+
+        request = urllib.request.Request(
+            f"{self.api_url}/api/v1/dags/{self.dag_id}/dagRuns",
+            data=json.dumps({"conf": {"transformation_id": transformation_id, **inputs}}).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        if self.auth_token:
+            request.add_header("Authorization", f"Bearer {self.auth_token}")
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+def _process_pool() -> Executor:
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    # spawn: forking a process that runs an event loop and threads is unsafe
+    return ProcessPoolExecutor(
+        max_workers=settings.PIPELINE_MAX_WORKERS or None,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+def _local_stage() -> Stage:
+    """Stage callable of the local runner: PIPELINE_LOCAL_STAGE, or the simulation if enabled"""
+    if settings.PIPELINE_LOCAL_STAGE:
+        module_name, _, attribute = settings.PIPELINE_LOCAL_STAGE.partition(":")
+        if not attribute:
+            raise ValueError(f"PIPELINE_LOCAL_STAGE must be 'module:function', got {settings.PIPELINE_LOCAL_STAGE!r}")
+        return getattr(importlib.import_module(module_name), attribute)
+    if settings.PIPELINE_SIMULATE:
+        return run_stage
+    # run_stage does no work: every upload would show as ready for review without output
+    raise ValueError(
+        "PIPELINE_TRIGGER=local needs PIPELINE_LOCAL_STAGE (module:function) or PIPELINE_SIMULATE=true"
+    )
+
+
+@lru_cache(maxsize=1)
+def get_pipeline_trigger() -> PipelineTrigger:
+    """Return the process-wide trigger selected by PIPELINE_TRIGGER"""
+    mode = settings.PIPELINE_TRIGGER.lower()
+    if mode == "none":
+        return PipelineTrigger()
+    if mode == "local":
+        from app.db.session import AsyncSessionLocal
+        return LocalPipelineTrigger(
+            PipelineRunner(AsyncSessionLocal, executor_factory=_process_pool, stage=_local_stage())
+        )
+    if mode == "airflow":
+        return AirflowPipelineTrigger(
+            settings.AIRFLOW_API_URL,
+            settings.AIRFLOW_DAG_ID,
+            auth_token=settings.AIRFLOW_AUTH_TOKEN or None,
+        )
+    raise ValueError(f"Unknown PIPELINE_TRIGGER {settings.PIPELINE_TRIGGER!r} (none, local or airflow)")
+
+
+async def close_pipeline_trigger() -> None:
+    if get_pipeline_trigger.cache_info().currsize:
+        await get_pipeline_trigger().close()
@@ -0,0 +1,16 @@
+"""Entry points of the pipeline stages, executed in worker processes.
+
+This module must stay free of database and web imports: every worker of the
+process pool imports it on start.
+"""
+from typing import Any, Dict
+
+
+def run_stage(job_name: str, transformation_id: str) -> Dict[str, Any]:
+    """Run one jobs.yml stage for a transformation.
+
+    The AI stages themselves run in Airflow; this is the simulation used with
+    PIPELINE_SIMULATE=true: it only marks the stage as done so the DAG, the
+    scheduling and the status updates can be exercised.
+    """
+    return {"job": job_name, "transformation_id": transformation_id}
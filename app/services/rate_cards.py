@@ -0,0 +1,153 @@
+import hashlib
+from collections import OrderedDict
+from typing import Any, BinaryIO, Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.schemas.transformations import TransformationInput
+
+HASH_CHUNK_SIZE = 1024 * 1024
+INSPECTABLE_EXTENSIONS = (".xlsx", ".xlsm")
+
+
+class InspectionCache:
+    """LRU of workbook inspections keyed by the sha256 of the file content"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, sha256: str) -> Optional[Dict[str, Any]]:
+        inspection = self._entries.get(sha256)
+        if inspection is not None:
+            self._entries.move_to_end(sha256)
+        return inspection
+
+    def put(self, sha256: str, inspection: Dict[str, Any]) -> None:
+        self._entries[sha256] = inspection
+        self._entries.move_to_end(sha256)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+inspection_cache = InspectionCache(maxsize=settings.RATE_CARD_INSPECT_CACHE_SIZE)
+
+
+def hash_file(file: BinaryIO) -> str:
+    file.seek(0)
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def parse_workbook(file: BinaryIO) -> List[Dict[str, Any]]:
+    """Sheet names, header row and data row count of each sheet.
+
+    Read-only mode streams the rows from the archive, so the workbook is never
+    held in memory as a whole. The header is the first non-empty row.
+    """
+    # heavy import, only paid when a workbook is actually parsed
+    import openpyxl
+
+    file.seek(0)
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        sheets = []
+        for worksheet in workbook.worksheets:
+            header: Optional[List[str]] = None
+            row_count = 0
+            for row in worksheet.iter_rows(values_only=True):
+                if all(value is None or str(value).strip() == "" for value in row):
+                    continue
+                if header is None:
+                    header = ["" if value is None else str(value).strip() for value in row]
+                    while header and header[-1] == "":
+                        header.pop()
+                else:
+                    row_count += 1
+            sheets.append({"name": worksheet.title, "header": header or [], "row_count": row_count})
+        return sheets
+    finally:
+        workbook.close()
+        file.seek(0)
+
+
+async def inspect_rate_card(excel_file: UploadFile) -> Dict[str, Any]:
+    """Inspection of an uploaded workbook, parsed once per distinct content"""
+    if not excel_file.filename or not excel_file.filename.lower().endswith(INSPECTABLE_EXTENSIONS):
+        raise HTTPException(status_code=400, detail="Only .xlsx files can be inspected")
+
+    sha256 = await run_in_threadpool(hash_file, excel_file.file)
+    inspection = inspection_cache.get(sha256)
+    if inspection is not None:
+        return inspection
+
+    try:
+        sheets = await run_in_threadpool(parse_workbook, excel_file.file)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Excel file could not be read: {str(e)}")
+    inspection = {"sha256": sha256, "sheets": sheets}
+    inspection_cache.put(sha256, inspection)
+    return inspection
+
+
+def sheet_references(data: TransformationInput) -> Tuple[Set[str], List[Tuple[Optional[str], str]]]:
+    """Sheet names and (sheet, column) pairs a TransformationInput refers to"""
+    sheets: Set[str] = set()
+    columns: List[Tuple[Optional[str], str]] = []
+    for dates_item in data.dates:
+        sheets.update(dates_item.sheets or [])
+    if data.sheets_and_filters is not None:
+        sheets.update(data.sheets_and_filters.sheets_to_exclude)
+        for sheet_filter in data.sheets_and_filters.filters:
+            if sheet_filter.sheet_name:
+                sheets.add(sheet_filter.sheet_name)
+            columns.append((sheet_filter.sheet_name, sheet_filter.column))
+    for surcharge in (data.surcharges_included or []) + (data.surcharges_to_be_added or []):
+        if surcharge.sheet_name:
+            sheets.add(surcharge.sheet_name)
+    return sheets, columns
+
+
+def find_reference_errors(inspection: Dict[str, Any], data: TransformationInput) -> List[str]:
+    referenced_sheets, columns = sheet_references(data)
+    headers = {sheet["name"]: set(sheet["header"]) for sheet in inspection["sheets"]}
+    errors = [f"Sheet '{name}' not found in the rate card" for name in sorted(referenced_sheets - set(headers))]
+    for sheet_name, column in columns:
+        if sheet_name is None:
+            if not any(column in header for header in headers.values()):
+                errors.append(f"Column '{column}' not found in any sheet")
+        elif sheet_name in headers and column not in headers[sheet_name]:
+            errors.append(f"Column '{column}' not found in sheet '{sheet_name}'")
+    return errors
+
+
+async def check_sheet_references(excel_file: UploadFile, data: TransformationInput) -> Optional[str]:
+    """Reject an input that names sheets or columns missing from the rate card.
+
+    The workbook is only opened when the input references sheets or columns,
+    and the inspection comes from the same cache as POST /rate-cards/inspect.
+    Returns the sha256 of the workbook when it was inspected, so the upload
+    does not read the file a second time to hash it.
+    """
+    referenced_sheets, columns = sheet_references(data)
+    if not referenced_sheets and not columns:
+        return None
+    if not excel_file.filename or not excel_file.filename.lower().endswith(INSPECTABLE_EXTENSIONS):
+        # legacy .xls cannot be read here, the pipeline checks it
+        return None
+    inspection = await inspect_rate_card(excel_file)
+    errors = find_reference_errors(inspection, data)
+    if errors:
+        raise HTTPException(status_code=400, detail="; ".join(errors))
+    return inspection["sha256"]
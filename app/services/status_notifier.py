@@ -0,0 +1,112 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Set
+
+from app.core.config import settings
+
+StatusSnapshot = Dict[str, Any]
+SnapshotLoader = Callable[[], Awaitable[StatusSnapshot]]
+
+
+class _Channel:
+    def __init__(self, load: SnapshotLoader):
+        self.load = load
+        self.latest: Optional[StatusSnapshot] = None
+        self.loaded = asyncio.Event()
+        self.error: Optional[Exception] = None
+        self.queues: Set[asyncio.Queue] = set()
+        self.refresher: Optional[asyncio.Task] = None
+
+
+class StatusNotifier:
+    """In-process fan-out of transformation status changes.
+
+    Watchers of the same transformation share one channel: the snapshot is read
+    from the database once when the first watcher arrives, then every write
+    published through `publish` is pushed to all of them. Writes made outside
+    this process are picked up by a single refresh task per channel, so the
+    database cost does not grow with the number of watchers.
+    """
+
+    def __init__(self, refresh_interval: float = 0.0):
+        self.refresh_interval = refresh_interval
+        self._channels: Dict[str, _Channel] = {}
+
+    def watcher_count(self, transformation_id: str) -> int:
+        channel = self._channels.get(transformation_id)
+        return len(channel.queues) if channel else 0
+
+    def publish(self, transformation_id: str, snapshot: StatusSnapshot) -> None:
+        """Push a snapshot to the watchers of a transformation if it changed."""
+        channel = self._channels.get(transformation_id)
+        if channel is None or snapshot == channel.latest:
+            return
+        channel.latest = snapshot
+        for queue in channel.queues:
+            queue.put_nowait(snapshot)
+
+    async def subscribe(
+        self,
+        transformation_id: str,
+        load: SnapshotLoader,
+        heartbeat: Optional[float] = None,
+    ) -> AsyncIterator[Optional[StatusSnapshot]]:
+        """Yield the current snapshot, then each change as it is published.
+
+        Yields None when nothing changed for `heartbeat` seconds. Errors raised by
+        `load` for the first watcher (e.g. unknown transformation) propagate to
+        the watchers waiting on it; if that watcher is cancelled instead, the
+        others retry and one of them loads the snapshot.
+        """
+        while True:
+            channel = self._channels.get(transformation_id)
+            if channel is None:
+                channel = _Channel(load)
+                self._channels[transformation_id] = channel
+                try:
+                    channel.latest = await load()
+                except BaseException as e:
+                    if isinstance(e, Exception):
+                        channel.error = e
+                    del self._channels[transformation_id]
+                    raise
+                finally:
+                    channel.loaded.set()
+                if self.refresh_interval > 0:
+                    channel.refresher = asyncio.create_task(self._refresh(transformation_id, channel))
+                break
+            await channel.loaded.wait()
+            if channel.error is not None:
+                raise channel.error
+            if channel.latest is not None:
+                break
+            # the loading watcher was cancelled: nothing to share, load again
+
+        queue: asyncio.Queue = asyncio.Queue()
+        channel.queues.add(queue)
+        try:
+            yield channel.latest
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            channel.queues.discard(queue)
+            if not channel.queues and self._channels.get(transformation_id) is channel:
+                del self._channels[transformation_id]
+                if channel.refresher is not None:
+                    channel.refresher.cancel()
+
+    async def _refresh(self, transformation_id: str, channel: _Channel) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                snapshot = await channel.load()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                continue
+            self.publish(transformation_id, snapshot)
+
+
+status_notifier = StatusNotifier(refresh_interval=settings.STATUS_STREAM_REFRESH_SECONDS)
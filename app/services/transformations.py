@@ -1,74 +1,367 @@
-from datetime import date, datetime, timezone
-from typing import Any, Dict, List, Optional
+import asyncio
+import base64
+import json
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any, AsyncIterator, BinaryIO, Dict, List, Optional, Tuple, Type
 
 from fastapi import HTTPException, UploadFile
-from sqlalchemy import and_
+from pydantic import ValidationError
+from sqlalchemy import and_, delete, func, select, tuple_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
-from app.models.transformations import Transformation
-from app.schemas.transformations import TransformationInput, StatusEnum
+from app.core.metrics import operation
+from app.models.transformations import (
+    STATUS_FLAGS,
+    Carrier,
+    TradeLane,
+    Transformation,
+    TransformationDateRange,
+    TransformationExcludedSheet,
+    TransformationJob,
+    TransformationSurcharge,
+)
+from app.schemas.transformations import TransformationInput, StatusEnum, JobStateEnum
+from app.services.gcs_bucket_config import (
+    PUBLISH_JOB_NAME,
+    build_content_path,
+    build_sub_job_paths,
+    build_transformation_paths,
+)
+from app.services.gcs_db import GCSService, md5_hash
+from app.services.rate_cards import check_sheet_references, hash_file
+from app.services.status_notifier import status_notifier
+
+if TYPE_CHECKING:
+    from app.services.pipeline import PipelineTrigger
+
+logger = logging.getLogger(__name__)
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+DOCX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+class LookupCache:
+    """In-process cache of the carrier/trade lane dictionaries.
+
+    Writers call `invalidate` after committing a new value. The generation
+    counter keeps a read that started before the write from caching a stale list.
+    """
+
+    def __init__(self):
+        self._values: Dict[str, List[str]] = {}
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key: str) -> Optional[List[str]]:
+        return self._values.get(key)
+
+    def set(self, key: str, values: List[str], generation: int) -> None:
+        if generation == self._generation:
+            self._values[key] = values
+
+    def invalidate(self, *keys: str) -> None:
+        self._generation += 1
+        for key in keys:
+            self._values.pop(key, None)
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._values.clear()
+
+
+lookup_cache = LookupCache()
+
+
+def encode_cursor(created_at: datetime, transformation_id: str) -> str:
+    """Opaque pagination cursor pointing at the last row of a page"""
+    payload = json.dumps([created_at.isoformat(), transformation_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, transformation_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), str(transformation_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+# what a list page shows of a transformation
+LIST_COLUMNS = (
+    Transformation.id,
+    Transformation.created_at,
+    Transformation.status,
+    Transformation.carrier,
+    Transformation.trade_lane,
+    Transformation.xlsx_name,
+    Transformation.docx_name,
+)
+
+
+def list_item(row: Any) -> Dict[str, Any]:
+    """Same shape as Transformation.to_dict, from a row of LIST_COLUMNS"""
+    return {
+        "id": row.id,
+        "created_at": row.created_at.isoformat(),
+        "status": row.status,
+        "carrier": row.carrier,
+        "trade_lane": row.trade_lane,
+        "file_names": {
+            "xlsx_name": row.xlsx_name,
+            "docx_name": row.docx_name
+        }
+    }
 
 
 class TransformationsService:
-    def __init__(self, db: Session):
+    def __init__(
+        self,
+        db: AsyncSession,
+        storage: Optional[GCSService] = None,
+        trigger: Optional["PipelineTrigger"] = None,
+    ):
         if db is None:
             raise ValueError("Database session cannot be None")
         self.db = db
+        self.storage = storage
+        self.trigger = trigger
 
-    def create_transformation(
+    @operation
+    async def create_transformation(
         self,
         excel_file: UploadFile,
         word_file: UploadFile,
         data: TransformationInput
     ) -> Dict[str, Any]:
-        try:
-            now = datetime.now(timezone.utc)
-            timestamp = now.strftime("%Y%m%d%H%M%S%f")
-            transformation_id = f"{data.carrier}_{data.trade_lane}_{timestamp}"
-
-            transformation = Transformation(
-                id=transformation_id,
-                created_at=now,
-                status=StatusEnum.IN_PROGRESS.value,
-                carrier=data.carrier,
-                trade_lane=data.trade_lane,
-                xlsx_name=excel_file.filename,
-                docx_name=word_file.filename,
-                progress=0,
-                message="Transformation créée avec succès"
-            )
-
-            transformation.set_transformation_data(data.model_dump())
-            transformation.set_status_details({
-                "UPLOAD_COMPLETE": True,
-                "PROCESSING": False,
-                "REVIEW": False,
-                "READY_TO_PUBLISH": False
-            })
+        now = datetime.now(timezone.utc)
+        timestamp = now.strftime("%Y%m%d%H%M%S%f")
+        transformation_id = f"{data.carrier}_{data.trade_lane}_{timestamp}"
 
-            self.db.add(transformation)
-            self.db.commit()
-            self.db.refresh(transformation)
+        xlsx_sha256 = await check_sheet_references(excel_file, data)
+        hashes = await self._upload_source_files(excel_file, word_file, xlsx_sha256)
 
-            return {
-                "items": [transformation.to_dict()],
-                "next_cursor": None
-            }
+        try:
+            transformation = self._new_transformation(transformation_id, now, excel_file, word_file, data, hashes)
+            self.db.add(transformation)
+            self.db.add_all(self._build_data_index(transformation_id, data))
+            new_lookups = await self._add_lookup_values(data.carrier, data.trade_lane)
+            await self.db.commit()
+            await self.db.refresh(transformation)
+            if new_lookups:
+                lookup_cache.invalidate(*new_lookups)
         except SQLAlchemyError as e:
-            self.db.rollback()
+            await self.db.rollback()
             raise HTTPException(
                 status_code=500,
                 detail=f"Database error while creating transformation: {str(e)}"
             )
-        
+
         # TODO
-        # upload the both files into gcs bucket in .xlsx and .docx format
         # upload the transformationinput in json format into gcs bucket
-        # trigger the dag airflow to launch the ai transformation with passing the transformation_id as an input
+        await self._start_pipeline(transformation)
+
+        return {
+            "items": [transformation.to_dict()],
+            "next_cursor": None
+        }
+
+    @operation
+    async def create_transformations_batch(
+        self,
+        items: List[Tuple[UploadFile, UploadFile, TransformationInput]],
+        concurrency: int = 4,
+    ) -> Dict[str, Any]:
+        """Create many transformations: concurrent uploads, then one transaction.
+
+        At most `concurrency` items upload at a time. An item whose files could
+        not be uploaded is reported as failed and left out of the transaction;
+        the others are inserted together and committed once.
+        """
+        errors = []
+        xlsx_hashes: List[Optional[str]] = []
+        for index, (excel_file, _, data) in enumerate(items):
+            try:
+                xlsx_hashes.append(await check_sheet_references(excel_file, data))
+            except HTTPException as e:
+                errors.append({"index": index, "error": e.detail})
+        if errors:
+            raise HTTPException(status_code=400, detail=errors)
+
+        now = datetime.now(timezone.utc)
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        prepared = []
+        for index, (excel_file, word_file, data) in enumerate(items):
+            # distinct timestamps keep ids unique within the batch
+            created_at = now + timedelta(microseconds=index)
+            transformation_id = f"{data.carrier}_{data.trade_lane}_{created_at.strftime('%Y%m%d%H%M%S%f')}"
+            prepared.append((transformation_id, created_at, excel_file, word_file, data))
+
+        async def upload(excel_file, word_file, xlsx_sha256):
+            async with semaphore:
+                return await self._upload_source_files(excel_file, word_file, xlsx_sha256)
+
+        uploads = await asyncio.gather(
+            *(
+                upload(excel_file, word_file, xlsx_sha256)
+                for (_, _, excel_file, word_file, _), xlsx_sha256 in zip(prepared, xlsx_hashes)
+            ),
+            return_exceptions=True,
+        )
+
+        results: List[Dict[str, Any]] = []
+        created: List[Tuple[int, Transformation]] = []
+        try:
+            for index, ((transformation_id, created_at, excel_file, word_file, data), outcome) in enumerate(
+                zip(prepared, uploads)
+            ):
+                if isinstance(outcome, BaseException):
+                    detail = outcome.detail if isinstance(outcome, HTTPException) else str(outcome)
+                    results.append({"index": index, "id": None, "status": "failed", "error": detail})
+                    continue
+                transformation = self._new_transformation(
+                    transformation_id, created_at, excel_file, word_file, data, outcome
+                )
+                self.db.add(transformation)
+                self.db.add_all(self._build_data_index(transformation_id, data))
+                created.append((index, transformation))
+                results.append({"index": index, "id": transformation_id, "status": "created", "error": None})
+
+            new_lookups = set()
+            for carrier, trade_lane in {(t.carrier, t.trade_lane) for _, t in created}:
+                new_lookups.update(await self._add_lookup_values(carrier, trade_lane))
+            if created:
+                await self.db.commit()
+            if new_lookups:
+                lookup_cache.invalidate(*new_lookups)
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            raise HTTPException(
+                status_code=500,
+                detail=f"Database error while creating transformations: {str(e)}"
+            )
+
+        for _, transformation in created:
+            await self._start_pipeline(transformation)
+
+        transformations = {index: transformation.to_dict() for index, transformation in created}
+        for result in results:
+            result["transformation"] = transformations.get(result["index"])
+        return {"items": results}
+
+    async def _start_pipeline(self, transformation: Transformation) -> None:
+        if self.trigger is None:
+            return
+        rate_card_path, sop_path = self.source_paths(
+            transformation.id, transformation.xlsx_sha256, transformation.docx_sha256
+        )
+        try:
+            await self.trigger.trigger(
+                transformation.id, inputs={"rate_card_path": rate_card_path, "sop_path": sop_path}
+            )
+        except Exception:
+            # the transformation is saved, its pipeline can be started again later
+            logger.exception("Could not start the pipeline of %s", transformation.id)
+
+    def _new_transformation(
+        self,
+        transformation_id: str,
+        created_at: datetime,
+        excel_file: UploadFile,
+        word_file: UploadFile,
+        data: TransformationInput,
+        hashes: Dict[str, Optional[str]],
+    ) -> Transformation:
+        transformation = Transformation(
+            id=transformation_id,
+            created_at=created_at,
+            status=StatusEnum.IN_PROGRESS.value,
+            carrier=data.carrier,
+            trade_lane=data.trade_lane,
+            xlsx_name=excel_file.filename,
+            docx_name=word_file.filename,
+            xlsx_sha256=hashes["xlsx_sha256"],
+            docx_sha256=hashes["docx_sha256"],
+            progress=0,
+            message="Transformation créée avec succès"
+        )
+
+        transformation.set_transformation_data(data.model_dump())
+        transformation.set_status_details({
+            "UPLOAD_COMPLETE": True,
+            "PROCESSING": False,
+            "REVIEW": False,
+            "READY_TO_PUBLISH": False
+        })
+        return transformation
 
+    async def _upload_source_files(
+        self,
+        excel_file: UploadFile,
+        word_file: UploadFile,
+        xlsx_sha256: Optional[str] = None,
+    ) -> Dict[str, Optional[str]]:
+        """Store the rate card and the SOP once per distinct content.
+
+        Each file is hashed and kept under its content-addressed key only; a
+        file the bucket already holds is not uploaded again. The pipeline is
+        given these keys (see _start_pipeline), nothing is written under the
+        transformation prefix. Both files are handled at the same time in
+        worker threads. `xlsx_sha256` is the hash already computed by the
+        sheet check, if any, so a large workbook is not read twice. Returns the
+        sha256 of each file, the pointers saved on the transformation.
+        """
+        if self.storage is None:
+            return {"xlsx_sha256": None, "docx_sha256": None}
+
+        uploads = [(excel_file, XLSX_CONTENT_TYPE, xlsx_sha256), (word_file, DOCX_CONTENT_TYPE, None)]
+        results = await asyncio.gather(
+            *(
+                run_in_threadpool(self._store_content, upload.file, content_type, sha256)
+                for upload, content_type, sha256 in uploads
+            ),
+            return_exceptions=True,
+        )
+
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors:
+            # nothing to clean up: the stored objects may already be shared with other transformations
+            raise HTTPException(
+                status_code=502,
+                detail=f"Error while uploading files to GCS: {str(errors[0])}"
+            )
 
-    def list_transformations(
+        return {"xlsx_sha256": results[0], "docx_sha256": results[1]}
+
+    def _store_content(self, file_data: BinaryIO, content_type: str, sha256: Optional[str] = None) -> str:
+        if sha256 is None:
+            sha256 = hash_file(file_data)
+        blob_name = build_content_path(sha256)
+        if not self.storage.exists(blob_name):
+            # a concurrent upload of the same content wins the race: same bytes either way
+            self.storage.upload_stream_if_absent(file_data, blob_name, content_type)
+        return sha256
+
+    @staticmethod
+    def source_paths(transformation_id: str, xlsx_sha256: Optional[str], docx_sha256: Optional[str]) -> Tuple[str, str]:
+        """Objects holding the rate card and the SOP of a transformation"""
+        # rows created before content addressing use the per-transformation layout
+        paths = build_transformation_paths(transformation_id)
+        return (
+            build_content_path(xlsx_sha256) if xlsx_sha256 else paths.rate_card,
+            build_content_path(docx_sha256) if docx_sha256 else paths.sop,
+        )
+
+
+    @operation
+    async def list_transformations(
         self,
         cursor: Optional[str] = None,
         limit: int = 20,
@@ -77,49 +370,183 @@ class TransformationsService:
         carrier: Optional[List[str]] = None,
         trade_lane: Optional[List[str]] = None,
         status: Optional[List[str]] = None,
+        stage: Optional[List[str]] = None,
     ) -> Dict[str, Any]:
-        try:
-            query = self.db.query(Transformation)
+        filters = self._build_filters(
+            date_start=date_start,
+            date_end=date_end,
+            carrier=carrier,
+            trade_lane=trade_lane,
+            status=status,
+            stage=stage,
+        )
+        return await self._list_page(filters, cursor, limit)
+
+    @operation
+    async def search_transformations(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = 20,
+        surcharge_added: Optional[List[str]] = None,
+        surcharge_excluded: Optional[List[str]] = None,
+        surcharge_included: Optional[List[str]] = None,
+        sheet_excluded: Optional[List[str]] = None,
+        valid_on: Optional[date] = None,
+        carrier: Optional[List[str]] = None,
+        trade_lane: Optional[List[str]] = None,
+        status: Optional[List[str]] = None,
+        stage: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """List transformations by the content of their TransformationInput.
+
+        Every criterion goes through the indexed side tables written with the
+        transformation; transformation_data itself is never decoded.
+        """
+        filters = self._build_filters(carrier=carrier, trade_lane=trade_lane, status=status, stage=stage)
+
+        for kind, codes in (
+            ("ADDED", surcharge_added),
+            ("EXCLUDED", surcharge_excluded),
+            ("INCLUDED", surcharge_included),
+        ):
+            if codes:
+                filters.append(Transformation.id.in_(
+                    select(TransformationSurcharge.transformation_id).where(
+                        TransformationSurcharge.kind == kind,
+                        TransformationSurcharge.surcharge_code.in_(codes),
+                    )
+                ))
+
+        if sheet_excluded:
+            filters.append(Transformation.id.in_(
+                select(TransformationExcludedSheet.transformation_id).where(
+                    TransformationExcludedSheet.sheet_name.in_(sheet_excluded)
+                )
+            ))
+
+        if valid_on:
+            filters.append(Transformation.id.in_(
+                select(TransformationDateRange.transformation_id).where(
+                    TransformationDateRange.application_date <= valid_on,
+                    TransformationDateRange.validity_date >= valid_on,
+                )
+            ))
+
+        return await self._list_page(filters, cursor, limit)
+
+    async def export_transformations(
+        self,
+        date_start: Optional[date] = None,
+        date_end: Optional[date] = None,
+        carrier: Optional[List[str]] = None,
+        trade_lane: Optional[List[str]] = None,
+        status: Optional[List[str]] = None,
+        stage: Optional[List[str]] = None,
+        include_data: bool = False,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Every transformation matching the list filters, newest first, in batches.
 
-            filters = []
+        The rows come from one server-side cursor fetched batch_size rows at a
+        time, so memory does not grow with the size of the result. With
+        include_data, each item also has its decoded transformation_data.
+        """
+        filters = self._build_filters(
+            date_start=date_start,
+            date_end=date_end,
+            carrier=carrier,
+            trade_lane=trade_lane,
+            status=status,
+            stage=stage,
+        )
+        columns = LIST_COLUMNS + (Transformation.transformation_data,) if include_data else LIST_COLUMNS
+        query = select(*columns)
+        if filters:
+            query = query.where(and_(*filters))
+        query = query.order_by(Transformation.created_at.desc(), Transformation.id.desc())
 
-            if date_start:
-                start_datetime = datetime.combine(date_start, datetime.min.time())
-                filters.append(Transformation.created_at >= start_datetime)
+        result = await self.db.stream(query.execution_options(yield_per=batch_size))
+        try:
+            async for rows in result.partitions():
+                items = [list_item(row) for row in rows]
+                if include_data:
+                    for item, row in zip(items, rows):
+                        item["transformation_data"] = Transformation.decode_transformation_data(row.transformation_data)
+                yield items
+        finally:
+            await result.close()
 
-            if date_end:
-                end_datetime = datetime.combine(date_end, datetime.max.time())
-                filters.append(Transformation.created_at <= end_datetime)
+    @operation
+    async def rebuild_data_index(self, batch_size: int = 500) -> int:
+        """Rebuild the search side tables from transformation_data.
 
-            if carrier:
-                filters.append(Transformation.carrier.in_(carrier))
+        The bootstrap indexes the history once per database (data migration
+        index_transformation_data); this is the manual repair, for side tables
+        that drifted. Returns the number of transformations indexed.
+        """
+        try:
+            for model in (TransformationSurcharge, TransformationExcludedSheet, TransformationDateRange):
+                await self.db.execute(delete(model))
 
-            if trade_lane:
-                filters.append(Transformation.trade_lane.in_(trade_lane))
+            indexed = 0
+            last_id = ""
+            while True:
+                result = await self.db.execute(
+                    select(Transformation.id, Transformation.transformation_data)
+                    .where(Transformation.id > last_id)
+                    .order_by(Transformation.id)
+                    .limit(batch_size)
+                )
+                rows = result.all()
+                if not rows:
+                    break
+                for row in rows:
+                    try:
+                        data = TransformationInput.model_validate_json(row.transformation_data or "")
+                    except ValidationError:
+                        continue
+                    self.db.add_all(self._build_data_index(row.id, data))
+                    indexed += 1
+                await self.db.flush()
+                last_id = rows[-1].id
 
-            if status:
-                filters.append(Transformation.status.in_(status))
+            await self.db.commit()
+            return indexed
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            raise HTTPException(
+                status_code=500,
+                detail=f"Database error while rebuilding the search index: {str(e)}"
+            )
+
+    async def _list_page(self, filters: List[Any], cursor: Optional[str], limit: int) -> Dict[str, Any]:
+        try:
+            # plain rows of the listed columns: no ORM objects, no identity map,
+            # and the large transformation_data column is never read
+            query = select(*LIST_COLUMNS)
 
             if filters:
-                query = query.filter(and_(*filters))
+                query = query.where(and_(*filters))
 
             if cursor:
-                try:
-                    cursor_time = datetime.fromisoformat(cursor)
-                    query = query.filter(Transformation.created_at < cursor_time)
-                except (ValueError, TypeError):
-                    pass
+                # (created_at, id) is unique, so rows sharing a timestamp are neither skipped nor repeated
+                cursor_time, cursor_id = decode_cursor(cursor)
+                query = query.where(
+                    tuple_(Transformation.created_at, Transformation.id) < tuple_(cursor_time, cursor_id)
+                )
 
-            query = query.order_by(Transformation.created_at.desc())
-            transformations = query.limit(limit + 1).all()
+            query = query.order_by(Transformation.created_at.desc(), Transformation.id.desc())
+            result = await self.db.execute(query.limit(limit + 1))
+            rows = result.all()
 
             next_cursor = None
-            if len(transformations) > limit:
-                next_cursor = transformations[limit - 1].created_at.isoformat()
-                transformations = transformations[:limit]
+            if len(rows) > limit:
+                last = rows[limit - 1]
+                next_cursor = encode_cursor(last.created_at, last.id)
+                rows = rows[:limit]
 
             return {
-                "items": [t.to_dict() for t in transformations],
+                "items": [list_item(row) for row in rows],
                 "next_cursor": next_cursor
             }
         except SQLAlchemyError as e:
@@ -128,19 +555,136 @@ class TransformationsService:
                 detail=f"Database error while listing transformations: {str(e)}"
             )
 
-    def get_status_details(self, transformation_id: str) -> Dict[str, bool]:
+    @operation
+    async def get_facets(
+        self,
+        date_start: Optional[date] = None,
+        date_end: Optional[date] = None,
+        carrier: Optional[List[str]] = None,
+        trade_lane: Optional[List[str]] = None,
+        status: Optional[List[str]] = None,
+        stage: Optional[List[str]] = None,
+    ) -> Dict[str, Dict[str, int]]:
+        """Per-value counts of carrier, trade_lane, status and stage under the applied filters.
+
+        Each facet applies every filter except its own, so the counts show what
+        selecting another value would return. All four come from one grouped query.
+        """
         try:
-            transformation = self.db.query(Transformation).filter(
-                Transformation.id == transformation_id
-            ).first()
+            query = (
+                select(
+                    Transformation.carrier,
+                    Transformation.trade_lane,
+                    Transformation.status,
+                    Transformation.stage,
+                    func.count().label("count"),
+                )
+                .group_by(
+                    Transformation.carrier, Transformation.trade_lane, Transformation.status, Transformation.stage
+                )
+            )
 
-            if not transformation:
+            filters = self._build_filters(date_start=date_start, date_end=date_end)
+            if filters:
+                query = query.where(and_(*filters))
+
+            result = await self.db.execute(query)
+        except SQLAlchemyError as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Database error while counting facets: {str(e)}"
+            )
+
+        selected = {
+            "carrier": set(carrier) if carrier else None,
+            "trade_lane": set(trade_lane) if trade_lane else None,
+            "status": {getattr(s, "value", s) for s in status} if status else None,
+            "stage": {getattr(s, "value", s) for s in stage} if stage else None,
+        }
+        facets: Dict[str, Dict[str, int]] = {name: {} for name in selected}
+
+        for row in result:
+            values = {"carrier": row.carrier, "trade_lane": row.trade_lane, "status": row.status, "stage": row.stage}
+            for facet, counts in facets.items():
+                if values[facet] is None:
+                    # no StatusDetails flag set yet: no stage value to count
+                    continue
+                if all(
+                    allowed is None or values[other] in allowed
+                    for other, allowed in selected.items()
+                    if other != facet
+                ):
+                    counts[values[facet]] = counts.get(values[facet], 0) + row.count
+
+        return facets
+
+    @staticmethod
+    def _build_filters(
+        date_start: Optional[date] = None,
+        date_end: Optional[date] = None,
+        carrier: Optional[List[str]] = None,
+        trade_lane: Optional[List[str]] = None,
+        status: Optional[List[str]] = None,
+        stage: Optional[List[str]] = None,
+    ) -> List[Any]:
+        filters = []
+
+        if date_start:
+            start_datetime = datetime.combine(date_start, datetime.min.time())
+            filters.append(Transformation.created_at >= start_datetime)
+
+        if date_end:
+            end_datetime = datetime.combine(date_end, datetime.max.time())
+            filters.append(Transformation.created_at <= end_datetime)
+
+        if carrier:
+            filters.append(Transformation.carrier.in_(carrier))
+
+        if trade_lane:
+            filters.append(Transformation.trade_lane.in_(trade_lane))
+
+        if status:
+            filters.append(Transformation.status.in_(status))
+
+        if stage:
+            filters.append(Transformation.stage.in_(stage))
+
+        return filters
+
+    @operation
+    async def get_status_details(self, transformation_id: str) -> Dict[str, bool]:
+        snapshot = await self._load_status_snapshot(transformation_id)
+        return snapshot["status_details"]
+
+    @operation
+    async def get_status_snapshot(self, transformation_id: str) -> Dict[str, Any]:
+        """Status details, progress and message, without loading the whole row"""
+        return await self._load_status_snapshot(transformation_id)
+
+    async def _load_status_snapshot(self, transformation_id: str) -> Dict[str, Any]:
+        # not instrumented: timed and labeled as the public method that calls it
+        try:
+            result = await self.db.execute(
+                select(
+                    Transformation.status_flags,
+                    Transformation.progress,
+                    Transformation.message,
+                ).where(Transformation.id == transformation_id)
+            )
+            row = result.first()
+
+            if not row:
                 raise HTTPException(
                     status_code=404,
                     detail=f"Transformation {transformation_id} not found"
                 )
 
-            return transformation.get_status_details()
+            return {
+                "id": transformation_id,
+                "status_details": Transformation.decode_status_flags(row.status_flags),
+                "progress": row.progress,
+                "message": row.message,
+            }
         except HTTPException:
             raise
         except SQLAlchemyError as e:
@@ -149,18 +693,313 @@ class TransformationsService:
                 detail=f"Database error while fetching status details: {str(e)}"
             )
 
-    def get_trade_lanes(self) -> List[str]:
+    @operation
+    async def get_status_snapshots(self, transformation_ids: List[str]) -> List[Dict[str, Any]]:
+        """Status snapshots of many transformations with one IN query.
+
+        Results follow the order of `transformation_ids`; unknown ids are
+        reported with found=False instead of failing the call.
+        """
+        unique_ids = list(dict.fromkeys(transformation_ids))
+        if not unique_ids:
+            return []
+        try:
+            result = await self.db.execute(
+                select(
+                    Transformation.id,
+                    Transformation.status_flags,
+                    Transformation.progress,
+                    Transformation.message,
+                ).where(Transformation.id.in_(unique_ids))
+            )
+            rows = {row.id: row for row in result}
+        except SQLAlchemyError as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Database error while fetching status details: {str(e)}"
+            )
+
+        snapshots = []
+        for transformation_id in unique_ids:
+            row = rows.get(transformation_id)
+            if row is None:
+                snapshots.append({"id": transformation_id, "found": False})
+                continue
+            snapshots.append({
+                "id": transformation_id,
+                "found": True,
+                "status_details": Transformation.decode_status_flags(row.status_flags),
+                "progress": row.progress,
+                "message": row.message,
+            })
+        return snapshots
+
+    @operation
+    async def update_status(
+        self,
+        transformation_id: str,
+        status_details: Optional[Dict[str, bool]] = None,
+        progress: Optional[int] = None,
+        message: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Update the in-progress status and push it to the status stream watchers"""
         try:
-            trade_lanes = self.db.query(Transformation.trade_lane).distinct().all()
-            return [tl[0] for tl in trade_lanes]
+            transformation = await self.db.get(Transformation, transformation_id)
+
+            if not transformation:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Transformation {transformation_id} not found"
+                )
+
+            if status_details is not None:
+                details = transformation.get_status_details()
+                details.update(status_details)
+                transformation.set_status_details(details)
+            if progress is not None:
+                transformation.progress = progress
+            if message is not None:
+                transformation.message = message
+
+            await self.db.commit()
+        except HTTPException:
+            raise
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            raise HTTPException(
+                status_code=500,
+                detail=f"Database error while updating status details: {str(e)}"
+            )
+
+        snapshot = {
+            "id": transformation_id,
+            "status_details": transformation.get_status_details(),
+            "progress": transformation.progress,
+            "message": transformation.message,
+        }
+        status_notifier.publish(transformation_id, snapshot)
+        return snapshot
+
+    @operation
+    async def publish_transformation(
+        self,
+        transformation_id: str,
+        modified: bool,
+        excel_file: Optional[UploadFile] = None,
+    ) -> Dict[str, Any]:
+        """Store the final rate card and set READY_TO_PUBLISH.
+
+        The modified workbook is streamed to the publish sub-job; without
+        modification the source rate card is copied inside the bucket. Retries
+        are safe: nothing is uploaded once the flag is set or when the object
+        already holds the same bytes, and the flag is set by a conditional
+        UPDATE that only one call can win.
+        published_path is the object recorded by the winning call, whatever the
+        variant requested by a later one.
+        """
+        result = await self.db.execute(
+            select(Transformation.status_flags, Transformation.xlsx_sha256)
+            .where(Transformation.id == transformation_id)
+        )
+        row = result.first()
+        if row is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Transformation {transformation_id} not found"
+            )
+        status_flags = row.status_flags
+
+        ready_bit = 1 << STATUS_FLAGS.index("READY_TO_PUBLISH")
+        paths = build_sub_job_paths(transformation_id, PUBLISH_JOB_NAME)
+        published_path = paths.output_modified_rate_card if modified else paths.output_automated_rate_card
+        if self.storage is None:
+            published_path = None
+        elif not status_flags & ready_bit:
+            source_path, _ = self.source_paths(transformation_id, row.xlsx_sha256, None)
+            await self._store_published_rate_card(source_path, published_path, modified, excel_file)
+
+        try:
+            result = await self.db.execute(
+                update(Transformation)
+                .where(
+                    Transformation.id == transformation_id,
+                    Transformation.status_flags.op("&")(ready_bit) == 0,
+                )
+                .values(
+                    status_flags=Transformation.status_flags.op("|")(ready_bit),
+                    stage=Transformation.stage_from_flags(ready_bit),
+                    published_path=published_path,
+                )
+            )
+            if result.rowcount != 1:
+                # published by an earlier or concurrent call: its object, not this request's variant
+                published_path = await self.db.scalar(
+                    select(Transformation.published_path).where(Transformation.id == transformation_id)
+                )
+            await self.db.commit()
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            raise HTTPException(
+                status_code=500,
+                detail=f"Database error while publishing transformation: {str(e)}"
+            )
+        published_now = result.rowcount == 1
+
+        snapshot = await self._load_status_snapshot(transformation_id)
+        if published_now:
+            status_notifier.publish(transformation_id, snapshot)
+        return {
+            "id": transformation_id,
+            "modified": modified,
+            "already_published": not published_now,
+            "published_path": published_path,
+            "status_details": snapshot["status_details"],
+        }
+
+    async def _store_published_rate_card(
+        self,
+        source_path: str,
+        published_path: str,
+        modified: bool,
+        excel_file: Optional[UploadFile],
+    ) -> None:
+        try:
+            # a previous attempt may have stored it before failing to set the flag:
+            # reused only if it holds the same bytes, a corrected workbook replaces it
+            existing = await run_in_threadpool(self.storage.get_blob, published_path)
+            generation = existing.generation if existing is not None else 0
+            if modified:
+                if existing is not None and existing.md5_hash == await run_in_threadpool(md5_hash, excel_file.file):
+                    return
+                await run_in_threadpool(
+                    self.storage.upload_stream,
+                    excel_file.file, published_path, XLSX_CONTENT_TYPE, None, generation,
+                )
+            else:
+                if existing is not None:
+                    source = await run_in_threadpool(self.storage.get_blob, source_path)
+                    if source is not None and source.md5_hash == existing.md5_hash:
+                        return
+                await run_in_threadpool(self.storage.copy, source_path, published_path, generation)
+        except Exception as e:
+            raise HTTPException(
+                status_code=502,
+                detail=f"Error while storing the published rate card in GCS: {str(e)}"
+            )
+
+    @operation
+    async def set_job_state(self, transformation_id: str, job_id: int, state: JobStateEnum) -> None:
+        """Record the state of one jobs.yml sub-job"""
+        try:
+            now = datetime.now(timezone.utc)
+            await self.db.execute(
+                sqlite_insert(TransformationJob)
+                .values(transformation_id=transformation_id, job_id=job_id, state=state.value, updated_at=now)
+                .on_conflict_do_update(
+                    index_elements=["transformation_id", "job_id"],
+                    set_={"state": state.value, "updated_at": now},
+                )
+            )
+            await self.db.commit()
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            raise HTTPException(
+                status_code=500,
+                detail=f"Database error while updating job state: {str(e)}"
+            )
+
+    @operation
+    async def get_job_states(self, transformation_id: str) -> Dict[int, str]:
+        """Sub-job states by job id; jobs that never started have no entry"""
+        try:
+            result = await self.db.execute(
+                select(TransformationJob.job_id, TransformationJob.state)
+                .where(TransformationJob.transformation_id == transformation_id)
+            )
+            return {row.job_id: row.state for row in result}
+        except SQLAlchemyError as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Database error while fetching job states: {str(e)}"
+            )
+
+    @operation
+    async def get_trade_lanes(self) -> List[str]:
+        try:
+            return await self._get_lookup("trade_lanes", TradeLane)
         except SQLAlchemyError as e:
             raise HTTPException(
                 status_code=500,
                 detail=f"Database error while fetching trade lanes: {str(e)}"
             )
-    
-    # TODO : service get trade_lanes
-    # logic to implement : return an array of unique values of the column trade lane of the history table
+
+    @operation
+    async def get_carriers(self) -> List[str]:
+        try:
+            return await self._get_lookup("carriers", Carrier)
+        except SQLAlchemyError as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Database error while fetching carriers: {str(e)}"
+            )
+
+    @staticmethod
+    def _build_data_index(transformation_id: str, data: TransformationInput) -> List[Any]:
+        """Side-table rows that make the TransformationInput searchable"""
+        rows: List[Any] = []
+
+        surcharges = {
+            ("ADDED", s.surcharge_code) for s in data.surcharges_to_be_added or []
+        } | {
+            ("EXCLUDED", code) for code in data.surcharges_to_exclude or []
+        } | {
+            ("INCLUDED", s.surcharge_code) for s in data.surcharges_included or []
+        }
+        rows.extend(
+            TransformationSurcharge(transformation_id=transformation_id, kind=kind, surcharge_code=code)
+            for kind, code in sorted(surcharges)
+        )
+
+        if data.sheets_and_filters:
+            rows.extend(
+                TransformationExcludedSheet(transformation_id=transformation_id, sheet_name=sheet)
+                for sheet in sorted(set(data.sheets_and_filters.sheets_to_exclude))
+            )
+
+        rows.extend(
+            TransformationDateRange(
+                transformation_id=transformation_id,
+                application_date=d.application_date,
+                validity_date=d.validity_date,
+            )
+            for d in data.dates
+        )
+        return rows
+
+    async def _add_lookup_values(self, carrier: str, trade_lane: str) -> List[str]:
+        """Record the carrier and trade lane in the current transaction.
+
+        Returns the cache keys of the dictionaries that gained a value.
+        """
+        new_lookups = []
+        for key, model, value in (("carriers", Carrier, carrier), ("trade_lanes", TradeLane, trade_lane)):
+            result = await self.db.execute(
+                sqlite_insert(model).values(name=value).on_conflict_do_nothing()
+            )
+            if result.rowcount:
+                new_lookups.append(key)
+        return new_lookups
+
+    async def _get_lookup(self, key: str, model: Type) -> List[str]:
+        cached = lookup_cache.get(key)
+        if cached is not None:
+            return list(cached)
+
+        generation = lookup_cache.generation
+        result = await self.db.execute(select(model.name).order_by(model.name))
+        values = list(result.scalars().all())
+        lookup_cache.set(key, values, generation)
+        return list(values)
 
 
 
@@ -0,0 +1,173 @@
+"""Concurrency benchmark: blocking SQLite session vs the async session layer.
+
+Runs the same paginated list query many times with a bounded number of
+concurrent callers on one event loop, the way uvicorn serves requests:
+
+* ``sync``: the old path, a synchronous ``Session`` used inside a coroutine.
+  Each query blocks the loop, so requests are served one after the other.
+* ``async``: ``TransformationsService`` on an ``aiosqlite`` engine.
+
+For each mode it reports throughput, request latency percentiles, the
+highest number of requests in flight at the same time and the event loop
+lag measured by a 1 ms ticker running next to the load.
+
+    python -m benchmarks.bench_async_db --rows 20000 --requests 500 --concurrency 50
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.models.transformations import Transformation
+from app.services.transformations import TransformationsService
+
+CARRIERS = ["MSC", "CMA", "MAERSK", "HAPAG-LLOYD", "ONE", "EVERGREEN"]
+TRADE_LANES = ["EU-US", "US-ASIA", "EUR-MENA", "ASIA-AFR"]
+STATUSES = ["SENT_TO_DMP", "IN_PROGRESS", "PENDING_FINAL_REVIEW", "NEEDING_INPUT"]
+
+
+def seed(db_path: str, rows: int) -> None:
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    with sessionmaker(bind=engine)() as db:
+        db.add_all(
+            Transformation(
+                id=f"bench-{i:08d}",
+                created_at=start + timedelta(minutes=i),
+                status=STATUSES[i % len(STATUSES)],
+                carrier=CARRIERS[i % len(CARRIERS)],
+                trade_lane=TRADE_LANES[i % len(TRADE_LANES)],
+                xlsx_name=f"rate_card_{i}.xlsx",
+                docx_name=f"sop_{i}.docx",
+                progress=0,
+            )
+            for i in range(rows)
+        )
+        db.commit()
+    engine.dispose()
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_load(
+    handler: Callable[[], Awaitable[None]],
+    requests: int,
+    concurrency: int,
+) -> Dict[str, float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    lags: List[float] = []
+    in_flight = 0
+    max_in_flight = 0
+    stop = asyncio.Event()
+
+    async def one_request(started: float) -> None:
+        nonlocal in_flight, max_in_flight
+        # latency includes the time spent queued behind other requests
+        async with semaphore:
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            try:
+                await handler()
+            finally:
+                in_flight -= 1
+                latencies.append(time.perf_counter() - started)
+
+    async def loop_lag_probe() -> None:
+        while not stop.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append(time.perf_counter() - started - 0.001)
+
+    probe = asyncio.create_task(loop_lag_probe())
+    started = time.perf_counter()
+    await asyncio.gather(*(one_request(time.perf_counter()) for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+
+    return {
+        "requests": requests,
+        "elapsed_s": round(elapsed, 4),
+        "throughput_rps": round(requests / elapsed, 1),
+        "latency_p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "latency_p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_in_flight": max_in_flight,
+        "loop_lag_p99_ms": round(percentile(lags, 99) * 1000, 2) if lags else 0.0,
+        "loop_lag_mean_ms": round(statistics.fmean(lags) * 1000, 2) if lags else 0.0,
+    }
+
+
+async def bench_sync(db_path: str, requests: int, concurrency: int, limit: int) -> Dict[str, float]:
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    SessionLocal = sessionmaker(bind=engine, autoflush=False)
+
+    async def handler() -> None:
+        with SessionLocal() as db:
+            rows = db.execute(
+                select(Transformation).order_by(Transformation.created_at.desc()).limit(limit + 1)
+            ).scalars().all()
+            [t.to_dict() for t in rows]
+
+    try:
+        return await run_load(handler, requests, concurrency)
+    finally:
+        engine.dispose()
+
+
+async def bench_async(db_path: str, requests: int, concurrency: int, limit: int) -> Dict[str, float]:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", pool_size=concurrency)
+    SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    async def handler() -> None:
+        async with SessionLocal() as db:
+            await TransformationsService(db=db).list_transformations(limit=limit)
+
+    try:
+        return await run_load(handler, requests, concurrency)
+    finally:
+        await engine.dispose()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    db_fd, db_path = tempfile.mkstemp(suffix=".db")
+    try:
+        seed(db_path, args.rows)
+        results = {
+            "rows": args.rows,
+            "concurrency": args.concurrency,
+            "sync": await bench_sync(db_path, args.requests, args.concurrency, args.limit),
+            "async": await bench_async(db_path, args.requests, args.concurrency, args.limit),
+        }
+        print(json.dumps(results, indent=2))
+    finally:
+        os.close(db_fd)
+        os.unlink(db_path)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+"""Cold start cost of the app: time to import app.main in a fresh interpreter.
+
+Each run is a new process, as on a Cloud Run cold start. Reports the import
+time percentiles over ``--runs`` processes and, from one ``-X importtime``
+run, the modules with the highest cumulative import time.
+
+    python -m benchmarks.bench_cold_start --runs 10 --top 15
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+from benchmarks.bench_async_db import percentile
+
+IMPORT_APP = "import time; started = time.perf_counter(); import app.main; print(time.perf_counter() - started)"
+
+
+def app_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("MODE", "local")
+    env.setdefault("DB_BOOTSTRAP_ON_STARTUP", "false")
+    return env
+
+
+def import_seconds() -> float:
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_APP], env=app_env(), capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip())
+
+
+def import_times() -> Dict[str, Tuple[int, int]]:
+    """Self and cumulative import time in microseconds of every module imported with app.main"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        env=app_env(), capture_output=True, text=True, check=True,
+    )
+    times: Dict[str, Tuple[int, int]] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    seconds: List[float] = [import_seconds() for _ in range(args.runs)]
+    times = import_times()
+    top = sorted(times.items(), key=lambda item: -item[1][1])[:args.top]
+    print(json.dumps({
+        "runs": args.runs,
+        "import_p50_ms": round(percentile(seconds, 50) * 1000, 1),
+        "import_max_ms": round(max(seconds) * 1000, 1),
+        "modules": len(times),
+        "top_cumulative_ms": {name: round(cumulative / 1000, 1) for name, (_, cumulative) in top},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Per-page cost of GET /transformations: ORM read path vs the lean read path.
+
+Both paths build one page of ``limit`` items from a database where every row
+carries a ``transformation_data`` payload, then encode the response body:
+
+* ``orm``: the old path. ``select(Transformation)`` loads whole ORM objects
+  into the identity map, ``to_dict`` builds the items, the result is validated
+  against ``TransformationList`` and encoded by the response model.
+* ``lean``: ``TransformationsService.list_transformations``, which selects the
+  listed columns only, and an ``orjson`` encoding without re-validation.
+
+For each path it reports the CPU time per page (``time.process_time``, so the
+aiosqlite worker thread is included) and the peak of memory allocated while a
+page is built (``tracemalloc``).
+
+    python -m benchmarks.bench_list_serialization --rows 5000 --limit 200
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Awaitable, Callable, Dict, List
+
+import orjson
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.models.transformations import Transformation
+from app.schemas.transformations import TransformationList
+from app.services.transformations import TransformationsService
+from benchmarks.bench_async_db import percentile, seed
+
+
+def add_payloads(db_path: str, payload_bytes: int) -> None:
+    # the shape of a real TransformationInput does not matter here, only its size
+    payload = json.dumps({"data": "x" * payload_bytes})
+    engine = create_engine(f"sqlite:///{db_path}")
+    with engine.begin() as connection:
+        connection.execute(update(Transformation).values(transformation_data=payload))
+    engine.dispose()
+
+
+async def measure(page: Callable[[], Awaitable[bytes]], pages: int) -> Dict[str, float]:
+    await page()  # warm up statement caches
+    cpu: List[float] = []
+    peaks: List[int] = []
+    for _ in range(pages):
+        tracemalloc.start()
+        started = time.process_time()
+        body = await page()
+        cpu.append(time.process_time() - started)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return {
+        "pages": pages,
+        "body_bytes": len(body),
+        "cpu_p50_ms": round(percentile(cpu, 50) * 1000, 2),
+        "cpu_p99_ms": round(percentile(cpu, 99) * 1000, 2),
+        "peak_alloc_p50_kib": round(percentile(peaks, 50) / 1024, 1),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5_000)
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--payload-bytes", type=int, default=4_096)
+    args = parser.parse_args()
+
+    db_fd, db_path = tempfile.mkstemp(suffix=".db")
+    engine = None
+    try:
+        seed(db_path, args.rows)
+        add_payloads(db_path, args.payload_bytes)
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+        async def orm_page() -> bytes:
+            async with SessionLocal() as db:
+                result = await db.execute(
+                    select(Transformation)
+                    .order_by(Transformation.created_at.desc(), Transformation.id.desc())
+                    .limit(args.limit + 1)
+                )
+                rows = result.scalars().all()[:args.limit]
+                page = {"items": [t.to_dict() for t in rows], "next_cursor": None}
+                return TransformationList.model_validate(page).model_dump_json().encode()
+
+        async def lean_page() -> bytes:
+            async with SessionLocal() as db:
+                page = await TransformationsService(db=db).list_transformations(limit=args.limit)
+                return orjson.dumps(page)
+
+        results = {
+            "rows": args.rows,
+            "limit": args.limit,
+            "payload_bytes": args.payload_bytes,
+            "orm": await measure(orm_page, args.pages),
+            "lean": await measure(lean_page, args.pages),
+        }
+        print(json.dumps(results, indent=2))
+    finally:
+        if engine is not None:
+            await engine.dispose()
+        os.close(db_fd)
+        os.unlink(db_path)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+"""Wall time of the local jobs.yml pipeline, serial vs process pool.
+
+Every stage burns a fixed amount of CPU in a worker process. The pipeline is
+run for a few transformations with a single worker (stages one after the
+other) and with a pool, where the four independent extract-* stages overlap.
+
+    python -m benchmarks.bench_pipeline --stage-ms 200 --runs 3 --workers 4
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Dict, List
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.services.pipeline import PipelineRunner
+from benchmarks.bench_async_db import percentile, seed
+
+
+def burn_stage(stage_ms: float, job_name: str, transformation_id: str) -> None:
+    deadline = time.perf_counter() + stage_ms / 1000
+    while time.perf_counter() < deadline:
+        pass
+
+
+async def bench_runner(db_path: str, workers: int, runs: int, stage_ms: float) -> Dict[str, float]:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    session_factory = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    runner = PipelineRunner(
+        session_factory,
+        executor_factory=lambda: ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")),
+        stage=partial(burn_stage, stage_ms),
+    )
+    # start the workers before timing
+    await runner.run("bench-00000000")
+
+    timings: List[float] = []
+    for i in range(runs):
+        started = time.perf_counter()
+        await runner.run(f"bench-{i:08d}")
+        timings.append(time.perf_counter() - started)
+    runner.shutdown()
+    await engine.dispose()
+    return {
+        "workers": workers,
+        "p50_s": round(percentile(timings, 50), 3),
+        "max_s": round(max(timings), 3),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stage-ms", type=float, default=200)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    db_fd, db_path = tempfile.mkstemp(suffix=".db")
+    try:
+        seed(db_path, args.runs)
+        results = {
+            "stage_ms": args.stage_ms,
+            "serial": await bench_runner(db_path, 1, args.runs, args.stage_ms),
+            "pool": await bench_runner(db_path, args.workers, args.runs, args.stage_ms),
+        }
+        print(json.dumps(results, indent=2))
+    finally:
+        os.close(db_fd)
+        os.unlink(db_path)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
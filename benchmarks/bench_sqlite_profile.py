@@ -0,0 +1,142 @@
+"""Mixed-traffic benchmark of the SQLite performance profile.
+
+Workers share one async engine and loop for a fixed duration over a mix of
+status polls, list pages and creates, each in its own session like a request.
+The run is repeated with SQLite's defaults (rollback journal,
+synchronous=FULL, default pool) and with the profile from the settings
+(WAL, synchronous=NORMAL, mmap, cache size, busy timeout and a sized pool).
+
+Reported per profile and operation: completed operations, throughput,
+latency percentiles and "database is locked" errors. Creates wait for the
+write lock, so their latency is the lock-wait figure.
+
+    python -m benchmarks.bench_sqlite_profile --rows 20000 --workers 32 --duration 10
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date
+from io import BytesIO
+from typing import Any, Dict, List
+
+from fastapi import UploadFile
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db.sqlite_profile import apply_sqlite_profile, pool_options, sqlite_pragmas
+from app.schemas.transformations import DatesItem, TransformationInput
+from app.services.transformations import TransformationsService
+from benchmarks.bench_async_db import CARRIERS, TRADE_LANES, percentile, seed
+
+OPERATIONS = {"status": 0.6, "list": 0.3, "create": 0.1}
+
+
+async def run_profile(
+    db_path: str,
+    pragmas: List[str],
+    engine_options: Dict[str, Any],
+    workers: int,
+    duration: float,
+    rows: int,
+) -> Dict[str, Any]:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", **engine_options)
+    apply_sqlite_profile(engine.sync_engine, pragmas)
+    SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    locked: Dict[str, int] = defaultdict(int)
+    names, weights = zip(*OPERATIONS.items())
+    deadline = time.perf_counter() + duration
+
+    async def one_operation(rng: random.Random, operation: str) -> None:
+        async with SessionLocal() as db:
+            service = TransformationsService(db=db)
+            if operation == "status":
+                await service.get_status_snapshot(f"bench-{rng.randrange(rows):08d}")
+            elif operation == "list":
+                await service.list_transformations(limit=20, carrier=[rng.choice(CARRIERS)])
+            else:
+                await service.create_transformation(
+                    UploadFile(filename="rate_card.xlsx", file=BytesIO(b"xlsx")),
+                    UploadFile(filename="sop.docx", file=BytesIO(b"docx")),
+                    TransformationInput(
+                        carrier=rng.choice(CARRIERS),
+                        trade_lane=rng.choice(TRADE_LANES),
+                        dates=[DatesItem(application_date=date(2024, 1, 1), validity_date=date(2024, 12, 31))],
+                    ),
+                )
+
+    async def worker(index: int) -> None:
+        rng = random.Random(index)
+        while time.perf_counter() < deadline:
+            operation = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                await one_operation(rng, operation)
+            except Exception as e:
+                # the service wraps SQLAlchemy errors into HTTPException(500)
+                if "locked" in str(e) or isinstance(e, OperationalError):
+                    locked[operation] += 1
+                    continue
+                raise
+            latencies[operation].append(time.perf_counter() - started)
+
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(workers)))
+        elapsed = time.perf_counter() - started
+    finally:
+        await engine.dispose()
+
+    report: Dict[str, Any] = {"elapsed_s": round(elapsed, 3)}
+    for operation in names:
+        values = latencies[operation]
+        report[operation] = {
+            "ops": len(values),
+            "throughput_ops": round(len(values) / elapsed, 1),
+            "latency_p50_ms": round(percentile(values, 50) * 1000, 2) if values else None,
+            "latency_p99_ms": round(percentile(values, 99) * 1000, 2) if values else None,
+            "locked_errors": locked[operation],
+        }
+    report["total_throughput_ops"] = round(sum(len(v) for v in latencies.values()) / elapsed, 1)
+    return report
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {"rows": args.rows, "workers": args.workers, "duration_s": args.duration}
+    profiles = {
+        "default": ([], {}),
+        "tuned": (sqlite_pragmas(), pool_options()),
+    }
+    for name, (pragmas, engine_options) in profiles.items():
+        # each profile starts from its own freshly seeded file
+        db_fd, db_path = tempfile.mkstemp(suffix=".db")
+        try:
+            seed(db_path, args.rows)
+            results[name] = await run_profile(
+                db_path, pragmas, engine_options, args.workers, args.duration, args.rows
+            )
+        finally:
+            os.close(db_fd)
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(db_path + suffix):
+                    os.unlink(db_path + suffix)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,338 @@
+"""Load benchmarks of the API over a synthetic history.
+
+Seeds a history with ``benchmarks.synthetic`` (or reuses ``--db``), then
+drives the FastAPI app in-process through httpx, so routing, validation and
+serialization are measured along with the queries. Uploads go to an
+in-memory bucket with an optional per-call latency. Scenarios:
+
+* ``list[<filters>]``: GET /transformations under every combination of the
+  carrier, trade_lane, status, stage and date filters
+* ``page_depth[<n>]``: the page reached after following n cursors
+* ``status``, ``status_batch``: status polling, one id and 100 ids a call
+* ``trade_lanes``, ``carriers``
+* ``create``: multipart POST /transformations with distinct files
+
+Each scenario reports latency percentiles and throughput under
+``--concurrency`` callers. The results are written as JSON; pass a previous
+result as ``--baseline`` to print the p50/p99 change of every scenario.
+
+    python -m benchmarks.bench_suite --rows 100000 --output bench.json
+    python -m benchmarks.bench_suite --db /tmp/history.db --baseline bench.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timezone
+from io import BytesIO
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+os.environ.setdefault("MODE", "local")
+os.environ.setdefault("DB_BOOTSTRAP_ON_STARTUP", "false")
+os.environ.setdefault("ALL_JOBS_ROOT_PATH", "rate-card-transformation")
+
+import httpx
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.api.routes.transformations import get_storage_service
+from app.db.session import get_db, get_session_factory
+from app.db.sqlite_profile import apply_sqlite_profile, pool_options, sqlite_pragmas
+from app.main import app
+from app.models.transformations import STATUS_FLAGS, Transformation
+from app.schemas.transformations import StatusEnum
+from app.services.rate_cards import inspection_cache
+from benchmarks.bench_async_db import percentile
+from benchmarks.synthetic import CARRIERS, COLUMNS, SHEETS, TRADE_LANES, seed_history, transformation_input
+
+LIST_FILTERS = ("carrier", "trade_lane", "status", "stage", "date")
+PAGE_DEPTHS = (1, 10, 100)
+
+
+class MemoryBucket:
+    """Stand-in for GCSService: objects kept in memory, each call sleeping `latency` seconds"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.blobs: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def exists(self, blob_name: str) -> bool:
+        time.sleep(self.latency)
+        return blob_name in self.blobs
+
+    def upload_stream_if_absent(self, file_data, destination_blob_name, content_type, chunk_size=None) -> bool:
+        time.sleep(self.latency)
+        file_data.seek(0)
+        content = file_data.read()
+        with self._lock:
+            if destination_blob_name in self.blobs:
+                return False
+            self.blobs[destination_blob_name] = content
+        return True
+
+    def copy_if_absent(self, source_blob_name: str, destination_blob_name: str) -> bool:
+        time.sleep(self.latency)
+        with self._lock:
+            if destination_blob_name in self.blobs:
+                return False
+            self.blobs[destination_blob_name] = self.blobs[source_blob_name]
+        return True
+
+
+async def run_scenario(
+    request: Callable[[int], Awaitable[httpx.Response]],
+    requests: int,
+    concurrency: int,
+) -> Dict[str, Any]:
+    """Latency percentiles and throughput of `requests` calls, `concurrency` at a time"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await request(i)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 1),
+        "latency_p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "latency_p90_ms": round(percentile(latencies, 90) * 1000, 2),
+        "latency_p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "latency_max_ms": round(max(latencies) * 1000, 2),
+    }
+
+
+def list_params(rng: random.Random, filters: tuple) -> Dict[str, Any]:
+    params: Dict[str, Any] = {"limit": 20}
+    if "carrier" in filters:
+        params["carrier"] = rng.choice(CARRIERS)
+    if "trade_lane" in filters:
+        params["trade_lane"] = rng.choice(TRADE_LANES)
+    if "status" in filters:
+        params["status"] = rng.choice(list(StatusEnum)).value
+    if "stage" in filters:
+        params["stage"] = rng.choice(STATUS_FLAGS)
+    if "date" in filters:
+        year = rng.choice([2022, 2023])
+        params["date.start"] = date(year, 1, 1).isoformat()
+        params["date.end"] = date(year, 6, 30).isoformat()
+    return params
+
+
+def build_workbook() -> bytes:
+    # every sheet and column a synthetic TransformationInput can refer to
+    import openpyxl
+
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    for name in SHEETS:
+        sheet = workbook.create_sheet(name)
+        sheet.append(COLUMNS)
+        sheet.append(["FRLEH", "USNYC", "FAK", "40HC", "AE1", ""])
+    buffer = BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_suite(args: argparse.Namespace, db_path: str) -> Dict[str, Any]:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", **pool_options())
+    apply_sqlite_profile(engine.sync_engine, sqlite_pragmas())
+    SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    async def bench_db():
+        async with SessionLocal() as db:
+            yield db
+
+    bucket = MemoryBucket(latency=args.bucket_latency_ms / 1000)
+    app.dependency_overrides[get_db] = bench_db
+    app.dependency_overrides[get_session_factory] = lambda: SessionLocal
+    app.dependency_overrides[get_storage_service] = lambda: bucket
+
+    async with SessionLocal() as db:
+        rows = await db.scalar(select(func.count()).select_from(Transformation))
+        ids = list(await db.scalars(select(Transformation.id).order_by(func.random()).limit(1000)))
+
+    rng = random.Random(args.seed)
+    results: Dict[str, Any] = {}
+    scenario_filter = args.only
+
+    async def scenario(name: str, request: Callable[[int], Awaitable[httpx.Response]], requests: int) -> None:
+        if scenario_filter and not any(part in name for part in scenario_filter):
+            return
+        await request(0)  # warm up
+        results[name] = await run_scenario(request, requests, args.concurrency)
+        print(f"{name:<60} p50 {results[name]['latency_p50_ms']:>8} ms  "
+              f"p99 {results[name]['latency_p99_ms']:>8} ms  {results[name]['throughput_rps']:>8} rps",
+              file=sys.stderr)
+
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for size in range(len(LIST_FILTERS) + 1):
+                for filters in itertools.combinations(LIST_FILTERS, size):
+                    params = [list_params(rng, filters) for _ in range(args.requests)]
+                    await scenario(
+                        f"list[{','.join(filters) or 'none'}]",
+                        lambda i, params=params: client.get("/transformations", params=params[i % len(params)]),
+                        args.requests,
+                    )
+
+            for depth in PAGE_DEPTHS:
+                cursor = None
+                for _ in range(depth):
+                    page = (await client.get("/transformations", params={"limit": 20, "cursor": cursor} if cursor else {"limit": 20})).json()
+                    if page["next_cursor"] is None:
+                        break
+                    cursor = page["next_cursor"]
+                await scenario(
+                    f"page_depth[{depth}]",
+                    lambda i, cursor=cursor: client.get("/transformations", params={"limit": 20, "cursor": cursor}),
+                    args.requests,
+                )
+
+            await scenario(
+                "status",
+                lambda i: client.get(f"/transformations/{ids[i % len(ids)]}/status-details-in-progress"),
+                args.requests,
+            )
+            await scenario(
+                "status_batch",
+                lambda i: client.post(
+                    "/transformations/status:batch", json={"ids": rng.sample(ids, min(100, len(ids)))}
+                ),
+                args.requests,
+            )
+            await scenario("trade_lanes", lambda i: client.get("/trade-lanes"), args.requests)
+            await scenario("carriers", lambda i: client.get("/carriers"), args.requests)
+
+            # distinct files per request: nothing is deduplicated by the content-addressed store
+            workbook = build_workbook()
+            create_rng = random.Random(args.seed + 1)
+            payloads = []
+            for i in range(args.create_requests + 1):
+                carrier, trade_lane = create_rng.choice(CARRIERS), create_rng.choice(TRADE_LANES)
+                payloads.append((
+                    workbook + f"#{i}".encode(),
+                    f"SOP {i}".encode() * 256,
+                    json.dumps(transformation_input(create_rng, carrier, trade_lane, max_surcharges=10)),
+                ))
+            inspection_cache.clear()
+
+            def create(i: int) -> Awaitable[httpx.Response]:
+                excel, word, data = payloads[i]
+                return client.post(
+                    "/transformations",
+                    files={
+                        "excel_file": ("rate_card.xlsx", excel, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+                        "word_file": ("sop.docx", word, "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+                    },
+                    data={"data": data},
+                )
+
+            await scenario("create", lambda i: create(i + 1), args.create_requests)
+    finally:
+        app.dependency_overrides.clear()
+        await engine.dispose()
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "rows": rows,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "bucket_latency_ms": args.bucket_latency_ms,
+        },
+        "scenarios": results,
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Print the p50/p99 change of each scenario against a previous run"""
+    print(f"baseline {baseline['meta'].get('commit')} ({baseline['meta']['rows']} rows) "
+          f"-> {results['meta'].get('commit')} ({results['meta']['rows']} rows)")
+    for name, current in results["scenarios"].items():
+        previous = baseline["scenarios"].get(name)
+        if previous is None:
+            continue
+        changes = []
+        for key in ("latency_p50_ms", "latency_p99_ms"):
+            before, after = previous[key], current[key]
+            change = (after - before) / before * 100 if before else 0.0
+            changes.append(f"{key[8:11]} {before:>8} -> {after:>8} ms ({change:+.0f}%)")
+        print(f"{name:<60} {'  '.join(changes)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000, help="Rows to seed when --db is not given")
+    parser.add_argument("--db", help="Existing history (see benchmarks.synthetic), reused as is")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per read scenario")
+    parser.add_argument("--create-requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--bucket-latency-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="*", help="Run the scenarios whose name contains one of these")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Results of a previous run to compare with")
+    args = parser.parse_args()
+
+    db_fd = None
+    db_path = args.db
+    if db_path is None:
+        db_fd, db_path = tempfile.mkstemp(suffix=".db")
+        started = time.perf_counter()
+        seed_history(db_path, args.rows, seed=args.seed)
+        print(f"seeded {args.rows} rows in {time.perf_counter() - started:.1f} s", file=sys.stderr)
+    try:
+        results = asyncio.run(run_suite(args, db_path))
+    finally:
+        if db_fd is not None:
+            os.close(db_fd)
+            os.unlink(db_path)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
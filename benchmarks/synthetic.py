@@ -0,0 +1,213 @@
+"""Synthetic transformation history for the benchmarks.
+
+Rows look like the ones the API writes: a TransformationInput with dates,
+excluded sheets, filters and surcharges stored in ``transformation_data``,
+the search side tables, the carrier and trade lane lookup tables, and status
+flags spread over every pipeline stage. The history is deterministic for a
+given ``seed`` and is written with bulk Core inserts, so 10^6 rows take
+minutes, not hours.
+
+    python -m benchmarks.synthetic /tmp/history.db --rows 100000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, Tuple
+
+from sqlalchemy import create_engine, insert
+
+from app.db.base import Base
+from app.models.transformations import (
+    STATUS_FLAGS,
+    Carrier,
+    TradeLane,
+    Transformation,
+    TransformationDateRange,
+    TransformationExcludedSheet,
+    TransformationSurcharge,
+)
+from app.schemas.transformations import StatusEnum
+
+CARRIERS = [
+    "MSC", "CMA", "MAERSK", "HAPAG-LLOYD", "ONE", "EVERGREEN",
+    "COSCO", "YANG-MING", "HMM", "ZIM", "PIL", "WAN-HAI",
+]
+TRADE_LANES = [
+    "EU-US", "US-EU", "US-ASIA", "ASIA-US", "EUR-MENA", "ASIA-AFR",
+    "ASIA-EU", "EU-ASIA", "LATAM-EU", "OCEANIA-ASIA",
+]
+SHEETS = ["Rates", "Surcharges", "Notes", "Inland", "Reefer", "OOG", "DG", "Legend"]
+SURCHARGE_CODES = [
+    "THC", "BAF", "CAF", "PSS", "LSS", "ISPS", "EBS", "WRS", "PCS", "SCS",
+    "DTHC", "OTHC", "ENS", "AMS", "CSF", "ECA", "GRI", "HEA", "OWS", "CIC",
+]
+CURRENCIES = ["USD", "EUR"]
+BASES = ["PER_CONTAINER", "PER_BL", "PER_TEU"]
+COLUMNS = ["POL", "POD", "Commodity", "Container", "Service", "Via"]
+
+# status matching the furthest flag reached, weighted towards finished work
+STAGE_WEIGHTS = [1, 2, 3, 4, 10]
+STAGE_STATUS = [
+    StatusEnum.SENT_TO_DMP,
+    StatusEnum.IN_PROGRESS,
+    StatusEnum.IN_PROGRESS,
+    StatusEnum.PENDING_FINAL_REVIEW,
+    StatusEnum.NEEDING_INPUT,
+]
+
+HISTORY_START = datetime(2022, 1, 1)
+
+
+def transformation_input(rng: random.Random, carrier: str, trade_lane: str, max_surcharges: int) -> Dict[str, Any]:
+    """A TransformationInput-shaped dict; its size grows with max_surcharges"""
+    start = date(2022, 1, 1) + timedelta(days=rng.randrange(1000))
+    dates = []
+    for _ in range(rng.randint(1, 3)):
+        dates.append({
+            "application_date": start.isoformat(),
+            "validity_date": (start + timedelta(days=rng.choice([30, 90, 180, 365]))).isoformat(),
+            "sheets": rng.sample(SHEETS, rng.randint(0, 2)),
+        })
+        start += timedelta(days=rng.randrange(30, 120))
+
+    added = []
+    for _ in range(rng.randint(0, max_surcharges)):
+        added.append({
+            "surcharge_code": rng.choice(SURCHARGE_CODES),
+            "price": round(rng.uniform(10, 900), 2),
+            "currency": rng.choice(CURRENCIES),
+            "geo_restriction": rng.choice([None, "NORTH_EUROPE", "MED", "US_EAST_COAST", "CHINA_SOUTH"]),
+            "validity_date": dates[0]["application_date"],
+            "expiry_date": dates[-1]["validity_date"],
+            "basis": rng.choice(BASES),
+            "sheet_name": rng.choice([None, "Surcharges"]),
+        })
+
+    return {
+        "carrier": carrier,
+        "trade_lane": trade_lane,
+        "dates": dates,
+        "sheets_and_filters": {
+            "sheets_to_exclude": rng.sample(SHEETS[2:], rng.randint(0, 3)),
+            "filters": [
+                {"name": f"filter_{i}", "column": rng.choice(COLUMNS), "sheet_name": "Rates"}
+                for i in range(rng.randint(0, 4))
+            ],
+        },
+        "surcharges_to_exclude": rng.sample(SURCHARGE_CODES, rng.randint(0, 4)),
+        "surcharges_included": [
+            {"surcharge_code": code, "sheet_name": "Surcharges"}
+            for code in rng.sample(SURCHARGE_CODES, rng.randint(0, 5))
+        ],
+        "surcharges_to_be_added": added,
+    }
+
+
+def history(rows: int, seed: int = 0, max_surcharges: int = 40) -> Iterator[Tuple[Dict[str, Any], List[Tuple[str, Any]]]]:
+    """(transformations row, side-table rows) for each synthetic transformation"""
+    rng = random.Random(seed)
+    # about one transformation every 5 minutes, a few sharing a timestamp
+    step = timedelta(seconds=max(1, 5 * 60 * 100_000 // max(rows, 1)))
+    created_at = HISTORY_START
+    for i in range(rows):
+        if rng.random() > 0.02:
+            created_at += step
+        carrier = rng.choice(CARRIERS)
+        trade_lane = rng.choice(TRADE_LANES)
+        data = transformation_input(rng, carrier, trade_lane, max_surcharges)
+        stage = rng.choices(range(len(STAGE_WEIGHTS)), weights=STAGE_WEIGHTS)[0]
+        flags = (1 << stage) - 1
+        transformation_id = f"{carrier}_{trade_lane}_{i:08d}"
+
+        row = {
+            "id": transformation_id,
+            "created_at": created_at,
+            "status": STAGE_STATUS[stage].value,
+            "carrier": carrier,
+            "trade_lane": trade_lane,
+            "xlsx_name": f"{carrier.lower()}_{trade_lane.lower()}_{i}.xlsx",
+            "docx_name": f"{carrier.lower()}_{trade_lane.lower()}_{i}.docx",
+            "transformation_data": json.dumps(data),
+            "progress": 100 if stage >= 3 else rng.randrange(100),
+            "message": None,
+            "status_flags": flags,
+            "stage": STATUS_FLAGS[stage - 1] if stage else None,
+        }
+
+        side: List[Tuple[str, Any]] = []
+        surcharges = (
+            {("ADDED", s["surcharge_code"]) for s in data["surcharges_to_be_added"]}
+            | {("EXCLUDED", code) for code in data["surcharges_to_exclude"]}
+            | {("INCLUDED", s["surcharge_code"]) for s in data["surcharges_included"]}
+        )
+        side.extend(
+            ("surcharge", {"transformation_id": transformation_id, "kind": kind, "surcharge_code": code})
+            for kind, code in surcharges
+        )
+        side.extend(
+            ("sheet", {"transformation_id": transformation_id, "sheet_name": sheet})
+            for sheet in set(data["sheets_and_filters"]["sheets_to_exclude"])
+        )
+        side.extend(
+            ("dates", {
+                "transformation_id": transformation_id,
+                "application_date": date.fromisoformat(d["application_date"]),
+                "validity_date": date.fromisoformat(d["validity_date"]),
+            })
+            for d in data["dates"]
+        )
+        yield row, side
+
+
+def seed_history(db_path: str, rows: int, seed: int = 0, max_surcharges: int = 40, chunk: int = 5_000) -> None:
+    """Create the schema in db_path and write a synthetic history of `rows` transformations"""
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    tables = {
+        "surcharge": TransformationSurcharge.__table__,
+        "sheet": TransformationExcludedSheet.__table__,
+        "dates": TransformationDateRange.__table__,
+    }
+
+    def flush(connection, transformations, side_rows) -> None:
+        if transformations:
+            connection.execute(insert(Transformation.__table__), transformations)
+        for kind, table in tables.items():
+            batch = [values for row_kind, values in side_rows if row_kind == kind]
+            if batch:
+                connection.execute(insert(table), batch)
+
+    carriers, trade_lanes = set(), set()
+    with engine.begin() as connection:
+        transformations: List[Dict[str, Any]] = []
+        side_rows: List[Tuple[str, Any]] = []
+        for row, side in history(rows, seed=seed, max_surcharges=max_surcharges):
+            transformations.append(row)
+            side_rows.extend(side)
+            carriers.add(row["carrier"])
+            trade_lanes.add(row["trade_lane"])
+            if len(transformations) >= chunk:
+                flush(connection, transformations, side_rows)
+                transformations, side_rows = [], []
+        flush(connection, transformations, side_rows)
+        if carriers:
+            connection.execute(insert(Carrier.__table__), [{"name": name} for name in sorted(carriers)])
+            connection.execute(insert(TradeLane.__table__), [{"name": name} for name in sorted(trade_lanes)])
+    engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("db_path")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-surcharges", type=int, default=40, help="Upper bound of surcharges_to_be_added per row")
+    args = parser.parse_args()
+    seed_history(args.db_path, args.rows, seed=args.seed, max_surcharges=args.max_surcharges)
+
+
+if __name__ == "__main__":
+    main()
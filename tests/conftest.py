@@ -1,25 +1,55 @@
+import base64
+import hashlib
 import os
+import threading
+from io import BytesIO
+from types import SimpleNamespace
 import pytest
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from fastapi import Depends
 from fastapi.testclient import TestClient
 
 os.environ['MODE'] = 'local'
+os.environ.setdefault('BUCKET', 'test-bucket')
+os.environ.setdefault('ALL_JOBS_ROOT_PATH', 'rate-card-transformation')
+os.environ['DB_BOOTSTRAP_ON_STARTUP'] = 'false'
 
 from app.db.base import Base
 from app.main import app
-from app.db.session import get_db
+from app.db.session import get_db, get_session_factory
 from app.models.transformations import Transformation
 from app.api.routes.transformations import get_transformations_service
-from app.services.transformations import TransformationsService
+from app.services.transformations import TransformationsService, lookup_cache
+
+
+@pytest.fixture(autouse=True)
+def reset_lookup_cache():
+    # every test gets a fresh database, so the process-wide dictionaries must not leak
+    lookup_cache.clear()
+    yield
+    lookup_cache.clear()
 
 
 @pytest.fixture(scope="function")
-def test_db():
+def db_path():
     import tempfile
     db_fd, db_path = tempfile.mkstemp(suffix=".db")
-    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    engine = create_engine(f"sqlite:///{db_path}")
     Base.metadata.create_all(bind=engine)
+    engine.dispose()
+    try:
+        yield db_path
+    finally:
+        os.close(db_fd)
+        os.unlink(db_path)
+
+
+@pytest.fixture(scope="function")
+def test_db(db_path):
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
     TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     db = TestingSessionLocal()
     try:
@@ -27,26 +57,112 @@ def test_db():
     finally:
         db.close()
         engine.dispose()
-        os.close(db_fd)
-        os.unlink(db_path)
 
 
 @pytest.fixture(scope="function")
-def client(test_db):
-    def override_get_db():
-        try:
-            yield test_db
-        finally:
-            pass
-    def override_get_transformations_service():
-        return TransformationsService(db=test_db)
+def async_session_factory(db_path):
+    # NullPool: the app under TestClient and the tests run on different event loops
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+    return async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+
+@pytest.fixture(scope="function")
+async def async_db(async_session_factory):
+    async with async_session_factory() as db:
+        yield db
+
+
+@pytest.fixture(scope="function")
+def client(async_session_factory):
+    async def override_get_db():
+        async with async_session_factory() as db:
+            yield db
+    def override_get_transformations_service(db=Depends(get_db)):
+        return TransformationsService(db=db)
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: async_session_factory
     app.dependency_overrides[get_transformations_service] = override_get_transformations_service
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
 
 
+class FakeStorage:
+    """In-memory stand-in for GCSService."""
+
+    def __init__(self):
+        self.blobs = {}
+        self.upload_threads = []
+        self.fail_on = set()
+        self.copies = []
+        self.generations = {}
+        self.downloads = []
+
+    def upload_stream(self, file_data, destination_blob_name, content_type, chunk_size=None, if_generation_match=None):
+        if any(part in destination_blob_name for part in self.fail_on):
+            raise RuntimeError(f"upload of {destination_blob_name} failed")
+        self._check_generation(destination_blob_name, if_generation_match)
+        self.upload_threads.append(threading.get_ident())
+        file_data.seek(0)
+        self.put(destination_blob_name, file_data.read())
+        return f"gs://test-bucket/{destination_blob_name}"
+
+    def upload_stream_if_absent(self, file_data, destination_blob_name, content_type, chunk_size=None):
+        if destination_blob_name in self.blobs:
+            return False
+        self.upload_stream(file_data, destination_blob_name, content_type, chunk_size)
+        return True
+
+    def copy(self, source_blob_name, destination_blob_name, if_generation_match=None):
+        self._check_generation(destination_blob_name, if_generation_match)
+        self.copies.append((source_blob_name, destination_blob_name))
+        self.put(destination_blob_name, self.blobs[source_blob_name])
+
+    def copy_if_absent(self, source_blob_name, destination_blob_name):
+        if destination_blob_name in self.blobs:
+            return False
+        self.copy(source_blob_name, destination_blob_name)
+        return True
+
+    def _check_generation(self, blob_name, if_generation_match):
+        if if_generation_match is not None and self.generations.get(blob_name, 0) != if_generation_match:
+            raise RuntimeError(f"generation of {blob_name} changed")
+
+    def exists(self, blob_name):
+        return blob_name in self.blobs
+
+    def put(self, blob_name, data):
+        self.blobs[blob_name] = data
+        self.generations[blob_name] = self.generations.get(blob_name, 0) + 1
+
+    def get_blob(self, blob_name):
+        if blob_name not in self.blobs:
+            return None
+        data = self.blobs[blob_name]
+        return SimpleNamespace(
+            name=blob_name,
+            generation=self.generations[blob_name],
+            size=len(data),
+            md5_hash=base64.b64encode(hashlib.md5(data).digest()).decode(),
+        )
+
+    def download_bytes(self, blob_name, generation, start=None, end=None):
+        assert self.generations[blob_name] == generation
+        self.downloads.append((blob_name, start, end))
+        data = self.blobs[blob_name]
+        if start is None:
+            return data
+        return data[start:end + 1]
+
+    def delete_file(self, blob_name):
+        return self.blobs.pop(blob_name, None) is not None
+
+
+@pytest.fixture
+def fake_storage():
+    return FakeStorage()
+
+
 @pytest.fixture
 def sample_transformation_data():
     return {
@@ -59,3 +175,22 @@ def sample_transformation_data():
             }
         ]
     }
+
+
+def build_workbook(sheets):
+    """xlsx bytes with one sheet per {name: rows} entry"""
+    import openpyxl
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    for name, rows in sheets.items():
+        worksheet = workbook.create_sheet(name)
+        for row in rows:
+            worksheet.append(row)
+    buffer = BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def make_workbook():
+    return build_workbook
@@ -3,6 +3,10 @@ from io import BytesIO
 import json
 import pytest
 
+from app.api.routes.transformations import stream_status_details
+from app.models.transformations import Transformation
+from app.services.transformations import TransformationsService
+
 
 class TestTransformationsAPI:
     """Test suite for /transformations endpoints."""
@@ -81,6 +85,62 @@ class TestTransformationsAPI:
         assert response.status_code == 400
         assert "Invalid JSON" in response.json()["detail"]
 
+    def test_create_transformations_batch_endpoint(self, client, sample_transformation_data):
+        """Test POST /transformations:batch with several items."""
+        other = dict(sample_transformation_data, carrier="CMA")
+        response = client.post(
+            "/transformations:batch",
+            files=[
+                ("excel_files", ("a.xlsx", BytesIO(b"excel a"), "application/octet-stream")),
+                ("excel_files", ("b.xlsx", BytesIO(b"excel b"), "application/octet-stream")),
+                ("word_files", ("a.docx", BytesIO(b"word a"), "application/octet-stream")),
+                ("word_files", ("b.docx", BytesIO(b"word b"), "application/octet-stream")),
+            ],
+            data={"data": [json.dumps(sample_transformation_data), json.dumps(other)]},
+        )
+
+        assert response.status_code == 201
+        items = response.json()["items"]
+        assert [item["status"] for item in items] == ["created", "created"]
+        assert [item["transformation"]["carrier"] for item in items] == ["MSC", "CMA"]
+        assert len(client.get("/transformations").json()["items"]) == 2
+
+    def test_create_transformations_batch_validates_all_items(self, client, sample_transformation_data):
+        """Test that an invalid item rejects the whole batch and reports every error."""
+        response = client.post(
+            "/transformations:batch",
+            files=[
+                ("excel_files", ("a.xlsx", BytesIO(b"excel a"), "application/octet-stream")),
+                ("excel_files", ("b.txt", BytesIO(b"excel b"), "text/plain")),
+                ("excel_files", ("c.xlsx", BytesIO(b"excel c"), "application/octet-stream")),
+                ("word_files", ("a.docx", BytesIO(b"word a"), "application/octet-stream")),
+                ("word_files", ("b.docx", BytesIO(b"word b"), "application/octet-stream")),
+                ("word_files", ("c.docx", BytesIO(b"word c"), "application/octet-stream")),
+            ],
+            data={"data": [json.dumps(sample_transformation_data), json.dumps(sample_transformation_data), "{"]},
+        )
+
+        assert response.status_code == 400
+        errors = response.json()["detail"]
+        assert [error["index"] for error in errors] == [1, 2]
+        assert "Excel file must be" in errors[0]["error"]
+        assert "Invalid JSON" in errors[1]["error"]
+        assert client.get("/transformations").json()["items"] == []
+
+    def test_create_transformations_batch_mismatched_items(self, client, sample_transformation_data):
+        """Test that the three lists must have the same length."""
+        response = client.post(
+            "/transformations:batch",
+            files=[
+                ("excel_files", ("a.xlsx", BytesIO(b"excel a"), "application/octet-stream")),
+                ("word_files", ("a.docx", BytesIO(b"word a"), "application/octet-stream")),
+            ],
+            data={"data": [json.dumps(sample_transformation_data)] * 2},
+        )
+
+        assert response.status_code == 400
+        assert "same number of items" in response.json()["detail"]
+
     def test_list_transformations_empty(self, client):
         """Test listing when no transformations exist."""
         response = client.get("/transformations")
@@ -139,6 +199,109 @@ class TestTransformationsAPI:
         for item in data["items"]:
             assert item["carrier"] == "MSC"
 
+    def test_list_transformations_invalid_cursor(self, client):
+        """Test an invalid cursor returns 400."""
+        response = client.get("/transformations?cursor=2024-01-01T00:00:00")
+
+        assert response.status_code == 400
+        assert "cursor" in response.json()["detail"].lower()
+
+    def test_list_transformations_with_stage_filter(self, client, sample_transformation_data):
+        """Test filtering by stage keeps the list response shape."""
+        excel_file = ("test.xlsx", BytesIO(b"excel"), "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        word_file = ("test.docx", BytesIO(b"word"), "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+        client.post(
+            "/transformations",
+            files={"excel_file": excel_file, "word_file": word_file},
+            data={"data": json.dumps(sample_transformation_data)}
+        )
+
+        assert len(client.get("/transformations?stage=UPLOAD_COMPLETE").json()["items"]) == 1
+        assert client.get("/transformations?stage=PROCESSING").json()["items"] == []
+        assert client.get("/transformations?stage=UNKNOWN").status_code == 422
+
+    def test_search_transformations(self, client, sample_transformation_data):
+        """Test GET /transformations/search matches on TransformationInput content."""
+        data = dict(sample_transformation_data, surcharges_to_exclude=["THC"])
+        excel_file = ("test.xlsx", BytesIO(b"excel"), "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        word_file = ("test.docx", BytesIO(b"word"), "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+        client.post(
+            "/transformations",
+            files={"excel_file": excel_file, "word_file": word_file},
+            data={"data": json.dumps(data)}
+        )
+
+        assert len(client.get("/transformations/search?surcharge_excluded=THC").json()["items"]) == 1
+        assert client.get("/transformations/search?surcharge_added=THC").json()["items"] == []
+        assert len(client.get("/transformations/search?valid_on=2024-06-01").json()["items"]) == 1
+
+    def test_export_transformations_ndjson(self, client, sample_transformation_data):
+        """Test GET /transformations/export streams one JSON object per line."""
+        for carrier in ["MSC", "CMA", "MSC"]:
+            data = dict(sample_transformation_data, carrier=carrier)
+            excel_file = ("test.xlsx", BytesIO(b"excel"), "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+            word_file = ("test.docx", BytesIO(b"word"), "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+            client.post(
+                "/transformations",
+                files={"excel_file": excel_file, "word_file": word_file},
+                data={"data": json.dumps(data)}
+            )
+
+        response = client.get("/transformations/export?carrier=MSC&include_data=true")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert len(lines) == 2
+        assert lines == sorted(lines, key=lambda item: item["created_at"], reverse=True)
+        assert all(line["transformation_data"]["carrier"] == "MSC" for line in lines)
+        assert lines[0]["id"] == client.get("/transformations?carrier=MSC").json()["items"][0]["id"]
+
+    def test_export_transformations_csv(self, client, sample_transformation_data):
+        """Test GET /transformations/export?format=csv flattens the file names."""
+        excel_file = ("test.xlsx", BytesIO(b"excel"), "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        word_file = ("test.docx", BytesIO(b"word"), "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+        client.post(
+            "/transformations",
+            files={"excel_file": excel_file, "word_file": word_file},
+            data={"data": json.dumps(sample_transformation_data)}
+        )
+
+        response = client.get("/transformations/export?format=csv")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        rows = response.text.splitlines()
+        assert rows[0] == "id,created_at,status,carrier,trade_lane,xlsx_name,docx_name"
+        assert rows[1].endswith(",test.xlsx,test.docx")
+        assert client.get("/transformations/export?format=xml").status_code == 422
+
+    def test_get_transformation_facets(self, client):
+        """Test GET /transformations/facets counts values under the filters."""
+        for carrier in ["MSC", "CMA", "MSC"]:
+            data = {
+                "carrier": carrier,
+                "trade_lane": "EU-US",
+                "dates": [{"application_date": "2024-01-01", "validity_date": "2024-12-31"}]
+            }
+            excel_file = ("test.xlsx", BytesIO(b"excel"), "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+            word_file = ("test.docx", BytesIO(b"word"), "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+            client.post(
+                "/transformations",
+                files={"excel_file": excel_file, "word_file": word_file},
+                data={"data": json.dumps(data)}
+            )
+
+        response = client.get("/transformations/facets?carrier=MSC")
+
+        assert response.status_code == 200
+        assert response.json() == {
+            "carrier": {"MSC": 2, "CMA": 1},
+            "trade_lane": {"EU-US": 2},
+            "status": {"IN_PROGRESS": 2},
+            "stage": {"UPLOAD_COMPLETE": 2},
+        }
+
     def test_get_status_details_success(self, client, sample_transformation_data):
         """Test getting status details for existing transformation."""
         # Create transformation
@@ -169,3 +332,111 @@ class TestTransformationsAPI:
 
         assert response.status_code == 404
         assert "not found" in response.json()["detail"].lower()
+
+    def test_get_status_details_batch(self, client, sample_transformation_data):
+        """Test POST /transformations/status:batch answers known and unknown ids."""
+        ids = []
+        for _ in range(2):
+            create_response = client.post(
+                "/transformations",
+                files={
+                    "excel_file": ("test.xlsx", BytesIO(b"excel"), "application/octet-stream"),
+                    "word_file": ("test.docx", BytesIO(b"word"), "application/octet-stream"),
+                },
+                data={"data": json.dumps(sample_transformation_data)}
+            )
+            ids.append(create_response.json()["items"][0]["id"])
+
+        response = client.post(
+            "/transformations/status:batch",
+            json={"ids": [ids[1], "non-existent-id", ids[0], ids[1]]},
+        )
+
+        assert response.status_code == 200
+        items = response.json()["items"]
+        assert [item["id"] for item in items] == [ids[1], "non-existent-id", ids[0]]
+        assert [item["found"] for item in items] == [True, False, True]
+        assert items[0]["status_details"]["UPLOAD_COMPLETE"] is True
+        assert items[0]["progress"] == 0
+        assert items[1]["status_details"] is None
+
+    def test_get_status_details_batch_too_many_ids(self, client, monkeypatch):
+        """Test the number of ids per request is capped."""
+        from app.core.config import settings
+        monkeypatch.setattr(settings, "STATUS_BATCH_MAX_IDS", 2)
+
+        response = client.post("/transformations/status:batch", json={"ids": ["a", "b", "c"]})
+
+        assert response.status_code == 400
+
+    def test_publish_transformation(self, client, sample_transformation_data):
+        """Test POST /transformations/{id}/publish sets READY_TO_PUBLISH."""
+        create_response = client.post(
+            "/transformations",
+            files={
+                "excel_file": ("test.xlsx", BytesIO(b"excel"), "application/octet-stream"),
+                "word_file": ("test.docx", BytesIO(b"word"), "application/octet-stream"),
+            },
+            data={"data": json.dumps(sample_transformation_data)}
+        )
+        transformation_id = create_response.json()["items"][0]["id"]
+
+        response = client.post(f"/transformations/{transformation_id}/publish", data={"modified": "false"})
+
+        assert response.status_code == 200
+        assert response.json()["status_details"]["READY_TO_PUBLISH"] is True
+        status = client.get(f"/transformations/{transformation_id}/status-details-in-progress").json()
+        assert status["READY_TO_PUBLISH"] is True
+
+    def test_publish_modified_requires_file(self, client):
+        """Test modified=true without excel_file is rejected."""
+        response = client.post("/transformations/some-id/publish", data={"modified": "true"})
+
+        assert response.status_code == 400
+        assert "excel_file is required" in response.json()["detail"]
+
+    def test_stream_status_details_not_found(self, client):
+        """Test the status stream rejects unknown transformations."""
+        response = client.get("/transformations/non-existent-id/status-details-in-progress/stream")
+
+        assert response.status_code == 404
+
+    async def test_stream_status_details_pushes_changes(self, test_db, async_session_factory):
+        """Test the status stream sends the current status then each change."""
+        test_db.add(Transformation(
+            id="test-id",
+            status="IN_PROGRESS",
+            carrier="MSC",
+            trade_lane="EU-US",
+            xlsx_name="test.xlsx",
+            docx_name="test.docx"
+        ))
+        test_db.commit()
+
+        response = await stream_status_details("test-id", session_factory=async_session_factory)
+        events = response.body_iterator
+
+        assert response.media_type == "text/event-stream"
+        first = await events.__anext__()
+        assert first.startswith("event: status\n")
+        assert json.loads(first.split("data: ", 1)[1])["progress"] == 0
+
+        async with async_session_factory() as db:
+            await TransformationsService(db=db).update_status("test-id", progress=60)
+
+        update = await events.__anext__()
+        assert json.loads(update.split("data: ", 1)[1])["progress"] == 60
+        await events.aclose()
+
+    def test_get_trade_lanes_and_carriers(self, client, sample_transformation_data):
+        """Test GET /trade-lanes and GET /carriers list distinct values."""
+        excel_file = ("test.xlsx", BytesIO(b"excel"), "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        word_file = ("test.docx", BytesIO(b"word"), "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+        client.post(
+            "/transformations",
+            files={"excel_file": excel_file, "word_file": word_file},
+            data={"data": json.dumps(sample_transformation_data)}
+        )
+
+        assert client.get("/trade-lanes").json() == ["EU-US"]
+        assert client.get("/carriers").json() == ["MSC"]
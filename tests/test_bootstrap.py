@@ -0,0 +1,195 @@
+"""Tests for DatabaseBootstrap."""
+import os
+import sqlite3
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+import app.main as main_module
+from app.db.bootstrap import DatabaseBootstrap
+
+
+class FakeBlob:
+    def __init__(self, bucket, name, data, generation):
+        self.bucket = bucket
+        self.name = name
+        self.data = data
+        self.generation = generation
+
+    def download_to_filename(self, filename, if_generation_match=None):
+        assert if_generation_match == self.generation
+        self.bucket.downloads += 1
+        with open(filename, "wb") as f:
+            f.write(self.data)
+
+
+class FakeBucket:
+    def __init__(self):
+        self.blobs = {}
+        self.downloads = 0
+
+    def get_blob(self, name):
+        return self.blobs.get(name)
+
+
+def make_sqlite_bytes(path, marker):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE marker (value TEXT)")
+    conn.execute("INSERT INTO marker VALUES (?)", (marker,))
+    conn.commit()
+    conn.close()
+    with open(path, "rb") as f:
+        data = f.read()
+    os.unlink(path)
+    return data
+
+
+def read_marker(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT value FROM marker").fetchone()[0]
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def local_db_path(tmp_path):
+    return str(tmp_path / "local" / "ratecard.sqlite")
+
+
+@pytest.fixture
+async def engine(local_db_path):
+    os.makedirs(os.path.dirname(local_db_path), exist_ok=True)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{local_db_path}", poolclass=NullPool)
+    yield engine
+    await engine.dispose()
+
+
+class TestDatabaseBootstrap:
+    """Test suite for DatabaseBootstrap."""
+
+    async def test_local_mode_creates_tables(self, engine, local_db_path):
+        """Test the bootstrap without a bucket only creates the schema."""
+        bootstrap = DatabaseBootstrap(engine=engine, db_file_path=local_db_path)
+
+        assert bootstrap.state == DatabaseBootstrap.PENDING
+        await bootstrap.wait_ready()
+
+        assert bootstrap.is_ready
+        async with engine.connect() as conn:
+            tables = await conn.run_sync(lambda c: inspect(c).get_table_names())
+        assert "transformations" in tables
+
+    async def test_downloads_then_skips_same_generation(self, tmp_path, engine, local_db_path):
+        """Test the download happens once per GCS generation."""
+        bucket = FakeBucket()
+        bucket.blobs["api-db/ratecard.sqlite"] = FakeBlob(
+            bucket, "api-db/ratecard.sqlite", make_sqlite_bytes(str(tmp_path / "v1.sqlite"), "v1"), 1
+        )
+
+        def new_bootstrap():
+            return DatabaseBootstrap(
+                engine=engine,
+                db_file_path=local_db_path,
+                gcs_db_path="api-db/ratecard.sqlite",
+                bucket_factory=lambda: bucket,
+            )
+
+        first = new_bootstrap()
+        await first.wait_ready()
+        assert first.downloaded is True
+        assert first.generation == 1
+        assert read_marker(local_db_path) == "v1"
+
+        second = new_bootstrap()
+        await second.wait_ready()
+        assert second.downloaded is False
+        assert bucket.downloads == 1
+
+        bucket.blobs["api-db/ratecard.sqlite"] = FakeBlob(
+            bucket, "api-db/ratecard.sqlite", make_sqlite_bytes(str(tmp_path / "v2.sqlite"), "v2"), 2
+        )
+        third = new_bootstrap()
+        await third.wait_ready()
+        assert third.downloaded is True
+        assert bucket.downloads == 2
+        assert read_marker(local_db_path) == "v2"
+
+    async def test_missing_object_starts_empty(self, engine, local_db_path):
+        """Test the first deployment starts from an empty database."""
+        bootstrap = DatabaseBootstrap(
+            engine=engine,
+            db_file_path=local_db_path,
+            gcs_db_path="api-db/ratecard.sqlite",
+            bucket_factory=FakeBucket,
+        )
+
+        await bootstrap.wait_ready()
+
+        assert bootstrap.is_ready
+        assert bootstrap.generation is None
+
+    async def test_failure_is_reported_and_retried(self, engine, local_db_path):
+        """Test a failed bootstrap raises on use and runs again on the next call."""
+        calls = []
+
+        def bucket_factory():
+            calls.append(1)
+            raise ConnectionError("no network")
+
+        bootstrap = DatabaseBootstrap(
+            engine=engine,
+            db_file_path=local_db_path,
+            gcs_db_path="api-db/ratecard.sqlite",
+            bucket_factory=bucket_factory,
+        )
+
+        with pytest.raises(RuntimeError, match="no network"):
+            await bootstrap.wait_ready()
+        assert bootstrap.state == DatabaseBootstrap.FAILED
+
+        with pytest.raises(RuntimeError):
+            await bootstrap.wait_ready()
+        assert len(calls) == 2
+
+
+class TestHealthEndpoint:
+    """Test suite for GET /health."""
+
+    def test_health_ready(self, client, monkeypatch, engine, local_db_path):
+        bootstrap = DatabaseBootstrap(engine=engine, db_file_path=local_db_path)
+        bootstrap.state = DatabaseBootstrap.READY
+        monkeypatch.setattr(main_module, "database_bootstrap", bootstrap)
+
+        response = client.get("/health")
+
+        assert response.status_code == 200
+        assert response.json()["database"] == "ready"
+
+    def test_health_not_ready(self, client, monkeypatch, engine, local_db_path):
+        bootstrap = DatabaseBootstrap(
+            engine=engine,
+            db_file_path=local_db_path,
+            gcs_db_path="api-db/ratecard.sqlite",
+            bucket_factory=FakeBucket,
+        )
+        bootstrap.start = lambda: None
+        monkeypatch.setattr(main_module, "database_bootstrap", bootstrap)
+
+        response = client.get("/health")
+
+        assert response.status_code == 503
+        assert response.json()["database"] == "pending"
+
+    def test_health_snapshot_conflict(self, client, monkeypatch, engine, local_db_path):
+        bootstrap = DatabaseBootstrap(engine=engine, db_file_path=local_db_path)
+        bootstrap.state = DatabaseBootstrap.READY
+        monkeypatch.setattr(main_module, "database_bootstrap", bootstrap)
+        monkeypatch.setattr(main_module, "database_snapshotter", SimpleNamespace(conflict=True))
+
+        response = client.get("/health")
+
+        assert response.status_code == 503
+        assert response.json()["status"] == "conflict"
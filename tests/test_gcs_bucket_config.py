@@ -0,0 +1,139 @@
+"""Tests for the job registry and the GCS path builder."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app.services.gcs_bucket_config import (
+    RATE_CARD_PATH,
+    SOP_PATH,
+    SUB_JOB_OUTPUT_AUTOMATED_PATH,
+    SUB_JOB_OUTPUT_MODIFIED_PATH,
+    JobRegistry,
+    build_content_path,
+    build_sub_job_paths,
+    build_transformation_paths,
+    get_jobs_config,
+    get_sub_job_name_from_id,
+    job_registry,
+)
+
+
+def write_jobs(path, jobs):
+    path.write_text("jobs:\n" + "".join(f"  - id: {i}\n    name: {n}\n" for i, n in jobs))
+
+
+class TestJobRegistry:
+    """Test suite for JobRegistry."""
+
+    def test_maps_both_ways(self, tmp_path):
+        """Test that jobs are indexed by id and by name"""
+        path = tmp_path / "jobs.yml"
+        write_jobs(path, [(1, "parsing"), (2, "extract-pols-pods")])
+
+        registry = JobRegistry(str(path))
+
+        assert registry.id_to_name == {1: "parsing", 2: "extract-pols-pods"}
+        assert registry.name_to_id == {"parsing": 1, "extract-pols-pods": 2}
+        assert registry.depends_on == {"parsing": (), "extract-pols-pods": ()}
+
+    def test_parsed_once_while_file_unchanged(self, tmp_path, monkeypatch):
+        """Test that the YAML is not parsed again while the mtime is the same"""
+        path = tmp_path / "jobs.yml"
+        write_jobs(path, [(1, "parsing")])
+        registry = JobRegistry(str(path), check_interval=0)
+        registry.config
+
+        loads = []
+        import yaml
+        original = yaml.safe_load
+        monkeypatch.setattr(yaml, "safe_load", lambda f: loads.append(1) or original(f))
+
+        for _ in range(5):
+            assert registry.id_to_name[1] == "parsing"
+        assert loads == []
+
+    def test_reloaded_when_mtime_changes(self, tmp_path):
+        """Test that an edited file is picked up"""
+        path = tmp_path / "jobs.yml"
+        write_jobs(path, [(1, "parsing")])
+        registry = JobRegistry(str(path), check_interval=0)
+        assert registry.id_to_name == {1: "parsing"}
+
+        write_jobs(path, [(1, "parsing"), (7, "new-job")])
+        stat = os.stat(path)
+        os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+        assert registry.id_to_name == {1: "parsing", 7: "new-job"}
+
+    def test_mtime_not_checked_within_interval(self, tmp_path):
+        """Test that changes are only looked for every check_interval seconds"""
+        path = tmp_path / "jobs.yml"
+        write_jobs(path, [(1, "parsing")])
+        registry = JobRegistry(str(path), check_interval=3600)
+        registry.config
+
+        write_jobs(path, [(2, "other")])
+        stat = os.stat(path)
+        os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+        assert registry.id_to_name == {1: "parsing"}
+
+    def test_module_helpers(self):
+        """Test that the module-level helpers read the shipped jobs.yml"""
+        assert get_jobs_config()[1] == "parsing"
+        assert get_sub_job_name_from_id(2) == "extract-pols-pods"
+        assert job_registry.depends_on["build_unlocode"] == ("explode-pols-pods",)
+
+
+# value set for the test run in conftest
+ROOT = "rate-card-transformation"
+
+
+class TestTransformationPaths:
+    """Test suite for build_transformation_paths."""
+
+    def test_matches_templates(self):
+        """Test that the built paths are the formatted templates"""
+        paths = build_transformation_paths("MSC_ASIA_1")
+
+        assert paths.rate_card == RATE_CARD_PATH.format(all_jobs_root_path=ROOT, transformation_id="MSC_ASIA_1")
+        assert paths.sop == SOP_PATH.format(all_jobs_root_path=ROOT, transformation_id="MSC_ASIA_1")
+        assert set(paths.jobs) == set(get_jobs_config().values())
+        parsing = paths.jobs["parsing"]
+        assert parsing.output_automated == SUB_JOB_OUTPUT_AUTOMATED_PATH.format(
+            all_jobs_root_path=ROOT, transformation_id="MSC_ASIA_1", job_name="parsing"
+        )
+        assert parsing.output_modified == SUB_JOB_OUTPUT_MODIFIED_PATH.format(
+            all_jobs_root_path=ROOT, transformation_id="MSC_ASIA_1", job_name="parsing"
+        )
+
+    def test_single_sub_job(self):
+        """Test paths of a job that is not in jobs.yml"""
+        paths = build_sub_job_paths("T1", "custom")
+
+        assert paths.output_modified == SUB_JOB_OUTPUT_MODIFIED_PATH.format(
+            all_jobs_root_path=ROOT, transformation_id="T1", job_name="custom"
+        )
+
+    def test_root_path_required_on_use(self, monkeypatch):
+        """Test that building a key without ALL_JOBS_ROOT_PATH fails instead of guessing a prefix"""
+        monkeypatch.delenv("ALL_JOBS_ROOT_PATH")
+
+        with pytest.raises(ValueError, match="ALL_JOBS_ROOT_PATH"):
+            build_transformation_paths("T1")
+        with pytest.raises(ValueError, match="ALL_JOBS_ROOT_PATH"):
+            build_content_path("abc")
+
+    def test_import_without_bucket_env(self):
+        """Test that the module imports when BUCKET and ALL_JOBS_ROOT_PATH are unset"""
+        env = {k: v for k, v in os.environ.items() if k not in ("BUCKET", "ALL_JOBS_ROOT_PATH")}
+        result = subprocess.run(
+            [sys.executable, "-c", "import app.services.gcs_bucket_config"],
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+
+        assert result.returncode == 0, result.stderr
@@ -0,0 +1,55 @@
+"""Cold start budget: what importing the app costs."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+# loaded on first use only: the bucket client, the jobs.yml parser, the
+# workbook parser and what the local and Airflow pipeline triggers need
+LAZY_MODULES = (
+    "google.cloud.storage",
+    "google.api_core",
+    "yaml",
+    "openpyxl",
+    "multiprocessing",
+    "urllib.request",
+)
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "3000"))
+
+
+def run_import(*options):
+    env = {k: v for k, v in os.environ.items() if k not in ("BUCKET", "GCS_BUCKET")}
+    env.update(MODE="local", DB_BOOTSTRAP_ON_STARTUP="false")
+    return subprocess.run(
+        [sys.executable, *options, "-c",
+         "import time; started = time.perf_counter(); import app.main; print(time.perf_counter() - started)"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+@pytest.fixture(scope="module")
+def imported_modules():
+    result = run_import("-X", "importtime")
+    return {
+        line.rsplit("|", 1)[1].strip()
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:")
+    }
+
+
+class TestImportTime:
+    """Test suite for the import cost of app.main."""
+
+    def test_lazy_modules_not_imported(self, imported_modules):
+        """Test that optional heavy modules are not imported with the app"""
+        assert [name for name in LAZY_MODULES if name in imported_modules] == []
+
+    def test_import_within_budget(self):
+        """Test that importing the app stays under IMPORT_TIME_BUDGET_MS"""
+        seconds = min(float(run_import().stdout.strip()) for _ in range(3))
+
+        assert seconds * 1000 < IMPORT_BUDGET_MS
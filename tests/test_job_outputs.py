@@ -0,0 +1,152 @@
+"""Tests for the job output cache and endpoint."""
+import pytest
+from fastapi import HTTPException
+
+from app.api.routes.transformations import get_storage_service
+from app.main import app
+from app.services.job_outputs import JobOutputService, OutputCache, etag_matches, output_cache
+
+AUTOMATED = "rate-card-transformation/transformation-t1/job-parsing/output/automated/output.json"
+MODIFIED = "rate-card-transformation/transformation-t1/job-parsing/output/modified/output.json"
+
+
+class TestOutputCache:
+    """Test suite for OutputCache."""
+
+    def test_evicts_least_recently_used(self):
+        """Test the cache stays under its byte budget, dropping the oldest entries"""
+        cache = OutputCache(max_bytes=10)
+        cache.put("a", 1, b"aaaa")
+        cache.put("b", 1, b"bbbb")
+        cache.get("a", 1)
+        cache.put("c", 1, b"cccc")
+
+        assert cache.get("b", 1) is None
+        assert cache.get("a", 1) == b"aaaa"
+        assert cache.get("c", 1) == b"cccc"
+        assert cache.size == 8
+
+    def test_keyed_by_generation(self):
+        """Test a new generation is a different entry"""
+        cache = OutputCache(max_bytes=100)
+        cache.put("a", 1, b"old")
+
+        assert cache.get("a", 2) is None
+
+    def test_oversized_entry_not_cached(self):
+        """Test an entry larger than the budget is ignored"""
+        cache = OutputCache(max_bytes=3)
+        cache.put("a", 1, b"toolarge")
+
+        assert len(cache) == 0
+
+    def test_etag_matches(self):
+        """Test If-None-Match parsing"""
+        assert etag_matches('"1", "2"', '"2"')
+        assert etag_matches('W/"2"', '"2"')
+        assert etag_matches("*", '"2"')
+        assert not etag_matches('"1"', '"2"')
+        assert not etag_matches(None, '"2"')
+
+
+class TestJobOutputService:
+    """Test suite for JobOutputService."""
+
+    async def test_repeated_reads_download_once(self, fake_storage):
+        """Test the content is downloaded once per generation"""
+        fake_storage.put(AUTOMATED, b'{"rows": 1}')
+        service = JobOutputService(fake_storage, cache=OutputCache(1024))
+
+        first = await service.get_output("t1", "parsing")
+        second = await service.get_output("t1", "parsing")
+
+        assert first.content == second.content == b'{"rows": 1}'
+        assert first.etag == '"1"'
+        assert len(fake_storage.downloads) == 1
+
+    async def test_new_generation_downloaded(self, fake_storage):
+        """Test a rewritten output is not served from the cache"""
+        fake_storage.put(MODIFIED, b'{"v": 1}')
+        service = JobOutputService(fake_storage, cache=OutputCache(1024))
+        await service.get_output("t1", "parsing", variant="modified")
+
+        fake_storage.put(MODIFIED, b'{"v": 2}')
+        output = await service.get_output("t1", "parsing", variant="modified")
+
+        assert output.content == b'{"v": 2}'
+        assert output.etag == '"2"'
+
+    async def test_not_modified(self, fake_storage):
+        """Test a matching If-None-Match downloads nothing"""
+        fake_storage.put(AUTOMATED, b"{}")
+        service = JobOutputService(fake_storage, cache=OutputCache(1024))
+
+        output = await service.get_output("t1", "parsing", if_none_match='"1"')
+
+        assert output.not_modified
+        assert fake_storage.downloads == []
+
+    async def test_large_output_streamed(self, fake_storage):
+        """Test outputs above max_item_bytes are read in ranges and not cached"""
+        fake_storage.put(AUTOMATED, b"x" * 10)
+        cache = OutputCache(1024)
+        service = JobOutputService(fake_storage, cache=cache, max_item_bytes=5, chunk_size=4)
+
+        output = await service.get_output("t1", "parsing")
+
+        assert output.content is None
+        assert b"".join(output.chunks) == b"x" * 10
+        assert [(start, end) for _, start, end in fake_storage.downloads] == [(0, 3), (4, 7), (8, 9)]
+        assert len(cache) == 0
+
+    async def test_unknown_job(self, fake_storage):
+        """Test jobs that are not in jobs.yml are rejected"""
+        service = JobOutputService(fake_storage, cache=OutputCache(1024))
+
+        with pytest.raises(HTTPException) as exc_info:
+            await service.get_output("t1", "not-a-job")
+
+        assert exc_info.value.status_code == 404
+
+    async def test_missing_output(self, fake_storage):
+        """Test a job that has not written its output yet"""
+        service = JobOutputService(fake_storage, cache=OutputCache(1024))
+
+        with pytest.raises(HTTPException) as exc_info:
+            await service.get_output("t1", "parsing")
+
+        assert exc_info.value.status_code == 404
+
+
+class TestJobOutputAPI:
+    """Test suite for GET /transformations/{id}/jobs/{job}/output."""
+
+    @pytest.fixture
+    def storage_client(self, client, fake_storage):
+        output_cache.clear()
+        app.dependency_overrides[get_storage_service] = lambda: fake_storage
+        yield client
+        output_cache.clear()
+
+    def test_etag_round_trip(self, storage_client, fake_storage):
+        """Test the ETag is returned and a conditional request gets a 304"""
+        fake_storage.put(AUTOMATED, b'{"rows": 1}')
+
+        response = storage_client.get("/transformations/t1/jobs/parsing/output")
+        assert response.status_code == 200
+        assert response.json() == {"rows": 1}
+        etag = response.headers["etag"]
+
+        response = storage_client.get(
+            "/transformations/t1/jobs/parsing/output", headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 304
+        assert len(fake_storage.downloads) == 1
+
+    def test_no_bucket(self, client):
+        """Test the endpoint without a configured bucket"""
+        app.dependency_overrides[get_storage_service] = lambda: None
+
+        response = client.get("/transformations/t1/jobs/parsing/output")
+
+        assert response.status_code == 503
@@ -0,0 +1,113 @@
+"""Tests for the metrics registry, middleware and SQL timing."""
+from io import BytesIO
+import json
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core import metrics
+from app.core.metrics import Counter, Histogram, instrument_engine, operation_duration, sql_statement_duration
+from app.models.transformations import Transformation
+from app.services.transformations import TransformationsService
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics():
+    metrics.registry.clear()
+    yield
+    metrics.registry.clear()
+
+
+class TestMetrics:
+    """Test suite for the metric types."""
+
+    def test_counter_render(self):
+        """Test counters are rendered one sample per label set"""
+        counter = Counter("uploads_total", "Uploads", ("route",))
+        counter.inc("/a")
+        counter.inc("/a", amount=2)
+        counter.inc('/b"')
+
+        assert counter.render() == [
+            "# HELP uploads_total Uploads",
+            "# TYPE uploads_total counter",
+            'uploads_total{route="/a"} 3',
+            'uploads_total{route="/b\\""} 1',
+        ]
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test histogram buckets, sum and count"""
+        histogram = Histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+
+        assert histogram.render()[2:] == [
+            'latency_seconds_bucket{le="0.1"} 2',
+            'latency_seconds_bucket{le="1"} 3',
+            'latency_seconds_bucket{le="+Inf"} 4',
+            "latency_seconds_sum 2.65",
+            "latency_seconds_count 4",
+        ]
+
+    async def test_sql_labeled_by_service_method(self, db_path):
+        """Test statements run by a service method carry its name"""
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+        instrument_engine(engine.sync_engine)
+        try:
+            async with async_sessionmaker(bind=engine)() as db:
+                await TransformationsService(db=db).list_transformations(limit=5)
+        finally:
+            await engine.dispose()
+
+        assert sql_statement_duration.count("list_transformations") == 1
+        assert sql_statement_duration.count("other") == 0
+
+    async def test_nested_status_lookup_counted_once(self, db_path, test_db):
+        """Test get_status_details is timed once and labels its own SQL"""
+        test_db.add(Transformation(
+            id="test-id", status="IN_PROGRESS", carrier="MSC", trade_lane="EU-US",
+            xlsx_name="test.xlsx", docx_name="test.docx",
+        ))
+        test_db.commit()
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+        instrument_engine(engine.sync_engine)
+        try:
+            async with async_sessionmaker(bind=engine)() as db:
+                await TransformationsService(db=db).get_status_details("test-id")
+        finally:
+            await engine.dispose()
+
+        assert operation_duration.count("get_status_details") == 1
+        assert operation_duration.count("get_status_snapshot") == 0
+        assert sql_statement_duration.count("get_status_details") == 1
+        assert sql_statement_duration.count("get_status_snapshot") == 0
+
+
+class TestMetricsAPI:
+    """Test suite for GET /metrics."""
+
+    def test_request_metrics(self, client, sample_transformation_data):
+        """Test latency by route template and multipart upload bytes"""
+        excel_file = ("test.xlsx", BytesIO(b"excel"), "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        word_file = ("test.docx", BytesIO(b"word"), "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+        created = client.post(
+            "/transformations",
+            files={"excel_file": excel_file, "word_file": word_file},
+            data={"data": json.dumps(sample_transformation_data)}
+        ).json()["items"][0]
+        client.get(f"/transformations/{created['id']}/status-details-in-progress")
+
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        body = response.text
+        assert (
+            'http_request_duration_seconds_count{method="GET",'
+            'route="/transformations/{id}/status-details-in-progress",status="200"} 1'
+        ) in body
+        assert created["id"] not in body
+        assert 'http_upload_bytes_total{route="/transformations"}' in body
+        assert 'service_operation_duration_seconds_count{operation="create_transformation"} 1' in body
+        assert 'http_requests_in_flight{method="GET"} 1' in body
@@ -0,0 +1,212 @@
+"""Tests for the upgrade of a database written by the first version of the API."""
+import json
+import sqlite3
+from datetime import date
+from io import BytesIO
+
+import pytest
+from fastapi import UploadFile
+from sqlalchemy import delete, inspect, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.db.bootstrap import DatabaseBootstrap
+from app.db.migrations import run_data_migrations
+from app.models.transformations import Carrier
+from app.schemas.transformations import DatesItem, TransformationInput
+from app.services.transformations import TransformationsService
+
+# schema of the first release, before status_flags, stage, the side tables and the indexes
+BASELINE_SCHEMA = """
+CREATE TABLE transformations (
+    id VARCHAR NOT NULL,
+    created_at DATETIME NOT NULL,
+    status VARCHAR NOT NULL,
+    carrier VARCHAR NOT NULL,
+    trade_lane VARCHAR NOT NULL,
+    xlsx_name VARCHAR NOT NULL,
+    docx_name VARCHAR NOT NULL,
+    transformation_data TEXT,
+    progress INTEGER,
+    message VARCHAR,
+    status_details TEXT,
+    PRIMARY KEY (id)
+);
+CREATE INDEX ix_transformations_id ON transformations (id);
+CREATE INDEX ix_transformations_status ON transformations (status);
+CREATE INDEX ix_transformations_carrier ON transformations (carrier);
+CREATE INDEX ix_transformations_trade_lane ON transformations (trade_lane);
+"""
+
+
+def create_baseline_database(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    data = {
+        "carrier": "OLD_CARRIER",
+        "trade_lane": "OLD-LANE",
+        "dates": [{"application_date": "2024-01-01", "validity_date": "2024-12-31"}],
+        "surcharges_to_exclude": ["THC"],
+    }
+    conn.execute(
+        "INSERT INTO transformations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            "t1", "2024-01-01 10:00:00.000000", "IN_PROGRESS", "OLD_CARRIER", "OLD-LANE",
+            "old.xlsx", "old.docx", json.dumps(data), 50, "Traitement",
+            json.dumps({"UPLOAD_COMPLETE": True, "PROCESSING": True, "REVIEW": False, "READY_TO_PUBLISH": False}),
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+async def baseline_engine(tmp_path):
+    path = str(tmp_path / "ratecard.sqlite")
+    create_baseline_database(path)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    yield engine, path
+    await engine.dispose()
+
+
+class TestSchemaUpgrade:
+    """Test suite for the bootstrap of a database with the baseline schema."""
+
+    async def test_existing_database_upgraded(self, baseline_engine):
+        """Test status details, listing and creation work on an upgraded database"""
+        engine, path = baseline_engine
+        await DatabaseBootstrap(engine=engine, db_file_path=path).wait_ready()
+
+        async with async_sessionmaker(bind=engine, expire_on_commit=False)() as db:
+            service = TransformationsService(db=db)
+            assert await service.get_status_details("t1") == {
+                "UPLOAD_COMPLETE": True, "PROCESSING": True, "REVIEW": False, "READY_TO_PUBLISH": False,
+            }
+            assert [item["id"] for item in (await service.list_transformations(stage=["PROCESSING"]))["items"]] == ["t1"]
+
+            data = TransformationInput(
+                carrier="NEW",
+                trade_lane="EU-US",
+                dates=[DatesItem(application_date=date(2024, 1, 1), validity_date=date(2024, 12, 31))],
+            )
+            await service.create_transformation(
+                UploadFile(filename="new.xlsx", file=BytesIO(b"excel")),
+                UploadFile(filename="new.docx", file=BytesIO(b"word")),
+                data,
+            )
+            assert len((await service.list_transformations())["items"]) == 2
+
+    async def test_lookups_backfilled_despite_create_before_first_read(self, baseline_engine):
+        """Test the carriers of the history survive a create made before any read"""
+        engine, path = baseline_engine
+        await DatabaseBootstrap(engine=engine, db_file_path=path).wait_ready()
+
+        async with async_sessionmaker(bind=engine, expire_on_commit=False)() as db:
+            service = TransformationsService(db=db)
+            await service.create_transformation(
+                UploadFile(filename="new.xlsx", file=BytesIO(b"excel")),
+                UploadFile(filename="new.docx", file=BytesIO(b"word")),
+                TransformationInput(
+                    carrier="NEW",
+                    trade_lane="EU-US",
+                    dates=[DatesItem(application_date=date(2024, 1, 1), validity_date=date(2024, 12, 31))],
+                ),
+            )
+
+            assert await service.get_carriers() == ["NEW", "OLD_CARRIER"]
+            assert await service.get_trade_lanes() == ["EU-US", "OLD-LANE"]
+
+    async def test_history_searchable(self, baseline_engine):
+        """Test the data of the transformations already recorded is indexed for search"""
+        engine, path = baseline_engine
+        await DatabaseBootstrap(engine=engine, db_file_path=path).wait_ready()
+
+        async with async_sessionmaker(bind=engine, expire_on_commit=False)() as db:
+            result = await TransformationsService(db=db).search_transformations(surcharge_excluded=["THC"])
+        assert [item["id"] for item in result["items"]] == ["t1"]
+
+    async def test_indexes_created(self, baseline_engine):
+        """Test the indexes added to existing tables since the first release exist"""
+        engine, path = baseline_engine
+        await DatabaseBootstrap(engine=engine, db_file_path=path).wait_ready()
+
+        async with engine.connect() as conn:
+            indexes = await conn.run_sync(
+                lambda c: {index["name"] for index in inspect(c).get_indexes("transformations")}
+            )
+        assert {
+            "ix_transformations_created_at_id",
+            "ix_transformations_carrier_created_at_id",
+            "ix_transformations_stage_created_at_id",
+        } <= indexes
+        # replaced by the (x, created_at, id) indexes
+        assert not indexes & {
+            "ix_transformations_status",
+            "ix_transformations_carrier",
+            "ix_transformations_trade_lane",
+        }
+
+    async def test_obsolete_columns_dropped(self, baseline_engine):
+        """Test columns the model no longer has are dropped once converted"""
+        engine, path = baseline_engine
+        await DatabaseBootstrap(engine=engine, db_file_path=path).wait_ready()
+
+        async with engine.connect() as conn:
+            columns = await conn.run_sync(
+                lambda c: {column["name"] for column in inspect(c).get_columns("transformations")}
+            )
+        assert "status_details" not in columns
+        assert {"status_flags", "stage"} <= columns
+
+    async def test_upgrade_is_idempotent(self, baseline_engine):
+        """Test a second bootstrap leaves the upgraded database as it is"""
+        engine, path = baseline_engine
+        await DatabaseBootstrap(engine=engine, db_file_path=path).wait_ready()
+        async with async_sessionmaker(bind=engine, expire_on_commit=False)() as db:
+            await TransformationsService(db=db).update_status("t1", status_details={"REVIEW": True})
+
+        await DatabaseBootstrap(engine=engine, db_file_path=path).wait_ready()
+
+        async with async_sessionmaker(bind=engine, expire_on_commit=False)() as db:
+            details = await TransformationsService(db=db).get_status_details("t1")
+        assert details["REVIEW"] is True
+
+    async def test_data_migrations_run_once(self, baseline_engine):
+        """Test an applied data migration is recorded and not run again"""
+        engine, path = baseline_engine
+        await DatabaseBootstrap(engine=engine, db_file_path=path).wait_ready()
+        async with engine.begin() as conn:
+            await conn.execute(delete(Carrier).where(Carrier.name == "OLD_CARRIER"))
+
+        await DatabaseBootstrap(engine=engine, db_file_path=path).wait_ready()
+
+        async with engine.connect() as conn:
+            assert (await conn.execute(select(Carrier.name))).scalars().all() == []
+            assert await conn.run_sync(run_data_migrations) == []
+
+
+class TestDataMigrations:
+    """Test suite for the data migrations of a database with the current schema."""
+
+    async def test_index_keeps_rows_already_indexed(self, db_path, async_db):
+        """Test indexing the history does not duplicate the rows indexed on create"""
+        service = TransformationsService(db=async_db)
+        await service.create_transformation(
+            UploadFile(filename="new.xlsx", file=BytesIO(b"excel")),
+            UploadFile(filename="new.docx", file=BytesIO(b"word")),
+            TransformationInput(
+                carrier="MSC",
+                trade_lane="EU-US",
+                dates=[DatesItem(application_date=date(2024, 1, 1), validity_date=date(2024, 12, 31))],
+                surcharges_to_exclude=["THC"],
+            ),
+        )
+
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+        try:
+            await DatabaseBootstrap(engine=engine, db_file_path=db_path).wait_ready()
+        finally:
+            await engine.dispose()
+
+        result = await service.search_transformations(surcharge_excluded=["THC"])
+        assert len(result["items"]) == 1
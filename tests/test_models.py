@@ -135,6 +135,32 @@ class TestTransformationModel:
         assert result["REVIEW"] is False
         assert result["READY_TO_PUBLISH"] is False
 
+    def test_status_details_stored_as_flags_and_stage(self):
+        """Test status details map to the bitmask and the furthest stage reached."""
+        transformation = Transformation(
+            id="test-id",
+            status="IN_PROGRESS",
+            carrier="MSC",
+            trade_lane="EU-US",
+            xlsx_name="test.xlsx",
+            docx_name="test.docx"
+        )
+
+        transformation.set_status_details({
+            "UPLOAD_COMPLETE": True,
+            "PROCESSING": True,
+            "REVIEW": False,
+            "READY_TO_PUBLISH": False
+        })
+
+        assert transformation.status_flags == 0b0011
+        assert transformation.stage == "PROCESSING"
+
+        transformation.set_status_details({})
+
+        assert transformation.status_flags == 0
+        assert transformation.stage is None
+
     def test_created_at_default(self, test_db):
         """Test that created_at is set automatically."""
         transformation = Transformation(
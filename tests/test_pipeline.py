@@ -0,0 +1,276 @@
+"""Tests for the local pipeline runner and the pipeline triggers."""
+import json
+import multiprocessing
+import threading
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from app.core.config import settings
+from app.models.transformations import Transformation
+from app.schemas.transformations import JobStateEnum, TransformationInput
+from app.services.gcs_bucket_config import job_registry
+from app.services.pipeline import (
+    AirflowPipelineTrigger,
+    LocalPipelineTrigger,
+    PipelineRunner,
+    PipelineTrigger,
+    get_pipeline_trigger,
+    topological_order,
+)
+from app.services.pipeline_stages import run_stage
+from app.services.transformations import TransformationsService
+
+EXTRACT_JOBS = {"extract-pols-pods", "extract-containers-prices", "extract-sop-instructions", "extract-dates-currency"}
+
+
+@pytest.fixture
+def transformation(test_db):
+    t = Transformation(
+        id="t1", status="IN_PROGRESS", carrier="MSC", trade_lane="EU-US",
+        xlsx_name="a.xlsx", docx_name="a.docx", progress=0,
+    )
+    t.set_status_details({"UPLOAD_COMPLETE": True})
+    test_db.add(t)
+    test_db.commit()
+    return t
+
+
+def thread_runner(session_factory, stage):
+    return PipelineRunner(session_factory, executor_factory=lambda: ThreadPoolExecutor(max_workers=4), stage=stage)
+
+
+class TestTopologicalOrder:
+    """Test suite for topological_order."""
+
+    def test_dependencies_first(self):
+        """Test the shipped jobs.yml is ordered parents first"""
+        order = topological_order(job_registry.depends_on)
+
+        assert order[0] == "parsing"
+        assert order.index("extract-pols-pods") < order.index("explode-pols-pods") < order.index("build_unlocode")
+
+    def test_cycle(self):
+        """Test that a cycle is rejected"""
+        with pytest.raises(ValueError, match="cycle"):
+            topological_order({"a": ("b",), "b": ("a",)})
+
+    def test_unknown_dependency(self):
+        """Test that a dependency on a missing job is rejected"""
+        with pytest.raises(ValueError, match="unknown"):
+            topological_order({"a": ("missing",)})
+
+
+class TestPipelineRunner:
+    """Test suite for PipelineRunner."""
+
+    async def test_runs_extract_stages_in_parallel(self, transformation, async_session_factory, async_db):
+        """Test the whole DAG runs, with the four extract stages at the same time"""
+        # each extract stage waits for the three others: only passes if they overlap
+        barrier = threading.Barrier(len(EXTRACT_JOBS), timeout=5)
+        calls = []
+
+        def stage(job_name, transformation_id):
+            calls.append(job_name)
+            if job_name in EXTRACT_JOBS:
+                barrier.wait()
+
+        runner = thread_runner(async_session_factory, stage)
+        try:
+            states = await runner.run("t1")
+        finally:
+            runner.shutdown()
+
+        assert set(states.values()) == {"SUCCEEDED"}
+        assert calls[0] == "parsing"
+        assert calls.index("explode-pols-pods") < calls.index("build_unlocode")
+        service = TransformationsService(db=async_db)
+        snapshot = await service.get_status_snapshot("t1")
+        assert snapshot["progress"] == 100
+        assert snapshot["status_details"]["PROCESSING"] is True
+        assert snapshot["status_details"]["REVIEW"] is True
+        assert set((await service.get_job_states("t1")).values()) == {"SUCCEEDED"}
+
+    async def test_failure_stops_dependents(self, transformation, async_session_factory, async_db):
+        """Test a failed stage leaves its dependents pending and no review"""
+        def stage(job_name, transformation_id):
+            if job_name == "extract-pols-pods":
+                raise RuntimeError("no ports found")
+
+        runner = thread_runner(async_session_factory, stage)
+        try:
+            states = await runner.run("t1")
+        finally:
+            runner.shutdown()
+
+        assert states["extract-pols-pods"] == "FAILED"
+        assert states["explode-pols-pods"] == "PENDING"
+        assert states["build_unlocode"] == "PENDING"
+        assert states["extract-containers-prices"] == "SUCCEEDED"
+        snapshot = await TransformationsService(db=async_db).get_status_snapshot("t1")
+        assert snapshot["status_details"]["REVIEW"] is False
+        assert "no ports found" in snapshot["message"]
+
+    async def test_record_error_fails_the_run(self, transformation, async_session_factory, async_db):
+        """Test an error while recording a state fails the jobs instead of escaping run"""
+        class FlakyRunner(PipelineRunner):
+            async def _record(self, transformation_id, state=None, **kwargs):
+                if state == JobStateEnum.SUCCEEDED:
+                    raise HTTPException(status_code=500, detail="database is locked")
+                await super()._record(transformation_id, state=state, **kwargs)
+
+        runner = FlakyRunner(
+            async_session_factory,
+            executor_factory=lambda: ThreadPoolExecutor(max_workers=4),
+            stage=lambda job_name, transformation_id: None,
+        )
+        try:
+            states = await runner.run("t1")
+        finally:
+            runner.shutdown()
+
+        assert "FAILED" in states.values()
+        assert not {"PENDING", "RUNNING"} & set(states.values())
+        snapshot = await TransformationsService(db=async_db).get_status_snapshot("t1")
+        assert snapshot["status_details"]["PROCESSING"] is False
+        assert snapshot["message"].startswith("Échec du pipeline")
+
+    async def test_deleted_transformation(self, async_session_factory):
+        """Test a run for a missing transformation ends without raising"""
+        runner = thread_runner(async_session_factory, lambda job_name, transformation_id: None)
+        try:
+            states = await runner.run("missing")
+        finally:
+            runner.shutdown()
+
+        assert set(states.values()) == {"FAILED"}
+
+    async def test_process_pool(self, transformation, async_session_factory):
+        """Test the default stage runs in worker processes"""
+        runner = PipelineRunner(
+            async_session_factory,
+            executor_factory=lambda: ProcessPoolExecutor(2, mp_context=multiprocessing.get_context("spawn")),
+        )
+        try:
+            states = await runner.run("t1")
+        finally:
+            runner.shutdown()
+
+        assert set(states.values()) == {"SUCCEEDED"}
+
+
+class TestPipelineTriggers:
+    """Test suite for the pipeline triggers."""
+
+    async def test_create_transformation_starts_local_pipeline(self, async_session_factory, async_db):
+        """Test creating a transformation runs its pipeline in the background"""
+        trigger = LocalPipelineTrigger(thread_runner(async_session_factory, lambda job_name, transformation_id: None))
+        service = TransformationsService(db=async_db, trigger=trigger)
+
+        result = await service.create_transformation(
+            UploadFile(filename="a.xlsx", file=BytesIO(b"excel")),
+            UploadFile(filename="a.docx", file=BytesIO(b"word")),
+            TransformationInput(carrier="MSC", trade_lane="EU-US", dates=[]),
+        )
+        await trigger.wait()
+        await trigger.close()
+
+        transformation_id = result["items"][0]["id"]
+        async with async_session_factory() as db:
+            snapshot = await TransformationsService(db=db).get_status_snapshot(transformation_id)
+        assert snapshot["status_details"]["REVIEW"] is True
+
+    async def test_trigger_failure_keeps_transformation(self, async_db):
+        """Test a trigger error does not fail the creation"""
+        class BrokenTrigger(PipelineTrigger):
+            async def trigger(self, transformation_id, inputs=None):
+                raise RuntimeError("airflow down")
+
+        service = TransformationsService(db=async_db, trigger=BrokenTrigger())
+
+        result = await service.create_transformation(
+            UploadFile(filename="a.xlsx", file=BytesIO(b"excel")),
+            UploadFile(filename="a.docx", file=BytesIO(b"word")),
+            TransformationInput(carrier="MSC", trade_lane="EU-US", dates=[]),
+        )
+
+        assert len(result["items"]) == 1
+
+    async def test_trigger_given_content_addressed_inputs(self, fake_storage, async_db):
+        """Test the pipeline is told where the uploaded files are stored"""
+        triggered = []
+
+        class RecordingTrigger(PipelineTrigger):
+            async def trigger(self, transformation_id, inputs=None):
+                triggered.append((transformation_id, inputs))
+
+        service = TransformationsService(db=async_db, storage=fake_storage, trigger=RecordingTrigger())
+
+        result = await service.create_transformation(
+            UploadFile(filename="a.xlsx", file=BytesIO(b"excel")),
+            UploadFile(filename="a.docx", file=BytesIO(b"word")),
+            TransformationInput(carrier="MSC", trade_lane="EU-US", dates=[]),
+        )
+
+        transformation_id, inputs = triggered[0]
+        assert transformation_id == result["items"][0]["id"]
+        assert fake_storage.blobs[inputs["rate_card_path"]] == b"excel"
+        assert fake_storage.blobs[inputs["sop_path"]] == b"word"
+        assert len(fake_storage.blobs) == 2
+
+    async def test_airflow_trigger_creates_dag_run(self, monkeypatch):
+        """Test the Airflow trigger posts a DAG run with the transformation id"""
+        requests = []
+
+        class Response:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                return False
+
+        def urlopen(request, timeout):
+            requests.append(request)
+            return Response()
+
+        monkeypatch.setattr(urllib.request, "urlopen", urlopen)
+        trigger = AirflowPipelineTrigger("http://airflow:8080/", "rate_card", auth_token="secret")
+
+        await trigger.trigger("t1", inputs={"rate_card_path": "content/sha256/a", "sop_path": "content/sha256/b"})
+
+        request = requests[0]
+        assert request.full_url == "http://airflow:8080/api/v1/dags/rate_card/dagRuns"
+        assert json.loads(request.data) == {"conf": {
+            "transformation_id": "t1",
+            "rate_card_path": "content/sha256/a",
+            "sop_path": "content/sha256/b",
+        }}
+        assert request.get_header("Authorization") == "Bearer secret"
+
+    def test_default_trigger_does_nothing(self):
+        """Test PIPELINE_TRIGGER defaults to no pipeline"""
+        assert type(get_pipeline_trigger()) is PipelineTrigger
+
+    def test_local_trigger_requires_a_stage(self, monkeypatch):
+        """Test PIPELINE_TRIGGER=local refuses to fake the stages unless asked to"""
+        monkeypatch.setattr(settings, "PIPELINE_TRIGGER", "local")
+        monkeypatch.setattr(settings, "PIPELINE_LOCAL_STAGE", "")
+        monkeypatch.setattr(settings, "PIPELINE_SIMULATE", False)
+        get_pipeline_trigger.cache_clear()
+        try:
+            with pytest.raises(ValueError, match="PIPELINE_SIMULATE"):
+                get_pipeline_trigger()
+
+            monkeypatch.setattr(settings, "PIPELINE_LOCAL_STAGE", "app.services.pipeline_stages:run_stage")
+            get_pipeline_trigger.cache_clear()
+            assert get_pipeline_trigger().runner.stage is run_stage
+
+            monkeypatch.setattr(settings, "PIPELINE_LOCAL_STAGE", "")
+            monkeypatch.setattr(settings, "PIPELINE_SIMULATE", True)
+            get_pipeline_trigger.cache_clear()
+            assert get_pipeline_trigger().runner.stage is run_stage
+        finally:
+            get_pipeline_trigger.cache_clear()
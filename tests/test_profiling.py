@@ -0,0 +1,100 @@
+"""Tests for the request profiling middleware."""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.profiling import (
+    ProfilingMiddleware,
+    RequestProfile,
+    StackSampler,
+    current_profile,
+    phase_of,
+    profile_engine,
+)
+from app.main import app
+from app.services.transformations import TransformationsService
+
+
+def stack(*frames):
+    return tuple((filename, func, 1) for filename, func in frames)
+
+
+class TestPhases:
+    """Test suite for the classification of samples."""
+
+    def test_innermost_match_wins(self):
+        """Test a pydantic frame under to_dict is validation, not serialization"""
+        sample = stack(
+            ("/app/api/routes/transformations.py", "list_transformations"),
+            ("/app/models/transformations.py", "to_dict"),
+            ("/site-packages/pydantic/main.py", "model_validate"),
+        )
+
+        assert phase_of(sample) == "validate"
+
+    def test_phases(self):
+        """Test each phase is recognised from its frames"""
+        assert phase_of(stack(("/site-packages/sqlalchemy/orm/loading.py", "instances"))) == "hydrate"
+        assert phase_of(stack(("/site-packages/sqlalchemy/engine/base.py", "_execute_context"))) == "query"
+        assert phase_of(stack(("/app/api/routes/transformations.py", "json_response"))) == "encode"
+        assert phase_of(stack(("/usr/lib/python3.11/selectors.py", "select"))) == "wait"
+        assert phase_of(stack(("/app/main.py", "root"))) == "app"
+
+
+class TestProfilingMiddleware:
+    """Test suite for ProfilingMiddleware."""
+
+    @pytest.fixture
+    def profiled(self, client, tmp_path):
+        # the client fixture installs the test database overrides on app
+        def wrap(**options):
+            return TestClient(ProfilingMiddleware(app, interval=0.0005, **options))
+        return wrap
+
+    def test_header_selects_request(self, profiled):
+        """Test only requests with the header get a Server-Timing header"""
+        test_client = profiled(header="X-Profile")
+
+        assert "server-timing" not in test_client.get("/transformations").headers
+
+        timing = test_client.get("/transformations", headers={"X-Profile": "1"}).headers["server-timing"]
+        names = [entry.split(";")[0] for entry in timing.split(", ")]
+        assert names[:2] == ["total", "sql"]
+        assert names[-1] == "profile"
+
+    def test_sample_rate_selects_request(self, profiled):
+        """Test a sampling rate of 1 profiles every request"""
+        test_client = profiled(sample_rate=1.0)
+
+        assert "server-timing" in test_client.get("/transformations").headers
+
+    def test_writes_collapsed_stacks(self, profiled, tmp_path):
+        """Test the profile file has one 'frames count' line per distinct stack"""
+        test_client = profiled(output_dir=str(tmp_path / "profiles"))
+
+        test_client.get("/transformations?limit=5", headers={"X-Profile": "1"})
+
+        files = list((tmp_path / "profiles").iterdir())
+        assert len(files) == 1
+        assert files[0].name.endswith("_GET_transformations.folded")
+        for line in files[0].read_text().splitlines():
+            frames, count = line.rsplit(" ", 1)
+            assert int(count) > 0
+            assert "(" in frames.split(";")[0]
+
+    async def test_sql_time_added_to_profile(self, db_path):
+        """Test statements run while a request is profiled are timed"""
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+        profile_engine(engine.sync_engine)
+        profile = RequestProfile(StackSampler(0, 1.0))
+        token = current_profile.set(profile)
+        try:
+            async with async_sessionmaker(bind=engine)() as db:
+                await TransformationsService(db=db).list_transformations(limit=5)
+        finally:
+            current_profile.reset(token)
+            await engine.dispose()
+
+        assert profile.sql_statements == 1
+        assert profile.sql_seconds > 0
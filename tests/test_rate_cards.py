@@ -0,0 +1,165 @@
+"""Tests for rate card inspection and sheet reference checks."""
+import hashlib
+from io import BytesIO
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from app.schemas.transformations import TransformationInput
+from app.services import rate_cards, transformations
+from app.services.gcs_bucket_config import build_content_path
+from app.services.rate_cards import check_sheet_references, inspect_rate_card, inspection_cache
+from app.services.transformations import TransformationsService
+
+SHEETS = {
+    "Rates": [["POL", "POD", "20DC", None], ["FRLEH", "USNYC", 1200], [None, None], ["FRFOS", "USHOU", 1300]],
+    "Notes": [[None], ["Remarks"], ["see SOP"]],
+}
+
+
+@pytest.fixture(autouse=True)
+def clear_inspection_cache():
+    inspection_cache.clear()
+    yield
+    inspection_cache.clear()
+
+
+def data_with(**kwargs):
+    return TransformationInput(**{"carrier": "MSC", "trade_lane": "EU-US", "dates": [], **kwargs})
+
+
+class TestInspectRateCard:
+    """Test suite for inspect_rate_card."""
+
+    async def test_sheets_headers_and_counts(self, make_workbook):
+        """Test sheet names, header rows and data row counts"""
+        result = await inspect_rate_card(UploadFile(filename="rc.xlsx", file=BytesIO(make_workbook(SHEETS))))
+
+        assert result["sheets"] == [
+            {"name": "Rates", "header": ["POL", "POD", "20DC"], "row_count": 2},
+            {"name": "Notes", "header": ["Remarks"], "row_count": 1},
+        ]
+        assert len(result["sha256"]) == 64
+
+    async def test_parsed_once_per_content(self, make_workbook, monkeypatch):
+        """Test identical content is served from the cache"""
+        content = make_workbook(SHEETS)
+        calls = []
+        parse = rate_cards.parse_workbook
+        monkeypatch.setattr(rate_cards, "parse_workbook", lambda f: calls.append(1) or parse(f))
+
+        first = await inspect_rate_card(UploadFile(filename="a.xlsx", file=BytesIO(content)))
+        second = await inspect_rate_card(UploadFile(filename="b.xlsx", file=BytesIO(content)))
+
+        assert first == second
+        assert len(calls) == 1
+
+    async def test_unreadable_file(self):
+        """Test a file that is not a workbook"""
+        with pytest.raises(HTTPException) as exc_info:
+            await inspect_rate_card(UploadFile(filename="rc.xlsx", file=BytesIO(b"not a zip")))
+
+        assert exc_info.value.status_code == 400
+
+    def test_endpoint(self, client, make_workbook):
+        """Test POST /rate-cards/inspect"""
+        response = client.post(
+            "/rate-cards/inspect",
+            files={"excel_file": ("rc.xlsx", BytesIO(make_workbook(SHEETS)), "application/octet-stream")},
+        )
+
+        assert response.status_code == 200
+        assert [sheet["name"] for sheet in response.json()["sheets"]] == ["Rates", "Notes"]
+
+    def test_endpoint_rejects_xls(self, client):
+        """Test legacy .xls files are refused"""
+        response = client.post(
+            "/rate-cards/inspect",
+            files={"excel_file": ("rc.xls", BytesIO(b"legacy"), "application/vnd.ms-excel")},
+        )
+
+        assert response.status_code == 400
+
+
+class TestSheetReferences:
+    """Test suite for check_sheet_references."""
+
+    async def test_no_reference_does_not_parse(self):
+        """Test inputs without sheet references never open the workbook"""
+        await check_sheet_references(UploadFile(filename="rc.xlsx", file=BytesIO(b"not a zip")), data_with())
+
+        assert len(inspection_cache) == 0
+
+    async def test_unknown_sheet_and_column(self, make_workbook):
+        """Test missing sheets and columns are all reported"""
+        data = data_with(
+            sheets_and_filters={
+                "sheets_to_exclude": ["Note"],
+                "filters": [
+                    {"name": "f1", "column": "POL", "sheet_name": "Rates"},
+                    {"name": "f2", "column": "Currency", "sheet_name": "Rates"},
+                    {"name": "f3", "column": "Remarks"},
+                ],
+            },
+        )
+
+        with pytest.raises(HTTPException) as exc_info:
+            await check_sheet_references(UploadFile(filename="rc.xlsx", file=BytesIO(make_workbook(SHEETS))), data)
+
+        assert exc_info.value.status_code == 400
+        assert "Sheet 'Note' not found" in exc_info.value.detail
+        assert "Column 'Currency' not found in sheet 'Rates'" in exc_info.value.detail
+        assert "Remarks" not in exc_info.value.detail
+
+    async def test_create_uses_inspection_cache(self, async_db, make_workbook, monkeypatch):
+        """Test an inspected rate card is not parsed again on creation"""
+        content = make_workbook(SHEETS)
+        await inspect_rate_card(UploadFile(filename="rc.xlsx", file=BytesIO(content)))
+        monkeypatch.setattr(rate_cards, "parse_workbook", lambda f: pytest.fail("parsed twice"))
+        service = TransformationsService(db=async_db)
+
+        result = await service.create_transformation(
+            UploadFile(filename="rc.xlsx", file=BytesIO(content)),
+            UploadFile(filename="sop.docx", file=BytesIO(b"word")),
+            data_with(dates=[{"application_date": "2024-01-01", "validity_date": "2024-12-31", "sheets": ["Rates"]}]),
+        )
+
+        assert len(result["items"]) == 1
+
+    async def test_create_rejects_unknown_sheet(self, async_db, make_workbook, fake_storage):
+        """Test creation fails before any upload when a sheet is missing"""
+        service = TransformationsService(db=async_db, storage=fake_storage)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await service.create_transformation(
+                UploadFile(filename="rc.xlsx", file=BytesIO(make_workbook(SHEETS))),
+                UploadFile(filename="sop.docx", file=BytesIO(b"word")),
+                data_with(surcharges_included=[{"surcharge_code": "BAF", "sheet_name": "Surcharges"}]),
+            )
+
+        assert exc_info.value.status_code == 400
+        assert fake_storage.blobs == {}
+
+    async def test_create_hashes_workbook_once(self, async_db, make_workbook, fake_storage, monkeypatch):
+        """Test the hash computed by the sheet check is reused for the upload"""
+        hash_file = rate_cards.hash_file
+        hashed = []
+
+        def counting_hash(file):
+            hashed.append(file)
+            return hash_file(file)
+
+        monkeypatch.setattr(rate_cards, "hash_file", counting_hash)
+        monkeypatch.setattr(transformations, "hash_file", counting_hash)
+        content = make_workbook(SHEETS)
+        excel_file = UploadFile(filename="rc.xlsx", file=BytesIO(content))
+        service = TransformationsService(db=async_db, storage=fake_storage)
+
+        await service.create_transformation(
+            excel_file,
+            UploadFile(filename="sop.docx", file=BytesIO(b"word")),
+            data_with(dates=[{"application_date": "2024-01-01", "validity_date": "2024-12-31", "sheets": ["Rates"]}]),
+        )
+
+        assert [f for f in hashed if f is excel_file.file] == [excel_file.file]
+        assert build_content_path(hashlib.sha256(content).hexdigest()) in fake_storage.blobs
@@ -1,12 +1,21 @@
 """Tests for TransformationsService."""
-from datetime import date
+from datetime import date, datetime, timedelta
+import hashlib
 from io import BytesIO
+import threading
+import time
 import pytest
 from fastapi import HTTPException, UploadFile
+from sqlalchemy import event
 
-from app.services.transformations import TransformationsService
-from app.schemas.transformations import TransformationInput, DatesItem
-from app.models.transformations import Transformation
+from app.services.transformations import TransformationsService, lookup_cache
+from app.schemas.transformations import TransformationInput, DatesItem, StatusEnum, StageEnum, JobStateEnum
+from app.models.transformations import Transformation, TradeLane
+from app.services.status_notifier import status_notifier
+
+
+def content_path(content):
+    return f"rate-card-transformation/content/sha256/{hashlib.sha256(content).hexdigest()}"
 
 
 class TestTransformationsService:
@@ -17,9 +26,9 @@ class TestTransformationsService:
         with pytest.raises(ValueError, match="Database session cannot be None"):
             TransformationsService(db=None)
 
-    def test_create_transformation_success(self, test_db):
+    async def test_create_transformation_success(self, async_db):
         """Test successful transformation creation."""
-        service = TransformationsService(db=test_db)
+        service = TransformationsService(db=async_db)
 
         # Create mock file uploads
         excel_file = UploadFile(
@@ -43,7 +52,7 @@ class TestTransformationsService:
             ]
         )
 
-        result = service.create_transformation(excel_file, word_file, data)
+        result = await service.create_transformation(excel_file, word_file, data)
 
         assert "items" in result
         assert len(result["items"]) == 1
@@ -52,11 +61,130 @@ class TestTransformationsService:
         assert result["items"][0]["status"] == "IN_PROGRESS"
         assert result["next_cursor"] is None
 
-    def test_list_transformations_empty(self, test_db):
+    async def test_create_transformation_uploads_files(self, fake_storage, async_db):
+        """Test both files are stored under their content hash off the event loop."""
+        service = TransformationsService(db=async_db, storage=fake_storage)
+
+        excel_file = UploadFile(filename="test.xlsx", file=BytesIO(b"excel content"))
+        word_file = UploadFile(filename="test.docx", file=BytesIO(b"word content"))
+        data = TransformationInput(
+            carrier="MSC",
+            trade_lane="EU-US",
+            dates=[DatesItem(application_date=date(2024, 1, 1), validity_date=date(2024, 12, 31))]
+        )
+
+        result = await service.create_transformation(excel_file, word_file, data)
+
+        assert fake_storage.blobs == {
+            content_path(b"excel content"): b"excel content",
+            content_path(b"word content"): b"word content",
+        }
+        assert threading.get_ident() not in fake_storage.upload_threads
+        transformation = await async_db.get(Transformation, result["items"][0]["id"])
+        assert transformation.xlsx_sha256 == hashlib.sha256(b"excel content").hexdigest()
+        assert transformation.docx_sha256 == hashlib.sha256(b"word content").hexdigest()
+
+    async def test_create_transformation_same_files_uploaded_once(self, fake_storage, async_db):
+        """Test files the bucket already holds are not uploaded again."""
+        service = TransformationsService(db=async_db, storage=fake_storage)
+        data = TransformationInput(carrier="MSC", trade_lane="EU-US", dates=[])
+
+        for _ in range(3):
+            await service.create_transformation(
+                UploadFile(filename="test.xlsx", file=BytesIO(b"excel content")),
+                UploadFile(filename="test.docx", file=BytesIO(b"word content")),
+                data,
+            )
+
+        assert len(fake_storage.upload_threads) == 2
+        assert len(fake_storage.blobs) == 2
+
+    async def test_create_transformation_upload_failure(self, test_db, fake_storage, async_db):
+        """Test a failed upload creates no row."""
+        service = TransformationsService(db=async_db, storage=fake_storage)
+        fake_storage.fail_on = {hashlib.sha256(b"word").hexdigest()}
+        data = TransformationInput(
+            carrier="MSC",
+            trade_lane="EU-US",
+            dates=[DatesItem(application_date=date(2024, 1, 1), validity_date=date(2024, 12, 31))]
+        )
+
+        with pytest.raises(HTTPException) as exc_info:
+            await service.create_transformation(
+                UploadFile(filename="test.xlsx", file=BytesIO(b"excel")),
+                UploadFile(filename="test.docx", file=BytesIO(b"word")),
+                data,
+            )
+
+        assert exc_info.value.status_code == 502
+        assert content_path(b"word") not in fake_storage.blobs
+        assert test_db.query(Transformation).count() == 0
+
+    async def test_create_transformations_batch(self, test_db, fake_storage, async_db):
+        """Test a batch is inserted in one go and failed uploads are reported per item."""
+        service = TransformationsService(db=async_db, storage=fake_storage)
+        fake_storage.fail_on = {hashlib.sha256(b"CMA excel").hexdigest()}
+        items = [
+            (
+                UploadFile(filename=f"{carrier}.xlsx", file=BytesIO(f"{carrier} excel".encode())),
+                UploadFile(filename=f"{carrier}.docx", file=BytesIO(b"word")),
+                TransformationInput(carrier=carrier, trade_lane="EU-US", dates=[]),
+            )
+            for carrier in ("MSC", "CMA", "MSC")
+        ]
+
+        result = await service.create_transformations_batch(items, concurrency=2)
+
+        statuses = [(item["index"], item["status"]) for item in result["items"]]
+        assert statuses == [(0, "created"), (1, "failed"), (2, "created")]
+        assert "upload" in result["items"][1]["error"]
+        assert result["items"][1]["transformation"] is None
+        assert result["items"][0]["id"] != result["items"][2]["id"]
+        assert result["items"][2]["transformation"]["file_names"]["xlsx_name"] == "MSC.xlsx"
+        assert test_db.query(Transformation).count() == 2
+        # both MSC items share their files
+        assert len(fake_storage.blobs) == 2
+        assert await service.get_carriers() == ["MSC"]
+
+    async def test_create_transformations_batch_bounded_uploads(self, fake_storage, async_db):
+        """Test no more than `concurrency` items upload at the same time."""
+        active, peak = [0], [0]
+        lock = threading.Lock()
+        upload_stream = fake_storage.upload_stream
+
+        def slow_upload(*args, **kwargs):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            try:
+                time.sleep(0.02)
+                return upload_stream(*args, **kwargs)
+            finally:
+                with lock:
+                    active[0] -= 1
+
+        fake_storage.upload_stream = slow_upload
+        service = TransformationsService(db=async_db, storage=fake_storage)
+        items = [
+            (
+                UploadFile(filename="a.xlsx", file=BytesIO(f"excel {i}".encode())),
+                UploadFile(filename="a.docx", file=BytesIO(f"word {i}".encode())),
+                TransformationInput(carrier="MSC", trade_lane="EU-US", dates=[]),
+            )
+            for i in range(6)
+        ]
+
+        result = await service.create_transformations_batch(items, concurrency=2)
+
+        assert all(item["status"] == "created" for item in result["items"])
+        # two files per item
+        assert 1 < peak[0] <= 4
+
+    async def test_list_transformations_empty(self, async_db):
         """Test listing with no transformations."""
-        service = TransformationsService(db=test_db)
+        service = TransformationsService(db=async_db)
 
-        result = service.list_transformations(
+        result = await service.list_transformations(
             cursor=None,
             limit=10,
             date_start=None,
@@ -69,7 +197,7 @@ class TestTransformationsService:
         assert result["items"] == []
         assert result["next_cursor"] is None
 
-    def test_list_transformations_with_data(self, test_db):
+    async def test_list_transformations_with_data(self, test_db, async_db):
         """Test listing with existing transformations."""
         # Create test data
         t1 = Transformation(
@@ -92,8 +220,8 @@ class TestTransformationsService:
         test_db.add_all([t1, t2])
         test_db.commit()
 
-        service = TransformationsService(db=test_db)
-        result = service.list_transformations(
+        service = TransformationsService(db=async_db)
+        result = await service.list_transformations(
             cursor=None,
             limit=10,
             date_start=None,
@@ -105,7 +233,56 @@ class TestTransformationsService:
 
         assert len(result["items"]) == 2
 
-    def test_list_transformations_with_carrier_filter(self, test_db):
+    async def test_list_transformations_reads_list_columns_only(self, test_db, async_db):
+        """Test items keep the to_dict shape without loading ORM objects"""
+        t1 = Transformation(
+            id="id-1",
+            status="IN_PROGRESS",
+            carrier="MSC",
+            trade_lane="EU-US",
+            xlsx_name="test1.xlsx",
+            docx_name="test1.docx"
+        )
+        t1.set_transformation_data({"large": "x" * 1000})
+        test_db.add(t1)
+        test_db.commit()
+
+        service = TransformationsService(db=async_db)
+        result = await service.list_transformations(limit=10)
+
+        assert result["items"] == [t1.to_dict()]
+        assert len(async_db.identity_map) == 0
+
+    async def test_export_transformations_in_batches(self, test_db, async_db):
+        """Test the export walks every matching row in batch_size batches"""
+        start = datetime(2024, 1, 1)
+        for i in range(5):
+            t = Transformation(
+                id=f"id-{i}",
+                created_at=start + timedelta(minutes=i),
+                status="IN_PROGRESS",
+                carrier="MSC" if i != 2 else "CMA",
+                trade_lane="EU-US",
+                xlsx_name="test.xlsx",
+                docx_name="test.docx"
+            )
+            t.set_transformation_data({"carrier": t.carrier})
+            test_db.add(t)
+        test_db.commit()
+
+        service = TransformationsService(db=async_db)
+        batches = [
+            items async for items in service.export_transformations(
+                carrier=["MSC"], include_data=True, batch_size=3
+            )
+        ]
+
+        assert [len(items) for items in batches] == [3, 1]
+        assert [item["id"] for items in batches for item in items] == ["id-4", "id-3", "id-1", "id-0"]
+        assert batches[0][0]["transformation_data"] == {"carrier": "MSC"}
+        assert len(async_db.identity_map) == 0
+
+    async def test_list_transformations_with_carrier_filter(self, test_db, async_db):
         """Test filtering by carrier."""
         t1 = Transformation(
             id="id-1",
@@ -127,8 +304,8 @@ class TestTransformationsService:
         test_db.add_all([t1, t2])
         test_db.commit()
 
-        service = TransformationsService(db=test_db)
-        result = service.list_transformations(
+        service = TransformationsService(db=async_db)
+        result = await service.list_transformations(
             cursor=None,
             limit=10,
             date_start=None,
@@ -141,7 +318,7 @@ class TestTransformationsService:
         assert len(result["items"]) == 1
         assert result["items"][0]["carrier"] == "MSC"
 
-    def test_list_transformations_pagination(self, test_db):
+    async def test_list_transformations_pagination(self, test_db, async_db):
         """Test pagination with cursor."""
         # Create multiple transformations
         for i in range(5):
@@ -156,10 +333,10 @@ class TestTransformationsService:
             test_db.add(t)
         test_db.commit()
 
-        service = TransformationsService(db=test_db)
+        service = TransformationsService(db=async_db)
 
         # First page
-        result = service.list_transformations(
+        result = await service.list_transformations(
             cursor=None,
             limit=2,
             date_start=None,
@@ -173,7 +350,7 @@ class TestTransformationsService:
         assert result["next_cursor"] is not None
 
         # Second page using cursor
-        result2 = service.list_transformations(
+        result2 = await service.list_transformations(
             cursor=result["next_cursor"],
             limit=2,
             date_start=None,
@@ -185,7 +362,43 @@ class TestTransformationsService:
 
         assert len(result2["items"]) == 2
 
-    def test_get_status_details_success(self, test_db):
+    async def test_list_transformations_pagination_with_shared_timestamps(self, test_db, async_db):
+        """Test rows sharing created_at are neither skipped nor repeated across pages."""
+        created_at = datetime(2024, 1, 1, 12, 0, 0)
+        for i in range(7):
+            test_db.add(Transformation(
+                id=f"id-{i}",
+                created_at=created_at,
+                status="IN_PROGRESS",
+                carrier="MSC",
+                trade_lane="EU-US",
+                xlsx_name=f"test{i}.xlsx",
+                docx_name=f"test{i}.docx"
+            ))
+        test_db.commit()
+
+        service = TransformationsService(db=async_db)
+        seen = []
+        cursor = None
+        while True:
+            result = await service.list_transformations(cursor=cursor, limit=3)
+            seen.extend(item["id"] for item in result["items"])
+            cursor = result["next_cursor"]
+            if cursor is None:
+                break
+
+        assert seen == [f"id-{i}" for i in reversed(range(7))]
+
+    async def test_list_transformations_invalid_cursor(self, async_db):
+        """Test an invalid cursor is rejected instead of restarting the scan."""
+        service = TransformationsService(db=async_db)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await service.list_transformations(cursor="not-a-cursor", limit=3)
+
+        assert exc_info.value.status_code == 400
+
+    async def test_get_status_details_success(self, test_db, async_db):
         """Test getting status details for existing transformation."""
         t = Transformation(
             id="test-id",
@@ -205,18 +418,398 @@ class TestTransformationsService:
         test_db.add(t)
         test_db.commit()
 
-        service = TransformationsService(db=test_db)
-        result = service.get_status_details("test-id")
+        service = TransformationsService(db=async_db)
+        result = await service.get_status_details("test-id")
 
         assert result["UPLOAD_COMPLETE"] is True
         assert result["PROCESSING"] is False
 
-    def test_get_status_details_not_found(self, test_db):
+    async def test_get_status_details_not_found(self, async_db):
         """Test getting status for non-existent transformation."""
-        service = TransformationsService(db=test_db)
+        service = TransformationsService(db=async_db)
 
         with pytest.raises(HTTPException) as exc_info:
-            service.get_status_details("non-existent-id")
+            await service.get_status_details("non-existent-id")
 
         assert exc_info.value.status_code == 404
         assert "not found" in exc_info.value.detail.lower()
+
+    async def test_get_status_snapshots_single_query(self, test_db, async_db):
+        """Test many status snapshots are read with one statement."""
+        for i, progress in enumerate((10, 60)):
+            t = Transformation(
+                id=f"t{i}", status="IN_PROGRESS", carrier="MSC", trade_lane="EU-US",
+                xlsx_name="a.xlsx", docx_name="a.docx", progress=progress,
+            )
+            t.set_status_details({"UPLOAD_COMPLETE": True, "PROCESSING": i == 1, "REVIEW": False, "READY_TO_PUBLISH": False})
+            test_db.add(t)
+        test_db.commit()
+
+        statements = []
+        engine = async_db.bind.sync_engine
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            service = TransformationsService(db=async_db)
+            result = await service.get_status_snapshots(["t1", "missing", "t0"])
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+
+        assert len(statements) == 1
+        assert [(r["id"], r["found"]) for r in result] == [("t1", True), ("missing", False), ("t0", True)]
+        assert result[0]["status_details"]["PROCESSING"] is True
+        assert result[0]["progress"] == 60
+        assert result[2]["progress"] == 10
+
+    async def _create_with_storage(self, service):
+        return (await service.create_transformation(
+            UploadFile(filename="test.xlsx", file=BytesIO(b"excel")),
+            UploadFile(filename="test.docx", file=BytesIO(b"word")),
+            TransformationInput(carrier="MSC", trade_lane="EU-US", dates=[]),
+        ))["items"][0]["id"]
+
+    async def test_publish_modified_streams_once(self, fake_storage, async_db):
+        """Test the modified workbook is uploaded once even if the call is retried."""
+        service = TransformationsService(db=async_db, storage=fake_storage)
+        transformation_id = await self._create_with_storage(service)
+        uploads_before = len(fake_storage.upload_threads)
+
+        first = await service.publish_transformation(
+            transformation_id, modified=True,
+            excel_file=UploadFile(filename="final.xlsx", file=BytesIO(b"modified")),
+        )
+        retry = await service.publish_transformation(
+            transformation_id, modified=True,
+            excel_file=UploadFile(filename="final.xlsx", file=BytesIO(b"modified")),
+        )
+
+        path = f"rate-card-transformation/transformation-{transformation_id}/job-publish/output/modified/rate_card.xlsx"
+        assert first["published_path"] == path
+        assert fake_storage.blobs[path] == b"modified"
+        assert len(fake_storage.upload_threads) == uploads_before + 1
+        assert first["already_published"] is False
+        assert retry["already_published"] is True
+        assert first["status_details"]["READY_TO_PUBLISH"] is True
+        rows = await service.list_transformations(stage=[StageEnum.READY_TO_PUBLISH])
+        assert [item["id"] for item in rows["items"]] == [transformation_id]
+
+    async def test_publish_unmodified_copies_in_bucket(self, fake_storage, async_db):
+        """Test publishing without modification is a server-side copy."""
+        service = TransformationsService(db=async_db, storage=fake_storage)
+        transformation_id = await self._create_with_storage(service)
+        uploads_before = len(fake_storage.upload_threads)
+
+        result = await service.publish_transformation(transformation_id, modified=False)
+
+        root = f"rate-card-transformation/transformation-{transformation_id}"
+        assert fake_storage.copies == [
+            (content_path(b"excel"), f"{root}/job-publish/output/automated/rate_card.xlsx")
+        ]
+        assert len(fake_storage.upload_threads) == uploads_before
+        assert result["published_path"] == f"{root}/job-publish/output/automated/rate_card.xlsx"
+
+    async def test_publish_retry_reports_stored_variant(self, fake_storage, async_db):
+        """Test a retry with the other variant returns the object actually published."""
+        service = TransformationsService(db=async_db, storage=fake_storage)
+        transformation_id = await self._create_with_storage(service)
+
+        await service.publish_transformation(
+            transformation_id, modified=True,
+            excel_file=UploadFile(filename="final.xlsx", file=BytesIO(b"modified")),
+        )
+        retry = await service.publish_transformation(transformation_id, modified=False)
+
+        root = f"rate-card-transformation/transformation-{transformation_id}"
+        assert retry["already_published"] is True
+        assert retry["published_path"] == f"{root}/job-publish/output/modified/rate_card.xlsx"
+        assert f"{root}/job-publish/output/automated/rate_card.xlsx" not in fake_storage.blobs
+
+    async def test_publish_skips_upload_when_object_exists(self, fake_storage, async_db):
+        """Test a retry after a failed flag update does not upload the same bytes again."""
+        service = TransformationsService(db=async_db, storage=fake_storage)
+        transformation_id = await self._create_with_storage(service)
+        path = f"rate-card-transformation/transformation-{transformation_id}/job-publish/output/modified/rate_card.xlsx"
+        fake_storage.put(path, b"modified")
+        uploads_before = len(fake_storage.upload_threads)
+
+        result = await service.publish_transformation(
+            transformation_id, modified=True,
+            excel_file=UploadFile(filename="final.xlsx", file=BytesIO(b"modified")),
+        )
+
+        assert len(fake_storage.upload_threads) == uploads_before
+        assert fake_storage.generations[path] == 1
+        assert result["already_published"] is False
+
+    async def test_publish_replaces_stale_object(self, fake_storage, async_db):
+        """Test a retry with a corrected workbook replaces what a failed attempt stored."""
+        service = TransformationsService(db=async_db, storage=fake_storage)
+        transformation_id = await self._create_with_storage(service)
+        root = f"rate-card-transformation/transformation-{transformation_id}/job-publish/output"
+        fake_storage.put(f"{root}/modified/rate_card.xlsx", b"from a previous attempt")
+
+        await service.publish_transformation(
+            transformation_id, modified=True,
+            excel_file=UploadFile(filename="final.xlsx", file=BytesIO(b"corrected")),
+        )
+
+        assert fake_storage.blobs[f"{root}/modified/rate_card.xlsx"] == b"corrected"
+
+        other_id = await self._create_with_storage(service)
+        other_root = f"rate-card-transformation/transformation-{other_id}/job-publish/output"
+        fake_storage.put(f"{other_root}/automated/rate_card.xlsx", b"from a previous attempt")
+
+        await service.publish_transformation(other_id, modified=False)
+
+        assert fake_storage.blobs[f"{other_root}/automated/rate_card.xlsx"] == b"excel"
+
+    async def test_publish_not_found(self, async_db):
+        """Test publishing an unknown transformation."""
+        service = TransformationsService(db=async_db)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await service.publish_transformation("non-existent-id", modified=False)
+
+        assert exc_info.value.status_code == 404
+
+    async def test_update_status_publishes_snapshot(self, test_db, async_db):
+        """Test status updates are stored and pushed to stream watchers."""
+        t = Transformation(
+            id="test-id",
+            status="IN_PROGRESS",
+            carrier="MSC",
+            trade_lane="EU-US",
+            xlsx_name="test.xlsx",
+            docx_name="test.docx"
+        )
+        test_db.add(t)
+        test_db.commit()
+
+        service = TransformationsService(db=async_db)
+        watcher = status_notifier.subscribe("test-id", lambda: service.get_status_snapshot("test-id"))
+        first = await watcher.__anext__()
+
+        await service.update_status("test-id", status_details={"PROCESSING": True}, progress=40)
+        update = await watcher.__anext__()
+        await watcher.aclose()
+
+        assert first["status_details"]["PROCESSING"] is False
+        assert update["status_details"]["PROCESSING"] is True
+        assert update["progress"] == 40
+        assert (await service.get_status_details("test-id"))["PROCESSING"] is True
+
+    async def test_get_trade_lanes_and_carriers_maintained_on_create(self, async_db):
+        """Test the dictionaries gain new values inside create_transformation."""
+        service = TransformationsService(db=async_db)
+
+        assert await service.get_trade_lanes() == []
+
+        for carrier, trade_lane in [("MSC", "EU-US"), ("CMA", "US-ASIA"), ("MSC", "EU-US")]:
+            await service.create_transformation(
+                UploadFile(filename="test.xlsx", file=BytesIO(b"excel")),
+                UploadFile(filename="test.docx", file=BytesIO(b"word")),
+                TransformationInput(
+                    carrier=carrier,
+                    trade_lane=trade_lane,
+                    dates=[DatesItem(application_date=date(2024, 1, 1), validity_date=date(2024, 12, 31))]
+                ),
+            )
+
+        assert await service.get_trade_lanes() == ["EU-US", "US-ASIA"]
+        assert await service.get_carriers() == ["CMA", "MSC"]
+
+    async def test_get_trade_lanes_served_from_cache(self, test_db, async_db):
+        """Test repeated calls do not hit the database."""
+        service = TransformationsService(db=async_db)
+        test_db.add(TradeLane(name="EU-US"))
+        test_db.commit()
+
+        assert await service.get_trade_lanes() == ["EU-US"]
+
+        test_db.add(TradeLane(name="US-ASIA"))
+        test_db.commit()
+
+        assert await service.get_trade_lanes() == ["EU-US"]
+
+        lookup_cache.invalidate("trade_lanes")
+        assert await service.get_trade_lanes() == ["EU-US", "US-ASIA"]
+
+    async def test_get_facets(self, test_db, async_db):
+        """Test facet counts apply every filter except their own."""
+        rows = [
+            ("MSC", "EU-US", "IN_PROGRESS"),
+            ("MSC", "EU-US", "SENT_TO_DMP"),
+            ("MSC", "US-ASIA", "IN_PROGRESS"),
+            ("CMA", "EU-US", "IN_PROGRESS"),
+        ]
+        for i, (carrier, trade_lane, status) in enumerate(rows):
+            test_db.add(Transformation(
+                id=f"id-{i}",
+                status=status,
+                carrier=carrier,
+                trade_lane=trade_lane,
+                xlsx_name="test.xlsx",
+                docx_name="test.docx"
+            ))
+        test_db.commit()
+
+        service = TransformationsService(db=async_db)
+
+        facets = await service.get_facets()
+        assert facets == {
+            "carrier": {"MSC": 3, "CMA": 1},
+            "trade_lane": {"EU-US": 3, "US-ASIA": 1},
+            "status": {"IN_PROGRESS": 3, "SENT_TO_DMP": 1},
+            "stage": {},
+        }
+
+        facets = await service.get_facets(carrier=["MSC"], status=[StatusEnum.IN_PROGRESS])
+        assert facets == {
+            "carrier": {"MSC": 2, "CMA": 1},
+            "trade_lane": {"EU-US": 1, "US-ASIA": 1},
+            "status": {"IN_PROGRESS": 2, "SENT_TO_DMP": 1},
+            "stage": {},
+        }
+
+    async def test_get_facets_and_search_with_stage_filter(self, test_db, async_db):
+        """Test the stage filter applies to the other facets and to search."""
+        rows = [
+            ("MSC", {"UPLOAD_COMPLETE": True}),
+            ("MSC", {"UPLOAD_COMPLETE": True, "PROCESSING": True, "REVIEW": True}),
+            ("CMA", {"UPLOAD_COMPLETE": True, "PROCESSING": True, "REVIEW": True}),
+        ]
+        for i, (carrier, details) in enumerate(rows):
+            t = Transformation(
+                id=f"id-{i}",
+                status="IN_PROGRESS",
+                carrier=carrier,
+                trade_lane="EU-US",
+                xlsx_name="test.xlsx",
+                docx_name="test.docx"
+            )
+            t.set_status_details(details)
+            test_db.add(t)
+        test_db.commit()
+
+        service = TransformationsService(db=async_db)
+
+        facets = await service.get_facets(carrier=["MSC"], stage=[StageEnum.REVIEW])
+        assert facets == {
+            "carrier": {"MSC": 1, "CMA": 1},
+            "trade_lane": {"EU-US": 1},
+            "status": {"IN_PROGRESS": 1},
+            "stage": {"UPLOAD_COMPLETE": 1, "REVIEW": 1},
+        }
+
+        result = await service.search_transformations(stage=[StageEnum.REVIEW])
+        assert sorted(item["id"] for item in result["items"]) == ["id-1", "id-2"]
+
+    async def test_list_transformations_with_stage_filter(self, test_db, async_db):
+        """Test filtering on the furthest pipeline stage reached."""
+        stages = [
+            {"UPLOAD_COMPLETE": True},
+            {"UPLOAD_COMPLETE": True, "PROCESSING": True},
+            {"UPLOAD_COMPLETE": True, "PROCESSING": True, "REVIEW": True},
+        ]
+        for i, details in enumerate(stages):
+            t = Transformation(
+                id=f"id-{i}",
+                status="IN_PROGRESS",
+                carrier="MSC",
+                trade_lane="EU-US",
+                xlsx_name="test.xlsx",
+                docx_name="test.docx"
+            )
+            t.set_status_details(details)
+            test_db.add(t)
+        test_db.commit()
+
+        service = TransformationsService(db=async_db)
+        result = await service.list_transformations(stage=[StageEnum.PROCESSING])
+
+        assert [item["id"] for item in result["items"]] == ["id-1"]
+
+    async def test_set_and_get_job_states(self, test_db, async_db):
+        """Test sub-job states are upserted per job."""
+        test_db.add(Transformation(
+            id="test-id",
+            status="IN_PROGRESS",
+            carrier="MSC",
+            trade_lane="EU-US",
+            xlsx_name="test.xlsx",
+            docx_name="test.docx"
+        ))
+        test_db.commit()
+
+        service = TransformationsService(db=async_db)
+        await service.set_job_state("test-id", 1, JobStateEnum.RUNNING)
+        await service.set_job_state("test-id", 2, JobStateEnum.PENDING)
+        await service.set_job_state("test-id", 1, JobStateEnum.SUCCEEDED)
+
+        assert await service.get_job_states("test-id") == {1: "SUCCEEDED", 2: "PENDING"}
+
+    async def test_search_transformations_by_data(self, async_db, make_workbook):
+        """Test searching surcharges, excluded sheets and validity dates."""
+        service = TransformationsService(db=async_db)
+        inputs = [
+            {
+                "carrier": "MSC",
+                "trade_lane": "EU-US",
+                "dates": [{"application_date": "2024-01-01", "validity_date": "2024-06-30"}],
+                "sheets_and_filters": {"sheets_to_exclude": ["Notes"], "filters": []},
+                "surcharges_to_be_added": [
+                    {"surcharge_code": "BAF", "price": 10, "currency": "USD", "basis": "CONTAINER"}
+                ],
+            },
+            {
+                "carrier": "CMA",
+                "trade_lane": "EU-US",
+                "dates": [{"application_date": "2024-07-01", "validity_date": "2024-12-31"}],
+                "surcharges_to_exclude": ["BAF", "THC"],
+            },
+        ]
+        workbook = make_workbook({"Rates": [["POL", "POD"]], "Notes": [["Text"]]})
+        ids = []
+        for data in inputs:
+            result = await service.create_transformation(
+                UploadFile(filename="test.xlsx", file=BytesIO(workbook)),
+                UploadFile(filename="test.docx", file=BytesIO(b"word")),
+                TransformationInput(**data),
+            )
+            ids.append(result["items"][0]["id"])
+
+        async def search(**kwargs):
+            result = await service.search_transformations(**kwargs)
+            return [item["id"] for item in result["items"]]
+
+        assert await search(surcharge_added=["BAF"]) == [ids[0]]
+        assert await search(surcharge_excluded=["THC"]) == [ids[1]]
+        assert await search(sheet_excluded=["Notes"]) == [ids[0]]
+        assert await search(valid_on=date(2024, 8, 15)) == [ids[1]]
+        assert await search(surcharge_excluded=["BAF"], carrier=["MSC"]) == []
+
+    async def test_rebuild_data_index(self, test_db, async_db):
+        """Test rows written without side tables become searchable."""
+        t = Transformation(
+            id="test-id",
+            status="IN_PROGRESS",
+            carrier="MSC",
+            trade_lane="EU-US",
+            xlsx_name="test.xlsx",
+            docx_name="test.docx"
+        )
+        t.set_transformation_data({
+            "carrier": "MSC",
+            "trade_lane": "EU-US",
+            "dates": [{"application_date": "2024-01-01", "validity_date": "2024-12-31"}],
+            "surcharges_to_exclude": ["THC"],
+        })
+        test_db.add(t)
+        test_db.commit()
+
+        service = TransformationsService(db=async_db)
+        assert (await service.search_transformations(surcharge_excluded=["THC"]))["items"] == []
+
+        assert await service.rebuild_data_index() == 1
+        result = await service.search_transformations(surcharge_excluded=["THC"])
+        assert [item["id"] for item in result["items"]] == ["test-id"]
@@ -0,0 +1,224 @@
+"""Tests for DatabaseSnapshotter."""
+import asyncio
+import os
+import sqlite3
+from types import SimpleNamespace
+import pytest
+from fastapi import HTTPException
+from google.api_core.exceptions import PreconditionFailed
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+import app.db.session as session_module
+from app.db.bootstrap import DatabaseBootstrap
+from app.db.snapshot import DatabaseSnapshotter
+
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.generation = None
+
+    def upload_from_filename(self, filename, content_type=None, if_generation_match=None):
+        current = self.bucket.generations.get(self.name, 0)
+        if if_generation_match != current:
+            raise PreconditionFailed("generation mismatch")
+        with open(filename, "rb") as f:
+            self.bucket.objects[self.name] = f.read()
+        self.generation = current + 1
+        self.bucket.generations[self.name] = self.generation
+
+
+class FakeBucket:
+    def __init__(self):
+        self.objects = {}
+        self.generations = {}
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+
+@pytest.fixture
+async def bootstrap(tmp_path):
+    db_file_path = str(tmp_path / "ratecard.sqlite")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_file_path}", poolclass=NullPool)
+    bootstrap = DatabaseBootstrap(engine=engine, db_file_path=db_file_path)
+    await bootstrap.wait_ready()
+    yield bootstrap
+    await engine.dispose()
+
+
+def make_snapshotter(bootstrap, bucket, **kwargs):
+    return DatabaseSnapshotter(
+        bootstrap=bootstrap,
+        bucket_factory=lambda: bucket,
+        gcs_db_path="api-db/ratecard.sqlite",
+        **kwargs,
+    )
+
+
+def count_rows(data, tmp_path):
+    path = str(tmp_path / "uploaded.sqlite")
+    with open(path, "wb") as f:
+        f.write(data)
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM carriers").fetchone()[0]
+    finally:
+        conn.close()
+        os.unlink(path)
+
+
+class TestDatabaseSnapshotter:
+    """Test suite for DatabaseSnapshotter."""
+
+    async def test_commit_marks_dirty_and_flush_uploads(self, tmp_path, bootstrap):
+        """Test committed writes are uploaded as a consistent snapshot."""
+        bucket = FakeBucket()
+        snapshotter = make_snapshotter(bootstrap, bucket)
+        event.listen(bootstrap.engine.sync_engine, "commit", snapshotter.mark_dirty)
+
+        assert await snapshotter.flush() is False
+
+        async with bootstrap.engine.begin() as conn:
+            await conn.execute(text("INSERT INTO carriers (name) VALUES ('MSC')"))
+
+        assert snapshotter.dirty
+        assert await snapshotter.flush() is True
+        assert not snapshotter.dirty
+        assert count_rows(bucket.objects["api-db/ratecard.sqlite"], tmp_path) == 1
+        assert bootstrap.generation == 1
+        with open(bootstrap.generation_file_path) as f:
+            assert f.read() == "1"
+
+        async with bootstrap.engine.begin() as conn:
+            await conn.execute(text("INSERT INTO carriers (name) VALUES ('CMA')"))
+
+        assert await snapshotter.flush() is True
+        assert bucket.generations["api-db/ratecard.sqlite"] == 2
+        assert count_rows(bucket.objects["api-db/ratecard.sqlite"], tmp_path) == 2
+
+    async def test_concurrent_writer_is_not_overwritten(self, bootstrap):
+        """Test a snapshot is refused when another instance uploaded first."""
+        bucket = FakeBucket()
+        bucket.objects["api-db/ratecard.sqlite"] = b"other instance"
+        bucket.generations["api-db/ratecard.sqlite"] = 7
+        snapshotter = make_snapshotter(bootstrap, bucket)
+
+        snapshotter.mark_dirty()
+
+        assert await snapshotter.flush() is False
+        assert snapshotter.conflict is True
+        assert bucket.objects["api-db/ratecard.sqlite"] == b"other instance"
+
+    async def test_debounce(self, bootstrap):
+        """Test a snapshot waits for writes to settle, up to the max delay."""
+        snapshotter = make_snapshotter(bootstrap, FakeBucket(), debounce_seconds=60, max_delay_seconds=120)
+
+        snapshotter.mark_dirty()
+        assert snapshotter._due() is False
+
+        snapshotter._last_write -= 60
+        assert snapshotter._due() is True
+
+        snapshotter._last_write += 60
+        snapshotter._dirty_since -= 120
+        assert snapshotter._due() is True
+
+    async def test_failed_upload_keeps_writes_pending(self, bootstrap):
+        """Test an upload error leaves the database dirty for the next round."""
+        class BrokenBucket:
+            def blob(self, name):
+                raise ConnectionError("no network")
+
+        snapshotter = make_snapshotter(bootstrap, BrokenBucket())
+        snapshotter.mark_dirty()
+
+        with pytest.raises(ConnectionError):
+            await snapshotter.flush()
+
+        assert snapshotter.dirty
+
+    async def test_bootstrap_failure_is_retried(self, tmp_path):
+        """Test a failed bootstrap does not end the background task."""
+        class FlakyBucket(FakeBucket):
+            def __init__(self):
+                super().__init__()
+                self.get_blob_calls = 0
+
+            def get_blob(self, name):
+                self.get_blob_calls += 1
+                if self.get_blob_calls == 1:
+                    raise ConnectionError("no network")
+                return None
+
+        bucket = FlakyBucket()
+        db_file_path = str(tmp_path / "ratecard.sqlite")
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_file_path}", poolclass=NullPool)
+        bootstrap = DatabaseBootstrap(
+            engine=engine,
+            db_file_path=db_file_path,
+            gcs_db_path="api-db/ratecard.sqlite",
+            bucket_factory=lambda: bucket,
+        )
+        snapshotter = make_snapshotter(bootstrap, bucket, debounce_seconds=0.01, max_delay_seconds=0.01)
+        try:
+            snapshotter.start()
+            for _ in range(100):
+                if bootstrap.is_ready:
+                    break
+                await asyncio.sleep(0.01)
+
+            assert bootstrap.is_ready
+            assert bucket.get_blob_calls == 2
+            assert not snapshotter._task.done()
+
+            snapshotter.mark_dirty()
+            await snapshotter.stop()
+        finally:
+            await engine.dispose()
+
+        assert "api-db/ratecard.sqlite" in bucket.objects
+
+    async def test_stop_flushes_after_task_failure(self, bootstrap):
+        """Test stop still ships pending writes when the background task died."""
+        async def failed():
+            raise RuntimeError("Database is not available")
+
+        bucket = FakeBucket()
+        snapshotter = make_snapshotter(bootstrap, bucket)
+        snapshotter._task = asyncio.create_task(failed())
+        await asyncio.sleep(0)
+        snapshotter.mark_dirty()
+
+        await snapshotter.stop()
+
+        assert "api-db/ratecard.sqlite" in bucket.objects
+
+    async def test_bootstrap_does_not_mark_dirty(self, tmp_path):
+        """Test creating or upgrading the schema on startup is not shipped as a write."""
+        db_file_path = str(tmp_path / "ratecard.sqlite")
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_file_path}", poolclass=NullPool)
+        try:
+            for _ in range(2):
+                bootstrap = DatabaseBootstrap(engine=engine, db_file_path=db_file_path)
+                snapshotter = make_snapshotter(bootstrap, FakeBucket())
+                event.listen(engine.sync_engine, "commit", snapshotter.mark_dirty)
+                await bootstrap.wait_ready()
+                event.remove(engine.sync_engine, "commit", snapshotter.mark_dirty)
+
+                assert not snapshotter.dirty
+        finally:
+            await engine.dispose()
+
+    async def test_conflict_makes_database_unavailable(self, monkeypatch, bootstrap):
+        """Test requests are refused once the snapshots of this instance conflict."""
+        monkeypatch.setattr(session_module, "database_bootstrap", bootstrap)
+        monkeypatch.setattr(session_module, "database_snapshotter", SimpleNamespace(conflict=True))
+
+        with pytest.raises(HTTPException) as exc_info:
+            await session_module.wait_for_database()
+
+        assert exc_info.value.status_code == 503
@@ -0,0 +1,46 @@
+"""Tests for the SQLite performance profile."""
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.db.sqlite_profile import apply_sqlite_profile, sqlite_pragmas
+
+
+class TestSQLiteProfile:
+    """Test suite for apply_sqlite_profile."""
+
+    def test_pragmas_follow_arguments(self):
+        pragmas = sqlite_pragmas(
+            journal_mode="WAL",
+            synchronous="NORMAL",
+            mmap_size=1024,
+            cache_size=-2000,
+            busy_timeout_ms=250,
+        )
+
+        assert pragmas == [
+            "PRAGMA journal_mode=WAL",
+            "PRAGMA synchronous=NORMAL",
+            "PRAGMA mmap_size=1024",
+            "PRAGMA cache_size=-2000",
+            "PRAGMA busy_timeout=250",
+        ]
+
+    async def test_profile_applied_to_every_connection(self, tmp_path):
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'profile.db'}", pool_size=2)
+        apply_sqlite_profile(engine.sync_engine, sqlite_pragmas(
+            journal_mode="WAL",
+            synchronous="NORMAL",
+            mmap_size=1024 * 1024,
+            cache_size=-2000,
+            busy_timeout_ms=1234,
+        ))
+
+        try:
+            async with engine.connect() as first, engine.connect() as second:
+                for conn in (first, second):
+                    assert (await conn.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+                    assert (await conn.execute(text("PRAGMA synchronous"))).scalar() == 1
+                    assert (await conn.execute(text("PRAGMA cache_size"))).scalar() == -2000
+                    assert (await conn.execute(text("PRAGMA busy_timeout"))).scalar() == 1234
+        finally:
+            await engine.dispose()
@@ -0,0 +1,148 @@
+"""Tests for StatusNotifier."""
+import asyncio
+import pytest
+from fastapi import HTTPException
+
+from app.services.status_notifier import StatusNotifier
+
+
+def make_snapshot(progress=0, processing=False):
+    return {
+        "id": "test-id",
+        "status_details": {
+            "UPLOAD_COMPLETE": True,
+            "PROCESSING": processing,
+            "REVIEW": False,
+            "READY_TO_PUBLISH": False
+        },
+        "progress": progress,
+        "message": None
+    }
+
+
+class TestStatusNotifier:
+    """Test suite for StatusNotifier."""
+
+    async def test_watchers_share_one_load(self):
+        """Test N watchers of one transformation cost a single read."""
+        notifier = StatusNotifier()
+        loads = []
+
+        async def load():
+            loads.append(1)
+            return make_snapshot()
+
+        watchers = [notifier.subscribe("test-id", load) for _ in range(3)]
+        firsts = await asyncio.gather(*(w.__anext__() for w in watchers))
+
+        assert firsts == [make_snapshot()] * 3
+        assert len(loads) == 1
+        assert notifier.watcher_count("test-id") == 3
+
+        for w in watchers:
+            await w.aclose()
+
+    async def test_publish_pushes_only_changes(self):
+        """Test unchanged snapshots are not pushed and changes reach every watcher."""
+        notifier = StatusNotifier()
+
+        async def load():
+            return make_snapshot()
+
+        first = notifier.subscribe("test-id", load, heartbeat=0.05)
+        second = notifier.subscribe("test-id", load, heartbeat=0.05)
+        await first.__anext__()
+        await second.__anext__()
+
+        notifier.publish("test-id", make_snapshot())
+        assert await first.__anext__() is None
+
+        notifier.publish("test-id", make_snapshot(progress=50, processing=True))
+        assert (await first.__anext__())["progress"] == 50
+        assert (await second.__anext__())["status_details"]["PROCESSING"] is True
+
+        await first.aclose()
+        await second.aclose()
+
+    async def test_publish_without_watchers_is_noop(self):
+        """Test publishing for an unwatched transformation keeps no state."""
+        notifier = StatusNotifier()
+
+        notifier.publish("test-id", make_snapshot())
+
+        assert notifier.watcher_count("test-id") == 0
+
+    async def test_last_watcher_leaving_drops_channel(self):
+        """Test the channel and its refresh task go away with the last watcher."""
+        notifier = StatusNotifier(refresh_interval=10)
+        loads = []
+
+        async def load():
+            loads.append(1)
+            return make_snapshot()
+
+        watcher = notifier.subscribe("test-id", load)
+        await watcher.__anext__()
+        await watcher.aclose()
+
+        assert notifier.watcher_count("test-id") == 0
+
+        watcher = notifier.subscribe("test-id", load)
+        await watcher.__anext__()
+        await watcher.aclose()
+
+        assert len(loads) == 2
+
+    async def test_load_error_propagates(self):
+        """Test an unknown transformation fails the subscription."""
+        notifier = StatusNotifier()
+
+        async def load():
+            raise HTTPException(status_code=404, detail="Transformation test-id not found")
+
+        with pytest.raises(HTTPException):
+            await notifier.subscribe("test-id", load).__anext__()
+
+        assert notifier.watcher_count("test-id") == 0
+
+    async def test_cancelled_loader_does_not_fail_waiters(self):
+        """Test watchers waiting on a cancelled first load subscribe on their own."""
+        notifier = StatusNotifier()
+        loading = asyncio.Event()
+        calls = 0
+
+        async def load():
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                loading.set()
+                await asyncio.Event().wait()
+            return make_snapshot(progress=10)
+
+        first = asyncio.create_task(notifier.subscribe("test-id", load).__anext__())
+        await loading.wait()
+        second_watcher = notifier.subscribe("test-id", load)
+        second = asyncio.create_task(second_watcher.__anext__())
+        await asyncio.sleep(0)
+        first.cancel()
+
+        assert (await second)["progress"] == 10
+        assert first.cancelled()
+        assert calls == 2
+        assert notifier.watcher_count("test-id") == 1
+
+        await second_watcher.aclose()
+
+    async def test_refresh_picks_up_external_changes(self):
+        """Test one refresh task per channel detects writes made elsewhere."""
+        notifier = StatusNotifier(refresh_interval=0.01)
+        progress = iter([0, 0, 0, 30])
+
+        async def load():
+            return make_snapshot(progress=next(progress, 30))
+
+        watcher = notifier.subscribe("test-id", load, heartbeat=1)
+        assert (await watcher.__anext__())["progress"] == 0
+        assert (await watcher.__anext__())["progress"] == 30
+
+        await watcher.aclose()